@@ -1,17 +1,93 @@
 """ShadeFS HTTP API client."""
 
+import os
+import threading
+import time
 from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
 
 import click
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import ConnectionPool
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.util.retry import Retry
 
 
-class ApiAddrType(click.ParamType):
+#: Timeout of every request in seconds.
+TIMEOUT = 5
+#: Default number of connections kept open to the API server per client.
+DEFAULT_POOL_SIZE = 10
+#: The root directory of a drive.
+ROOT = Path("/")
+
+# seconds spent establishing connections by the request currently made on this thread
+_connect_time = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """HTTP connection that accounts the time spent connecting to the current request."""
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_time.seconds = getattr(_connect_time, "seconds", 0.0) + (
+                time.perf_counter() - start
+            )
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTP adapter whose connections account the time spent connecting, see `_TimedHTTPConnection`."""
+
+    def get_connection_with_tls_context(
+        self,
+        request: requests.PreparedRequest,
+        verify: bool | str | None,
+        proxies: Optional[Mapping[str, str]] = None,
+        cert: Optional[Tuple[str, str] | str] = None,
+    ) -> ConnectionPool:
+        pool = super().get_connection_with_tls_context(request, verify, proxies, cert)
+        # the pool makes its new connections with `ConnectionCls`; HTTPS pools keep theirs
+        if isinstance(pool, HTTPConnectionPool) and pool.scheme == "http":
+            pool.ConnectionCls = _TimedHTTPConnection
+        return pool
+
+
+class RequestTiming(NamedTuple):
+    """Timing of a single API request."""
+
+    #: The HTTP method, e.g. `GET`.
+    method: str
+    #: The path of the endpoint, e.g. `/admin/fs/attr`.
+    endpoint: str
+    #: The HTTP status code of the response.
+    status: int
+    #: Seconds spent establishing new connections; 0 if a kept-alive connection was reused.
+    connect: float
+    #: Seconds from sending the request until the response headers arrived, excluding `connect`.
+    server: float
+    #: Seconds the whole request took, including reading the body unless it is streamed.
+    total: float
+
+
+# `ParamType` only takes type arguments since click 8.4
+class ApiAddrType(click.ParamType):  # type: ignore[type-arg,unused-ignore]
     """Click ShadeFS API address type."""
 
     name = "api_url"
 
-    def convert(self, value, param, ctx):
+    def convert(
+        self, value: Any, param: Optional[click.Parameter], ctx: Optional[click.Context]
+    ) -> "Api":
         try:
             return Api(value)
         except Exception:
@@ -23,69 +99,198 @@ class ApiAddrType(click.ParamType):
 
 
 class Api:
-    """ShadeFS HTTP API client."""
+    """
+    ShadeFS HTTP API client.
+
+    Requests go through a pooled session, so connections to the server are kept alive and reused across requests
+    and threads. The session is created lazily in every process, so clients can be shared with forked workers.
+    """
 
-    def __init__(self, addr: str):
+    def __init__(
+        self,
+        addr: str,
+        root: Path = ROOT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keep_alive: bool = True,
+        retries: int = 0,
+    ):
         """
         Initialize a new API client.
 
         :param addr: The address of the API server, in the format `host:port/drive`.
+        :param root: The directory of the drive that paths passed to this client are relative to.
+        :param pool_size: The maximum number of connections kept open to the server.
+        :param keep_alive: If false, close the connection after every request.
+        :param retries: How often to retry a request that failed to connect.
         """
+        self.addr = addr
+        self.root = root
         addr, self.drive = addr.split("/")
         host, port = addr.split(":")
         self.url = f"http://{host}:{port}"
+        #: Called with this client and the timing of every request it made.
+        self.hooks: list[Callable[["Api", RequestTiming], None]] = []
+        self.configure(pool_size, keep_alive, retries)
+
+    def configure(self, pool_size: int, keep_alive: bool, retries: int) -> None:
+        """
+        Change the connection settings of this client, dropping its open connections.
+
+        :param pool_size: The maximum number of connections kept open to the server.
+        :param keep_alive: If false, close the connection after every request.
+        :param retries: How often to retry a request that failed to connect.
+        """
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._pid: Optional[int] = None
+
+    def subtree(self, path: Path) -> "Api":
+        """
+        Create a client for a subdirectory of this client.
+
+        The new client has the same connection settings but its own session and no hooks.
+
+        :param path: The subdirectory, relative to this client's root.
+        :return: A new client whose root is `path`.
+        """
+        return Api(
+            self.addr,
+            self._remote(path),
+            self.pool_size,
+            self.keep_alive,
+            self.retries,
+        )
+
+    def _remote(self, path: Path) -> Path:
+        return self.root / Path(path).relative_to(Path(path).anchor)
+
+    def _make_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = _TimedHTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            # only retry requests that never reached the server, anything else may have had an effect
+            max_retries=Retry(
+                total=self.retries,
+                read=0,
+                status=0,
+                other=0,
+                redirect=0,
+                backoff_factor=0.05,
+            ),
+        )
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def _get_session(self) -> requests.Session:
+        with self._lock:
+            # connections must not be shared with a parent process
+            if self._session is None or self._pid != os.getpid():
+                self._session = self._make_session()
+                self._pid = os.getpid()
+            return self._session
 
-    def listdir(self, path: Path) -> list[dict]:
-        res = requests.get(
-            self.url + "/admin/fs/listdir",
-            timeout=5,
+    def _request(self, method: str, endpoint: str, **kwargs: Any) -> requests.Response:
+        session = self._get_session()
+        _connect_time.seconds = 0.0
+        start = time.perf_counter()
+        res = session.request(method, self.url + endpoint, timeout=TIMEOUT, **kwargs)
+        total = time.perf_counter() - start
+        connect = _connect_time.seconds
+        timing = RequestTiming(
+            method,
+            endpoint,
+            res.status_code,
+            connect,
+            max(res.elapsed.total_seconds() - connect, 0.0),
+            total,
+        )
+        for hook in self.hooks:
+            hook(self, timing)
+        return res
+
+    def listdir(self, path: Path) -> list[dict[str, Any]]:
+        res = self._request(
+            "GET",
+            "/admin/fs/listdir",
             params={
-                "path": str(path),
+                "path": str(self._remote(path)),
                 "drive": self.drive,
             },
         )
         res.raise_for_status()
-        return res.json()
+        listing: list[dict[str, Any]] = res.json()
+        return listing
 
-    def getattr(self, path: Path) -> dict:
-        res = requests.get(
-            self.url + "/admin/fs/attr",
-            timeout=5,
+    def getattr(self, path: Path) -> dict[str, Any]:
+        res = self._request(
+            "GET",
+            "/admin/fs/attr",
             params={
-                "path": str(path),
+                "path": str(self._remote(path)),
                 "drive": self.drive,
             },
         )
         res.raise_for_status()
-        return res.json()
+        attributes: dict[str, Any] = res.json()
+        return attributes
 
     def download(self, path: Path) -> bytes:
-        res = requests.get(
-            self.url + "/admin/fs/download",
-            timeout=5,
+        res = self._request(
+            "GET",
+            "/admin/fs/download",
             params={
-                "path": str(path),
+                "path": str(self._remote(path)),
                 "drive": self.drive,
             },
         )
         res.raise_for_status()
         return res.content
 
+    def download_chunks(self, path: Path, chunk_size: int) -> Iterator[bytes]:
+        """
+        Download a file in chunks, without holding all of it in memory.
+
+        :param path: The file to download.
+        :param chunk_size: The maximum size of a chunk.
+        :return: An iterator over the chunks of the file.
+        """
+        with self._request(
+            "GET",
+            "/admin/fs/download",
+            stream=True,
+            params={
+                "path": str(self._remote(path)),
+                "drive": self.drive,
+            },
+        ) as res:
+            res.raise_for_status()
+            yield from res.iter_content(chunk_size)
+
     def mkdir(self, path: Path) -> None:
-        res = requests.post(
-            self.url + "/admin/fs/mkdir",
-            timeout=5,
-            params={"path": str(path), "drive": self.drive, "email": "sex@shade.inc"},
+        res = self._request(
+            "POST",
+            "/admin/fs/mkdir",
+            params={
+                "path": str(self._remote(path)),
+                "drive": self.drive,
+                "email": "sex@shade.inc",
+            },
         )
         res.raise_for_status()
 
     def copyfile(self, src: Path, dst: Path) -> None:
-        res = requests.post(
-            self.url + "/admin/fs/copyfile",
-            timeout=5,
+        res = self._request(
+            "POST",
+            "/admin/fs/copyfile",
             params={
-                "src": str(src),
-                "dst": str(dst),
+                "src": str(self._remote(src)),
+                "dst": str(self._remote(dst)),
                 "drive": self.drive,
                 "email": "sex@shade.inc",
             },
@@ -93,25 +298,31 @@ class Api:
         res.raise_for_status()
 
     def delete(self, path: Path) -> None:
-        res = requests.delete(
-            self.url + "/admin/fs/delete",
-            timeout=5,
-            params={"path": str(path), "drive": self.drive, "email": "sex@shade.inc"},
+        res = self._request(
+            "DELETE",
+            "/admin/fs/delete",
+            params={
+                "path": str(self._remote(path)),
+                "drive": self.drive,
+                "email": "sex@shade.inc",
+            },
         )
         res.raise_for_status()
 
     def move(self, src: Path, dst: Path) -> None:
-        res = requests.post(
-            self.url + "/admin/fs/move",
-            timeout=5,
+        res = self._request(
+            "POST",
+            "/admin/fs/move",
             params={
-                "src": str(src),
-                "dst": str(dst),
+                "src": str(self._remote(src)),
+                "dst": str(self._remote(dst)),
                 "drive": self.drive,
                 "email": "sex@shade.inc",
             },
         )
         res.raise_for_status()
 
-    def __str__(self):
-        return f"{self.url}/{self.drive}"
+    def __str__(self) -> str:
+        if self.root == ROOT:
+            return f"{self.url}/{self.drive}"
+        return f"{self.url}/{self.drive}{self.root}"
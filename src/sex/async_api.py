@@ -0,0 +1,342 @@
+"""Asynchronous ShadeFS HTTP API client."""
+
+import asyncio
+import contextlib
+import json
+import time
+from pathlib import Path
+from typing import Any
+from typing import AsyncIterator
+from typing import Callable
+from typing import NamedTuple
+from urllib.parse import urlencode
+
+import requests
+
+from sex.api import TIMEOUT
+from sex.api import Api
+from sex.api import RequestTiming
+
+
+#: Size of the reads of response bodies.
+READ_SIZE = 1 << 16
+
+
+class _Connection:
+    """An HTTP/1.1 connection to the API server."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        #: Whether the connection may be used for another request.
+        self.reusable = True
+
+    def close(self) -> None:
+        self.reusable = False
+        self.writer.close()
+
+
+class ErrorResponse(NamedTuple):
+    """The error response of an `AsyncApi` request, as the `response` of the `requests.HTTPError` it raises."""
+
+    #: The status code of the response.
+    status_code: int
+    #: The reason phrase of the response.
+    reason: str
+    #: The URL of the request.
+    url: str
+    #: The body of the response.
+    content: bytes
+
+
+class _Response:
+    """The head of an HTTP response, whose body is read from its connection."""
+
+    def __init__(
+        self,
+        connection: _Connection,
+        method: str,
+        status: int,
+        reason: str,
+        headers: dict[str, str],
+    ) -> None:
+        self.connection = connection
+        self.method = method
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        #: Whether the whole body has been read.
+        self.consumed = False
+
+    async def iter_body(self) -> AsyncIterator[bytes]:
+        """
+        Read the body in chunks, decoded from the transfer encoding.
+
+        Responses to `HEAD`, and 1xx, 204 and 304 responses, have no body. Other responses without a length are read
+        until the connection closes if either side said it would close it, and are otherwise taken to have no body.
+        Like the read timeout of `requests`, `TIMEOUT` applies to each chunk rather than to the whole body, and not to
+        the time the caller takes between chunks.
+
+        :return: An async iterator over the chunks of the body.
+        """
+        reader = self.connection.reader
+        if self.method == "HEAD" or self.status < 200 or self.status in (204, 304):
+            # these never have a body, whatever their headers say
+            pass
+        elif self.headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                async with asyncio.timeout(TIMEOUT):
+                    size = int((await reader.readline()).split(b";")[0], 16)
+                    if not size:
+                        # skip trailers
+                        while (await reader.readline()).strip():
+                            pass
+                        break
+                    chunk = await reader.readexactly(size)
+                    await reader.readexactly(2)
+                yield chunk
+        elif "content-length" in self.headers:
+            remaining = int(self.headers["content-length"])
+            while remaining:
+                async with asyncio.timeout(TIMEOUT):
+                    chunk = await reader.read(min(remaining, READ_SIZE))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                remaining -= len(chunk)
+                yield chunk
+        elif not self.connection.reusable:
+            # the body ends with the connection
+            while True:
+                async with asyncio.timeout(TIMEOUT):
+                    chunk = await reader.read(READ_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        else:
+            # a kept-alive connection without a length has no end of the body to read up to, so take the body as
+            # empty, and do not reuse the connection in case the server sends one anyway
+            self.connection.reusable = False
+        self.consumed = True
+
+    async def read(self) -> bytes:
+        """:return: The rest of the body."""
+        return b"".join([chunk async for chunk in self.iter_body()])
+
+
+class AsyncApi:
+    """
+    ShadeFS HTTP API client for asyncio.
+
+    This is the counterpart of `Api` for the asyncio engine: it has the same methods as coroutines, raises the same
+    `requests.HTTPError` on error responses, and calls the same hooks. It speaks just enough HTTP/1.1 over asyncio
+    streams for the API server, keeping up to `pool_size` connections alive, so a single event loop can have many
+    requests in flight.
+
+    A client belongs to the event loop it is first used in.
+    """
+
+    def __init__(self, api: Api) -> None:
+        """
+        Initialize a new asynchronous API client.
+
+        :param api: The client to take the server, drive, root and connection settings from.
+        """
+        self.api = api
+        self.host, port = api.url.removeprefix("http://").split(":")
+        self.port = int(port)
+        #: Called with this client and the timing of every request it made.
+        self.hooks: list[Callable[["AsyncApi", RequestTiming], None]] = []
+        self._idle: list[_Connection] = []
+        self._connections = asyncio.Semaphore(api.pool_size)
+
+    async def close(self) -> None:
+        """Close all idle connections."""
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+        for connection in idle:
+            try:
+                await connection.writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _connect(self) -> _Connection:
+        async with asyncio.timeout(TIMEOUT):
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        return _Connection(reader, writer)
+
+    async def _send(
+        self, connection: _Connection, method: str, target: str
+    ) -> _Response:
+        headers = [
+            f"{method} {target} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Content-Length: 0",
+            f"Connection: {'keep-alive' if self.api.keep_alive else 'close'}",
+        ]
+        connection.writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1"))
+        response_headers: dict[str, str] = {}
+        # like the read timeout of `requests`, up to the headers
+        async with asyncio.timeout(TIMEOUT):
+            await connection.writer.drain()
+            status_line = await connection.reader.readline()
+            if not status_line:
+                raise ConnectionResetError("Connection closed by the API server")
+            version, status, *reason = status_line.decode("latin-1").split(maxsplit=2)
+            while line := (await connection.reader.readline()).strip():
+                name, _, value = line.decode("latin-1").partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+        persistent = "close" if version == "HTTP/1.0" else "keep-alive"
+        if (
+            not self.api.keep_alive
+            or response_headers.get("connection", persistent).lower() == "close"
+        ):
+            connection.reusable = False
+        return _Response(
+            connection, method, int(status), "".join(reason).strip(), response_headers
+        )
+
+    @contextlib.asynccontextmanager
+    async def _open(
+        self, method: str, endpoint: str, params: dict[str, str]
+    ) -> AsyncIterator[_Response]:
+        target = f"{endpoint}?{urlencode(params)}"
+        # `TIMEOUT` applies to connecting, sending and each read, but not to waiting for a pooled connection
+        async with self._connections:
+            start = time.perf_counter()
+            connect = 0.0
+            while True:
+                reused = bool(self._idle)
+                if reused:
+                    connection = self._idle.pop()
+                else:
+                    connect_start = time.perf_counter()
+                    connection = await self._connect()
+                    connect += time.perf_counter() - connect_start
+                try:
+                    response = await self._send(connection, method, target)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    connection.close()
+                    # the server may have dropped an idle connection, which is worth a fresh one
+                    if not reused:
+                        raise
+            headers_at = time.perf_counter()
+
+            try:
+                yield response
+            except BaseException:
+                connection.close()
+                raise
+            if connection.reusable and response.consumed:
+                self._idle.append(connection)
+            else:
+                connection.close()
+
+        timing = RequestTiming(
+            method,
+            endpoint,
+            response.status,
+            connect,
+            headers_at - start - connect,
+            time.perf_counter() - start,
+        )
+        for hook in self.hooks:
+            hook(self, timing)
+
+    def _params(self, **paths: Path) -> dict[str, str]:
+        return {
+            **{key: str(self.api._remote(path)) for key, path in paths.items()},
+            "drive": self.api.drive,
+        }
+
+    async def _read_body(self, response: _Response, endpoint: str) -> bytes:
+        body = await response.read()
+        if response.status >= 400:
+            # raise the same error as `requests` would, so that callers can handle both clients alike
+            kind = "Client" if response.status < 500 else "Server"
+            url = f"{self.api.url}{endpoint}"
+            error = requests.HTTPError(
+                f"{response.status} {kind} Error: {response.reason} for url: {url}"
+            )
+            error.response = ErrorResponse(response.status, response.reason, url, body)
+            raise error
+        return body
+
+    async def _call(self, method: str, endpoint: str, params: dict[str, str]) -> bytes:
+        async with self._open(method, endpoint, params) as response:
+            return await self._read_body(response, endpoint)
+
+    async def listdir(self, path: Path) -> list[dict[str, Any]]:
+        listing: list[dict[str, Any]] = json.loads(
+            await self._call("GET", "/admin/fs/listdir", self._params(path=path))
+        )
+        return listing
+
+    async def getattr(self, path: Path) -> dict[str, Any]:
+        attributes: dict[str, Any] = json.loads(
+            await self._call("GET", "/admin/fs/attr", self._params(path=path))
+        )
+        return attributes
+
+    async def download(self, path: Path) -> bytes:
+        return await self._call("GET", "/admin/fs/download", self._params(path=path))
+
+    @contextlib.asynccontextmanager
+    async def download_chunks(self, path: Path) -> AsyncIterator[AsyncIterator[bytes]]:
+        """
+        Download a file in chunks, without holding all of it in memory.
+
+        The connection is held until the context is exited.
+
+        :param path: The file to download.
+        :return: A context manager for an async iterator over the chunks of the file.
+        """
+        endpoint = "/admin/fs/download"
+        async with self._open("GET", endpoint, self._params(path=path)) as response:
+            if response.status >= 400:
+                await self._read_body(response, endpoint)
+            yield response.iter_body()
+
+    async def mkdir(self, path: Path) -> None:
+        await self._call(
+            "POST",
+            "/admin/fs/mkdir",
+            {**self._params(path=path), "email": "sex@shade.inc"},
+        )
+
+    async def copyfile(self, src: Path, dst: Path) -> None:
+        await self._call(
+            "POST",
+            "/admin/fs/copyfile",
+            {**self._params(src=src, dst=dst), "email": "sex@shade.inc"},
+        )
+
+    async def delete(self, path: Path) -> None:
+        await self._call(
+            "DELETE",
+            "/admin/fs/delete",
+            {**self._params(path=path), "email": "sex@shade.inc"},
+        )
+
+    async def move(self, src: Path, dst: Path) -> None:
+        await self._call(
+            "POST",
+            "/admin/fs/move",
+            {**self._params(src=src, dst=dst), "email": "sex@shade.inc"},
+        )
+
+    def __str__(self) -> str:
+        return str(self.api)
+
+
+def async_client(client: Path | Api) -> "Path | AsyncApi":
+    """
+    Get the client to use in the asyncio engine in place of a client of the threaded one.
+
+    :param client: A Path to a mountpoint or an Api.
+    :return: The mountpoint itself, or an AsyncApi for the Api.
+    """
+    if isinstance(client, Api):
+        return AsyncApi(client)
+    return client
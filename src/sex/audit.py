@@ -0,0 +1,319 @@
+"""Audits of whole namespaces against the model."""
+
+import os
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from pathlib import Path
+from typing import Callable
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+
+from sex.api import Api
+from sex.compare import compare_chunks
+from sex.constants import CHUNK_SIZE
+from sex.fileio import read_chunks
+from sex.merkle import MerkleTree
+from sex.operation import VerificationError
+from sex.state import Directory
+from sex.state import File
+from sex.state import State
+from sex.state import directory_digest
+from sex.state import entry_hash
+from sex.state import file_digest
+from sex.verification import VerificationPipeline
+
+
+#: Default number of threads listing directories and hashing files during an audit.
+DEFAULT_AUDIT_JOBS = 8
+
+#: What a client holds at a path: "dir" or "file", and the size of files.
+Entry = Tuple[str, Optional[int]]
+
+
+class AuditError(Exception):
+    """Exception raised when clients do not match the model."""
+
+    def __init__(self, problems: list[str], limit: int = 20) -> None:
+        """
+        Initialize a new audit error.
+
+        :param problems: A description of every difference.
+        :param limit: The number of differences to show in the message.
+        """
+        super().__init__(problems, limit)
+        self.problems = problems
+        self.limit = limit
+
+    def __str__(self) -> str:
+        """Describe the first differences."""
+        shown = self.problems[: self.limit]
+        if len(self.problems) > self.limit:
+            shown.append(f"and {len(self.problems) - self.limit} more differences")
+        return f"The clients do not match the model:\n{"\n".join(shown)}"
+
+
+def _walk(
+    pool: ThreadPoolExecutor,
+    list_directory: Callable[[Path], list[Tuple[Path, Entry]]],
+) -> Tuple[dict[Path, Entry], list[str]]:
+    # list directories concurrently, each as soon as its parent was listed
+    entries: dict[Path, Entry] = {Path("/"): ("dir", None)}
+    problems = []
+    pending: dict[Future[list[Tuple[Path, Entry]]], Path] = {
+        pool.submit(list_directory, Path("/")): Path("/")
+    }
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            directory = pending.pop(future)
+            try:
+                children = future.result()
+            except Exception as e:
+                problems.append(f"Cannot list {directory}: {e!r}")
+                continue
+            for path, entry in children:
+                entries[path] = entry
+                if entry[0] == "dir":
+                    pending[pool.submit(list_directory, path)] = path
+    return entries, problems
+
+
+def _scandir(root: Path, directory: Path) -> list[Tuple[Path, Entry]]:
+    children: list[Tuple[Path, Entry]] = []
+    with os.scandir(root / directory.relative_to("/")) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                children.append((directory / entry.name, ("dir", None)))
+            else:
+                children.append(
+                    (directory / entry.name, ("file", entry.stat().st_size))
+                )
+    return children
+
+
+def _listdir(api: Api, directory: Path) -> list[Tuple[Path, Entry]]:
+    children: list[Tuple[Path, Entry]] = []
+    for obj in api.listdir(directory):
+        path = directory / Path(obj["path"]).name
+        if path.name.startswith("."):
+            continue
+        # only ask for the attributes that the listing does not include
+        if "type" not in obj or (obj["type"] != "dir" and "size" not in obj):
+            obj = api.getattr(path)
+        kind = "dir" if obj["type"] == "dir" else "file"
+        children.append((path, (kind, obj.get("size") if kind == "file" else None)))
+    return children
+
+
+def _hash_chunks(chunks: Iterable[bytes]) -> bytes:
+    # hash streamed contents the way the model hashes files, one leaf at a time, see `sex.state.File.digest`
+    leaves = []
+    size = 0
+    pending = b""
+    for chunk in chunks:
+        size += len(chunk)
+        data = memoryview(pending + chunk)
+        cut = len(data) - len(data) % MerkleTree.LEAF_SIZE
+        for start in range(0, cut, MerkleTree.LEAF_SIZE):
+            leaves.append(
+                MerkleTree.leaf_digest(data[start : start + MerkleTree.LEAF_SIZE])
+            )
+        pending = bytes(data[cut:])
+    if pending:
+        leaves.append(MerkleTree.leaf_digest(pending))
+    return file_digest(size, MerkleTree.of_leaves(leaves).root())
+
+
+def _digests(
+    entries: dict[Path, Entry], hashes: dict[Path, Optional[bytes]]
+) -> Tuple[dict[Path, bytes], dict[Path, list[Path]]]:
+    # hash the directories of a client bottom-up the way the model does, see `sex.state.Directory`
+    children: dict[Path, list[Path]] = {
+        path: [] for path, (kind, _) in entries.items() if kind == "dir"
+    }
+    for path in entries:
+        if path != Path("/"):
+            children[path.parent].append(path)
+    digests: dict[Path, bytes] = {}
+    for directory in sorted(children, key=lambda path: len(path.parts), reverse=True):
+        total = 0
+        for path in children[directory]:
+            kind, _ = entries[path]
+            # files that could not be read hash differently from any file of the model
+            node_digest = digests[path] if kind == "dir" else hashes.get(path) or b""
+            total += entry_hash(path.name, kind, node_digest)
+        digests[directory] = directory_digest(total)
+    return digests, children
+
+
+def _diff(
+    state: State,
+    entries: dict[Path, Entry],
+    hashes: dict[Path, Optional[bytes]],
+) -> Tuple[list[str], list[Tuple[Path, File]]]:
+    # compare the namespace with the model, walking down only into the directories whose hashes differ; return the
+    # differences, and the files whose contents remain to compare to find out how they differ
+    problems = []
+    compare = []
+    digests, children = _digests(entries, hashes)
+    pending = [(Path("/"), state.root)]
+    while pending:
+        directory, node = pending.pop()
+        if digests[directory] == node.digest():
+            continue
+        names = node.children.keys() | {path.name for path in children[directory]}
+        for name in sorted(names):
+            path = directory / name
+            child = node.children.get(name)
+            kind, size = entries.get(path, (None, None))
+            if child is None:
+                problems.append(
+                    f"{"Directory" if kind == "dir" else "File"} {path} is unexpected"
+                )
+            elif isinstance(child, Directory):
+                if kind is None:
+                    problems.append(f"Directory {path} is missing")
+                elif kind != "dir":
+                    problems.append(f"Directory {path} is a file")
+                else:
+                    pending.append((path, child))
+            elif isinstance(child, File):
+                if kind is None:
+                    problems.append(f"File {path} is missing")
+                elif kind != "file":
+                    problems.append(f"File {path} is a directory")
+                elif hashes.get(path) == child.digest():
+                    continue
+                elif size != len(child.content):
+                    problems.append(
+                        f"File {path} has size {size}, expected {len(child.content)}"
+                    )
+                else:
+                    compare.append((path, child))
+    return problems, compare
+
+
+def _audit_client(
+    state: State, client: Path | Api, pool: ThreadPoolExecutor
+) -> list[str]:
+    if isinstance(client, Path):
+        entries, problems = _walk(pool, lambda path: _scandir(client, path))
+
+        def read(path: Path) -> Tuple[object, Iterable[bytes]]:
+            mounted = client / path.relative_to("/")
+            return mounted, read_chunks(mounted)
+
+    else:
+        entries, problems = _walk(pool, lambda path: _listdir(client, path))
+
+        def read(path: Path) -> Tuple[object, Iterable[bytes]]:
+            return f"{client}{path}", client.download_chunks(path, CHUNK_SIZE)
+
+    def digest_file(path: Path) -> Optional[bytes]:
+        try:
+            return _hash_chunks(read(path)[1])
+        except Exception:
+            # reported when the file is compared
+            return None
+
+    def compare(path: Path, file: File) -> None:
+        # files are compared concurrently, and would overwrite each other's artifacts
+        compare_chunks(*read(path), file, artifacts=False)
+
+    files = [path for path, (kind, _) in entries.items() if kind == "file"]
+    hashes = dict(zip(files, pool.map(digest_file, files), strict=True))
+    differences, mismatched = _diff(state, entries, hashes)
+    problems += differences
+    futures = [pool.submit(compare, path, file) for path, file in mismatched]
+    for future in futures:
+        try:
+            future.result()
+        except (VerificationError, OSError) as e:
+            problems.append(str(e))
+        except Exception as e:
+            problems.append(repr(e))
+    return problems
+
+
+def audit(
+    state: State, clients: list[Path | Api], jobs: int = DEFAULT_AUDIT_JOBS
+) -> list[str]:
+    """
+    Compare the whole namespace of every client with the model.
+
+    This covers the directories, the files, their sizes and their contents. Clients are audited concurrently. Their
+    directories are listed concurrently, with `os.scandir` on mountpoints and `Api.listdir` on APIs, which falls back to
+    `Api.getattr` for the types and sizes that listings do not include, and the contents of files are hashed
+    concurrently. The directories of every client are then hashed bottom-up the way the model keeps its own directory
+    hashes up to date, see `sex.state.Directory`, so a client that matches the model costs a single comparison of root
+    hashes on the side of the model. Otherwise only the directories whose hashes differ are walked, and only the files
+    whose hashes differ are compared again, see `compare_chunks`, to describe how they differ. Names starting with a dot
+    are ignored, as by `sex.operations.listdir.Listdir`.
+
+    :param state: The model to compare against, which must be hashed.
+    :param clients: The clients to audit.
+    :param jobs: The number of threads listing directories and hashing files.
+    :return: A description of every difference, empty if every client matches the model.
+    """
+    problems = []
+    # clients are audited at once, sharing the threads that do their I/O, which must not wait for a client themselves
+    with (
+        ThreadPoolExecutor(jobs, thread_name_prefix="audit") as pool,
+        ThreadPoolExecutor(
+            len(clients) or 1, thread_name_prefix="audit-client"
+        ) as audits,
+    ):
+        futures = [
+            audits.submit(_audit_client, state, client, pool) for client in clients
+        ]
+        for client, future in zip(clients, futures, strict=True):
+            problems += [f"{client}: {problem}" for problem in future.result()]
+    return problems
+
+
+class Auditor:
+    """Periodic audits of the clients of a run, see `audit`."""
+
+    def __init__(
+        self, clients: list[Path | Api], every: int, jobs: int = DEFAULT_AUDIT_JOBS
+    ) -> None:
+        """
+        Initialize a new auditor.
+
+        :param clients: The clients to audit.
+        :param every: The number of operations between audits, or 0 to only audit when asked to.
+        :param jobs: The number of threads of every audit.
+        """
+        self.clients = clients
+        self.every = every
+        self.jobs = jobs
+
+    def check(self, state: State) -> None:
+        """
+        Audit the clients now.
+
+        :param state: The model.
+        :raises AuditError: If the clients do not match the model.
+        """
+        problems = audit(state, self.clients, self.jobs)
+        if problems:
+            raise AuditError(problems)
+
+    def after(self, n: int, state: State, pipeline: VerificationPipeline) -> None:
+        """
+        Audit the clients if it is due, once the operations before `n` were verified.
+
+        :param n: The number of operations dispatched so far.
+        :param state: The model.
+        :param pipeline: The pipeline the operations were dispatched through, which is settled first.
+        :raises AuditError: If the clients do not match the model.
+        """
+        if not self.every or n % self.every:
+            return
+        pipeline.settle()
+        self.check(state)
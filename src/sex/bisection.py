@@ -0,0 +1,245 @@
+"""Bisection of failed runs, replaying them from their checkpoints."""
+
+import itertools
+import random
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+from typing import Tuple
+
+import click
+
+from sex.api import Api
+from sex.audit import audit
+from sex.checkpoint import Checkpoint
+from sex.checkpoint import list_checkpoints
+from sex.checkpoint import load_checkpoint
+from sex.content import CONTENT_MODELS
+from sex.operation import Operation
+from sex.operations.create import Create
+from sex.operations.mkdir import Mkdir
+from sex.planner import random_operations
+from sex.sizes import parse_size_distribution
+from sex.state import State
+from sex.verification import OperationFailedError
+from sex.verification import VerificationPipeline
+from sex.verification import verify_operation
+
+
+def model(checkpoint: Checkpoint, hashed: bool = True) -> State:
+    """
+    Create the model of a run at a checkpoint, with the options of the run.
+
+    :param checkpoint: The checkpoint.
+    :param hashed: Whether files keep hash trees, see `State`.
+    :return: The model, with the random module reset to where it was at the checkpoint.
+    """
+    options = checkpoint.options
+    state = State(
+        None,
+        CONTENT_MODELS[options["content_model"]],
+        options["verify_samples"],
+        parse_size_distribution(options["file_sizes"]),
+        options["payload"],
+        hashed,
+    )
+    checkpoint.restore(state)
+    return state
+
+
+def initial_checkpoint(checkpoint: Checkpoint) -> Checkpoint:
+    """
+    Describe the start of the run that took a checkpoint, which is never written as a checkpoint itself.
+
+    :param checkpoint: Any checkpoint of the run.
+    :return: The checkpoint of the empty model, before the first operation.
+    """
+    random.seed(checkpoint.seed)
+    return Checkpoint(
+        0,
+        checkpoint.seed,
+        checkpoint.clients,
+        checkpoint.options,
+        random.getstate(),
+        [Path("/")],
+        [],
+    )
+
+
+def materialize(
+    state: State, mountpoints: list[Path], apis: list[Api], timeout: float
+) -> None:
+    """
+    Create the directories and files of the model on the clients.
+
+    Everything is created through the first mountpoint, and waited for until it is visible on every client.
+
+    :param state: The model.
+    :param mountpoints: The mountpoints to create the model on, of which there must be at least one.
+    :param apis: The API clients, which must see the model too.
+    :param timeout: The verification timeout in seconds.
+    """
+    clients: list[Path | Api] = [*mountpoints, *apis]
+    operations: list[Operation] = [
+        Mkdir(path) for path, _ in state.directories() if path != Path("/")
+    ]
+    operations += [
+        Create(path, len(file.content), file.content) for path, file in state.files()
+    ]
+    for operation in operations:
+        operation.execute(mountpoints[0])
+        verify_operation(clients, operation, timeout, False)
+
+
+class Bisector:
+    """
+    Bisection of the operations of a failed run, to find the earliest one after which the mounts diverge.
+
+    Every probe of a prefix of the run restores the latest checkpoint within the prefix, materializes it in a fresh
+    directory of every client, runs and verifies the rest of the prefix there, and audits the clients against the
+    model. A prefix diverges if an operation fails or the audit finds differences. Only the operations since the
+    checkpoint are run, so a probe costs at most the interval between checkpoints.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        mountpoints: list[Path],
+        apis: list[Api],
+        operations: list[type[Operation]],
+        timeout: float,
+        progress: bool,
+        verbose: bool,
+        cleanup: Optional[Path],
+    ) -> None:
+        """
+        Initialize a new bisector.
+
+        :param directory: The directory the run wrote its checkpoints to, which must hold at least one.
+        :param mountpoints: The mountpoints to probe on, of which there must be at least one.
+        :param apis: The API clients to probe on.
+        :param operations: The types of operations the run picked from.
+        :param timeout: The verification timeout in seconds.
+        :param progress: If true, print remaining timeout to stdout while verifying.
+        :param verbose: If true, print every operation of every probe.
+        :param cleanup: The mountpoint to remove the directories of probes from, if any.
+        :raises click.ClickException: If there are no checkpoints in the directory.
+        """
+        self.mountpoints = mountpoints
+        self.apis = apis
+        self.operations = operations
+        self.timeout = timeout
+        self.progress = progress
+        self.verbose = verbose
+        self.cleanup = cleanup
+        self.checkpoints = list_checkpoints(directory)
+        if not self.checkpoints:
+            raise click.ClickException(f"There are no checkpoints in {directory}.")
+        self.initial = initial_checkpoint(load_checkpoint(self.checkpoints[0][1]))
+        # without cleanup, the probes of earlier bisections are still there
+        self._prefix = f"bisect-{time.time_ns()}"
+        self._attempts = itertools.count()
+
+    def nearest(self, end: int) -> Tuple[Checkpoint, Optional[Path]]:
+        """
+        Find the latest checkpoint within a prefix of the run.
+
+        :param end: The length of the prefix.
+        :return: The checkpoint and its file, or the start of the run and None.
+        """
+        paths = [path for n, path in self.checkpoints if n <= end]
+        if not paths:
+            return self.initial, None
+        return load_checkpoint(paths[-1]), paths[-1]
+
+    def probe(self, end: int) -> Tuple[Optional[int], list[str]]:
+        """
+        Check whether the mounts diverge from the model within a prefix of the run.
+
+        :param end: The length of the prefix.
+        :return: The length of the shortest prefix found to diverge, or None if the prefix does not, and what
+            diverged.
+        """
+        checkpoint, _ = self.nearest(end)
+        path = Path(f"/{self._prefix}-{next(self._attempts)}")
+        relative = path.relative_to(path.anchor)
+        clients: list[Path | Api] = [*self.mountpoints, *self.apis]
+        mkdir = Mkdir(path)
+        mkdir.execute(self.mountpoints[0])
+        verify_operation(clients, mkdir, self.timeout, False)
+        mountpoints = [mountpoint / relative for mountpoint in self.mountpoints]
+        apis = [api.subtree(path) for api in self.apis]
+        try:
+            state = model(checkpoint)
+            materialize(state, mountpoints, apis, self.timeout)
+            try:
+                probed: list[Path | Api] = [*mountpoints, *apis]
+                with VerificationPipeline(
+                    probed, self.timeout, self.progress, self.verbose
+                ) as pipeline:
+                    for n, operation, client in random_operations(
+                        state,
+                        probed,
+                        end,
+                        self.operations,
+                        checkpoint.n,
+                    ):
+                        if self.verbose:
+                            click.echo(f"{n}: {operation} on {client}")
+                        pipeline.dispatch(n, operation, client, state)
+            except OperationFailedError as e:
+                return e.n + 1, [f"{e}: {e.__cause__}"]
+            problems = audit(state, [*mountpoints, *apis])
+            return (end if problems else None), problems
+        finally:
+            if self.cleanup:
+                shutil.rmtree(self.cleanup / relative, ignore_errors=True)
+
+    def bisect(self, end: int) -> Tuple[int, int, list[str]]:
+        """
+        Binary search for the earliest operation after which the mounts diverge.
+
+        :param end: The length of a prefix of the run that diverges, e.g. up to and including a failed operation.
+        :return: The length of the longest prefix found not to diverge, of the shortest prefix found to diverge, and
+            what diverged in the latter.
+        :raises click.ClickException: If the prefix does not diverge.
+        """
+        good = 0
+        bad, problems = self.probe(end)
+        if bad is None:
+            raise click.ClickException(
+                f"The mounts match the model after all {end} operations, there is nothing to bisect."
+            )
+        click.echo(f"Operations 0 to {bad - 1}: diverged")
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            diverged, found = self.probe(middle)
+            if diverged is None:
+                click.echo(f"Operations 0 to {middle - 1}: match")
+                good = middle
+            else:
+                click.echo(f"Operations 0 to {diverged - 1}: diverged")
+                # a flaky client may fail earlier than a prefix that was found to match
+                bad, problems = max(diverged, good + 1), found
+        return good, bad, problems
+
+    def describe(self, start: int, end: int) -> list[str]:
+        """
+        Describe a range of operations of the run, without running them.
+
+        :param start: The index of the first operation.
+        :param end: The index after the last operation.
+        :return: A description of every operation, as printed by verbose runs.
+        """
+        checkpoint, _ = self.nearest(start)
+        state = model(checkpoint, hashed=False)
+        clients: list[Path | Api] = [*self.mountpoints, *self.apis]
+        lines = []
+        for n, operation, client in random_operations(
+            state, clients, end, self.operations, checkpoint.n
+        ):
+            if n >= start:
+                lines.append(f"{n}: {operation} on {client}")
+            operation.update(state)
+        return lines
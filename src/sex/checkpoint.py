@@ -0,0 +1,262 @@
+"""Checkpoints of the model, to resume long runs from."""
+
+import json
+import os
+import queue
+import random
+import threading
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+from typing import Optional
+from typing import Self
+from typing import Sequence
+from typing import Tuple
+
+from sex.content import Content
+from sex.content import content_from_record
+from sex.state import State
+from sex.state import StateError
+
+
+#: Magic bytes and version at the start of every checkpoint, followed by its zlib-compressed description.
+CHECKPOINT_MAGIC = b"SEXCKPT\x01"
+
+#: Suffix of the names of checkpoint files, which are named after the index of the next operation.
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+
+class CheckpointError(Exception):
+    """Exception raised for invalid checkpoints."""
+
+
+@dataclass
+class Checkpoint:
+    """The model of a run between two operations, and what is needed to continue the run from there."""
+
+    #: The index of the next operation of the run.
+    n: int
+    #: The seed the run started with.
+    seed: Optional[int]
+    #: The clients of the run, the mountpoints followed by the APIs.
+    clients: list[str]
+    #: The options of the run that the model depends on, see `State`.
+    options: dict[str, Any]
+    #: The state of the standard library `random` module, see `random.getstate`.
+    random_state: tuple[Any, ...]
+    #: The directories of the model, in the order of its index.
+    directories: list[Path]
+    #: The files of the model and their contents, in the order of its index.
+    files: list[Tuple[Path, Content]]
+
+    def restore(self, state: State) -> None:
+        """
+        Recreate the directories and files of the checkpoint in an empty model.
+
+        Files and directories are added in the order of the index of the original model, so that the model picks
+        the same files and directories at random, and the random module is reset to where it was.
+
+        :param state: The model to fill.
+        :raises StateError: If the model is not empty or the checkpoint is not consistent.
+        """
+        if state.files() or len(state.directories()) > 1:
+            raise StateError(
+                "Cannot restore a checkpoint into a model that is not empty"
+            )
+        for path in self.directories:
+            if path != Path("/"):
+                state.create_directory(path)
+        for path, content in self.files:
+            state.create_file(path, content)
+        random.setstate(self.random_state)
+
+    def to_bytes(self) -> bytes:
+        """:return: The checkpoint, as stored in checkpoint files."""
+        record = {
+            "n": self.n,
+            "seed": self.seed,
+            "clients": self.clients,
+            "options": self.options,
+            "random": self.random_state,
+            "directories": [str(path) for path in self.directories],
+            "files": [[str(path), content.to_record()] for path, content in self.files],
+        }
+        return CHECKPOINT_MAGIC + zlib.compress(json.dumps(record).encode())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Checkpoint":
+        """
+        Read a checkpoint.
+
+        :param data: The checkpoint, see `to_bytes`.
+        :return: The checkpoint.
+        :raises CheckpointError: If the data is not a valid checkpoint.
+        """
+        if not data.startswith(CHECKPOINT_MAGIC):
+            raise CheckpointError(
+                "Not a checkpoint, or a checkpoint of another version"
+            )
+        try:
+            record = json.loads(zlib.decompress(data[len(CHECKPOINT_MAGIC) :]))
+            version, internal, gauss = record["random"]
+            return cls(
+                record["n"],
+                record["seed"],
+                record["clients"],
+                record["options"],
+                (version, tuple(internal), gauss),
+                [Path(path) for path in record["directories"]],
+                [
+                    (Path(path), content_from_record(content))
+                    for path, content in record["files"]
+                ],
+            )
+        except (zlib.error, KeyError, TypeError, ValueError) as e:
+            raise CheckpointError(f"Invalid checkpoint: {e}") from e
+
+
+def capture(
+    n: int,
+    state: State,
+    seed: Optional[int],
+    clients: Sequence[object],
+    options: dict[str, Any],
+) -> Checkpoint:
+    """
+    Snapshot the model and the random module between two operations.
+
+    Contents are copied rather than described, so that describing and compressing them can happen later, on another
+    thread, while the model keeps changing.
+
+    :param n: The index of the next operation.
+    :param state: The model.
+    :param seed: The seed the run started with.
+    :param clients: The clients of the run.
+    :param options: The options of the run that the model depends on.
+    :return: The checkpoint.
+    """
+    return Checkpoint(
+        n,
+        seed,
+        [str(client) for client in clients],
+        options,
+        random.getstate(),
+        [path for path, _ in state.directories()],
+        [(path, file.content.copy()) for path, file in state.files()],
+    )
+
+
+def load_checkpoint(path: Path) -> Checkpoint:
+    """
+    Read a checkpoint file.
+
+    :param path: The checkpoint file, see `Checkpointer`.
+    :return: The checkpoint.
+    :raises CheckpointError: If the file is not a valid checkpoint.
+    """
+    try:
+        return Checkpoint.from_bytes(path.read_bytes())
+    except CheckpointError as e:
+        raise CheckpointError(f"{path}: {e}") from e
+
+
+def list_checkpoints(directory: Path) -> list[Tuple[int, Path]]:
+    """
+    Find the checkpoint files in a directory.
+
+    :param directory: The directory the checkpoints were written to, see `Checkpointer`.
+    :return: The index of the next operation and the path of every checkpoint, in the order of the run.
+    """
+    checkpoints = []
+    for path in directory.glob(f"*{CHECKPOINT_SUFFIX}"):
+        if path.stem.isdigit():
+            checkpoints.append((int(path.stem), path))
+    return sorted(checkpoints)
+
+
+class Checkpointer:
+    """
+    Writer of periodic checkpoints of a run to a directory.
+
+    Checkpoints are captured by `save` between two operations, then described, compressed and written by a
+    background thread. At most one checkpoint waits to be written, so `save` only blocks if checkpoints are taken
+    faster than they can be written. Every checkpoint is written to a temporary file first and renamed, so that a
+    run that dies mid-write leaves no partial checkpoint behind.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        every: int,
+        seed: Optional[int],
+        clients: Sequence[object],
+        options: dict[str, Any],
+    ) -> None:
+        """
+        Initialize a new checkpoint writer.
+
+        :param directory: The directory to write checkpoints to, created if needed.
+        :param every: The number of operations between checkpoints.
+        :param seed: The seed the run started with.
+        :param clients: The clients of the run.
+        :param options: The options of the run that the model depends on.
+        """
+        self.directory = directory
+        self.every = every
+        self.seed = seed
+        self.clients = clients
+        self.options = options
+        self._queue: queue.Queue[Optional[Checkpoint]] = queue.Queue(1)
+        self._thread = threading.Thread(
+            target=self._run, name="checkpoint-writer", daemon=True
+        )
+        self._error: Optional[Exception] = None
+
+    def __enter__(self) -> Self:
+        """Enter the checkpoint writer context, starting the background thread."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Exit the checkpoint writer context, writing the queued checkpoint."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None and exc_type is None:
+            raise self._error
+
+    def save(self, n: int, state: State) -> None:
+        """
+        Checkpoint the run if it is due.
+
+        Must be called between two operations, once the operations before `n` were applied to the model and executed
+        on every client, and before the next operation is generated.
+
+        :param n: The index of the next operation.
+        :param state: The model.
+        :raises Exception: The error that stopped the background thread, if any.
+        """
+        if n % self.every:
+            return
+        if self._error is not None:
+            raise self._error
+        self._queue.put(capture(n, state, self.seed, self.clients, self.options))
+
+    def _run(self) -> None:
+        while (checkpoint := self._queue.get()) is not None:
+            if self._error is not None:
+                continue
+            try:
+                path = self.directory / f"{checkpoint.n:012d}{CHECKPOINT_SUFFIX}"
+                temporary = path.with_suffix(".tmp")
+                temporary.write_bytes(checkpoint.to_bytes())
+                os.replace(temporary, path)
+            except Exception as e:
+                self._error = e
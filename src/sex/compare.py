@@ -0,0 +1,266 @@
+"""Streaming comparison of file contents."""
+
+import contextlib
+import contextvars
+import os
+import random
+from pathlib import Path
+from typing import AsyncIterable
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+from sex.constants import ACTUAL_DATA_FILENAME
+from sex.constants import EXPECTED_DATA_FILENAME
+from sex.constants import MAX_ARTIFACT_SIZE
+from sex.constants import SAMPLE_SIZE
+from sex.merkle import MerkleTree
+from sex.operation import VerificationError
+from sex.state import File
+from sex.state import StateError
+
+
+# sampling must not draw from the global random stream, which determines the operations
+_sampler = random.Random()
+# whether failed comparisons write their artifacts by default, see `no_artifacts`
+_artifacts: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "artifacts", default=True
+)
+
+
+@contextlib.contextmanager
+def no_artifacts() -> Iterator[None]:
+    """
+    Do not write `ACTUAL_DATA_FILENAME` and `EXPECTED_DATA_FILENAME` for comparisons that fail within the context.
+
+    This is for comparisons that run concurrently, and would overwrite each other's artifacts. It only applies to the
+    current context, so threads that compare on behalf of the caller must run in a copy of it, see
+    `contextvars.copy_context`.
+
+    :return: A context manager.
+    """
+    token = _artifacts.set(False)
+    try:
+        yield
+    finally:
+        _artifacts.reset(token)
+
+
+def compare_chunks(
+    name: object,
+    chunks: Iterable[bytes],
+    expected: File,
+    artifacts: Optional[bool] = None,
+) -> None:
+    """
+    Compare streamed contents against the expected contents of a file.
+
+    Only one chunk is held in memory at a time. The actual contents are hashed leaf by leaf and compared against the
+    tree of the expected file, which finds every differing range without reading the expected contents. The differing
+    ranges of the actual and expected contents are written to `ACTUAL_DATA_FILENAME` and `EXPECTED_DATA_FILENAME` if
+    `artifacts` is true.
+
+    :param name: What is being compared, for error messages.
+    :param chunks: The actual contents, in order.
+    :param expected: The expected file.
+    :param artifacts: Whether to write artifacts, by default unless within `no_artifacts`.
+    :raises VerificationError: If the contents differ.
+    """
+    comparator = ChunkComparator(name, expected, artifacts)
+    for chunk in chunks:
+        comparator.feed(chunk)
+    comparator.finish()
+
+
+async def compare_chunks_async(
+    name: object,
+    chunks: AsyncIterable[bytes],
+    expected: File,
+    artifacts: Optional[bool] = None,
+) -> None:
+    """
+    Compare contents streamed asynchronously against the expected contents of a file, see `compare_chunks`.
+
+    :param name: What is being compared, for error messages.
+    :param chunks: The actual contents, in order.
+    :param expected: The expected file.
+    :param artifacts: Whether to write artifacts, by default unless within `no_artifacts`.
+    :raises VerificationError: If the contents differ.
+    """
+    comparator = ChunkComparator(name, expected, artifacts)
+    async for chunk in chunks:
+        comparator.feed(chunk)
+    comparator.finish()
+
+
+def compare_samples(
+    name: object,
+    path: Path,
+    expected: File,
+    samples: int,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> None:
+    """
+    Compare randomly sampled blocks of a file against the expected contents.
+
+    This checks the size of the file and up to `samples` blocks of `SAMPLE_SIZE` bytes (or of the alignment of the
+    contents, if larger) that overlap the given range, rather than all of the file.
+
+    :param name: What is being compared, for error messages.
+    :param path: The file to sample.
+    :param expected: The expected file.
+    :param samples: The maximum number of blocks to compare.
+    :param start: The start of the range to sample.
+    :param end: The end of the range to sample, by default the end of the contents.
+    :raises VerificationError: If the contents differ.
+    """
+    content = expected.content
+    size = path.stat().st_size
+    if size != len(content):
+        raise VerificationError(f"{name} has size {size}, expected {len(content)}")
+    end = len(content) if end is None else end
+    block = max(SAMPLE_SIZE, content.alignment)
+    blocks = range(start // block, -(-end // block))
+    comparator = ChunkComparator(name, expected)
+    with path.open("rb", buffering=0) as f:
+        for index in sorted(_sampler.sample(blocks, min(samples, len(blocks)))):
+            comparator.check(index * block, os.pread(f.fileno(), block, index * block))
+
+
+class ChunkComparator:
+    """
+    Incremental comparison of contents against the expected file, one chunk at a time.
+
+    Chunks are regrouped into the leaves of the tree of the expected file, and every leaf whose hash differs is
+    recorded as a mismatching range, so a failure reports all of the ranges that differ rather than the first one.
+    """
+
+    def __init__(
+        self, name: object, expected: File, artifacts: Optional[bool] = None
+    ) -> None:
+        """
+        Initialize a new comparator.
+
+        :param name: What is being compared, for error messages.
+        :param expected: The expected file, which must be hashed.
+        :param artifacts: Whether a failed comparison writes its artifacts, by default unless within `no_artifacts`.
+        :raises StateError: If the expected file is not hashed.
+        """
+        if expected.tree is None:
+            raise StateError(
+                "Cannot compare contents against a file that is not hashed"
+            )
+        self.name = name
+        self.expected = expected
+        self.artifacts = _artifacts.get() if artifacts is None else artifacts
+        self._tree = expected.tree
+        self.offset = 0
+        #: The ranges that differ so far, as (start, end) offsets.
+        self.ranges: list[Tuple[int, int]] = []
+        self._pending = b""
+        self._problem: Optional[str] = None
+        self._actual = bytearray()
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Compare the next chunk of the contents.
+
+        :param chunk: The chunk following all chunks fed so far.
+        """
+        data = memoryview(self._pending + chunk)
+        cut = len(data) - len(data) % MerkleTree.LEAF_SIZE
+        for start in range(0, cut, MerkleTree.LEAF_SIZE):
+            self._compare_leaf(data[start : start + MerkleTree.LEAF_SIZE])
+        self._pending = bytes(data[cut:])
+
+    def _compare_leaf(self, leaf: memoryview) -> None:
+        offset = self.offset
+        self.offset += len(leaf)
+        index = offset // MerkleTree.LEAF_SIZE
+        if self.offset <= len(self.expected.content) and (
+            MerkleTree.leaf_digest(leaf) == self._tree.leaf(index)
+        ):
+            return
+
+        if self._problem is None:
+            within = bytes(leaf[: max(len(self.expected.content) - offset, 0)])
+            self._problem = self._describe(offset, within, len(leaf))
+        if self.ranges and self.ranges[-1][1] == offset:
+            self.ranges[-1] = (self.ranges[-1][0], self.offset)
+        else:
+            self.ranges.append((offset, self.offset))
+        self._actual += leaf[: MAX_ARTIFACT_SIZE - len(self._actual)]
+
+    def _describe(self, offset: int, within: bytes, length: int) -> Optional[str]:
+        problem = self.expected.content.mismatch(offset, within)
+        if problem is None and len(within) < length:
+            problem = f"is longer than the expected {len(self.expected.content)} bytes"
+        return problem
+
+    def check(self, offset: int, chunk: bytes) -> None:
+        """
+        Compare a chunk at any offset of the contents directly against the expected contents.
+
+        :param offset: The offset of the chunk, a multiple of the alignment of the contents.
+        :param chunk: The chunk.
+        :raises VerificationError: If the chunk differs from the expected contents at its offset.
+        """
+        if not chunk:
+            return
+        content = self.expected.content
+        problem = self._describe(
+            offset, chunk[: max(len(content) - offset, 0)], len(chunk)
+        )
+        if problem is not None:
+            end = offset + len(chunk)
+            message = f"{self.name} {problem}; bytes 0x{offset:04x} thru 0x{end:04x}"
+            if not self.artifacts:
+                raise VerificationError(f"{message} differ")
+            Path(ACTUAL_DATA_FILENAME).write_bytes(chunk)
+            Path(EXPECTED_DATA_FILENAME).write_bytes(content.read(offset, len(chunk)))
+            raise VerificationError(
+                f"{message} are at {ACTUAL_DATA_FILENAME}, expected at {EXPECTED_DATA_FILENAME}"
+            )
+
+    def finish(self) -> None:
+        """
+        Check that all of the expected contents were fed, and report the ranges that differ.
+
+        :raises VerificationError: If the contents differ or are shorter than expected.
+        """
+        if self._pending:
+            self._compare_leaf(memoryview(self._pending))
+            self._pending = b""
+        size = len(self.expected.content)
+        problems = []
+        if self.offset != size:
+            problems.append(f"has size {self.offset}, expected {size}")
+        if self.ranges:
+            problem = f"{self._problem or 'differs'}; {self._format_ranges()} differ"
+            if self.artifacts:
+                self._write_artifacts()
+                problem += f", concatenated at {ACTUAL_DATA_FILENAME}, expected at {EXPECTED_DATA_FILENAME}"
+            problems.append(problem)
+        if problems:
+            raise VerificationError(f"{self.name} {'; '.join(problems)}")
+
+    def _format_ranges(self, limit: int = 8) -> str:
+        shown = ", ".join(
+            f"0x{start:04x} thru 0x{end:04x}" for start, end in self.ranges[:limit]
+        )
+        if len(self.ranges) > limit:
+            shown += f" and {len(self.ranges) - limit} more ranges"
+        return f"bytes {shown}"
+
+    def _write_artifacts(self) -> None:
+        expected = bytearray()
+        for start, end in self.ranges:
+            if len(expected) >= len(self._actual):
+                break
+            expected += self.expected.content.read(
+                start, min(end - start, len(self._actual) - len(expected))
+            )
+        Path(ACTUAL_DATA_FILENAME).write_bytes(self._actual)
+        Path(EXPECTED_DATA_FILENAME).write_bytes(expected)
@@ -2,3 +2,10 @@
 
 ACTUAL_DATA_FILENAME = "actual.dat"
 EXPECTED_DATA_FILENAME = "expected.dat"
+
+#: Size of the chunks file contents are streamed in.
+CHUNK_SIZE = 1 << 20
+#: Size of the blocks compared when sampling file contents.
+SAMPLE_SIZE = 4096
+#: Maximum number of differing bytes written to each of the failure artifacts.
+MAX_ARTIFACT_SIZE = 1 << 22
@@ -0,0 +1,715 @@
+"""Models of file contents."""
+
+import abc
+import array
+import base64
+import bisect
+import random
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Self
+from typing import Tuple
+
+from sex.constants import CHUNK_SIZE
+from sex.payload import DEFAULT_PROFILE
+from sex.payload import PROFILES
+
+
+#: Size of the blocks of `BlockContent`.
+BLOCK_SIZE = 4096
+#: Header of the blocks of `BlockContent`: file id, block index, generation and CRC32 of the rest of the block.
+BLOCK_HEADER = struct.Struct("<QQqI")
+#: Generation of the blocks of holes, which are zero-filled.
+HOLE = -1
+
+
+def first_difference(a: bytes | memoryview, b: bytes | memoryview) -> int:
+    """
+    Find the first offset at which two buffers differ.
+
+    :param a: The first buffer.
+    :param b: The second buffer.
+    :return: The offset of the first differing byte, or the length of the shorter buffer if one is a prefix of the
+        other.
+    """
+    length = min(len(a), len(b))
+    step = 4096
+    for start in range(0, length, step):
+        end = min(start + step, length)
+        if a[start:end] != b[start:end]:
+            for i in range(start, end):
+                if a[i] != b[i]:
+                    return i
+    return length
+
+
+@dataclass(frozen=True)
+class Extent(abc.ABC):
+    """A contiguous range of file contents."""
+
+    @property
+    @abc.abstractmethod
+    def length(self) -> int:
+        """:return: The number of bytes in the extent."""
+
+    @abc.abstractmethod
+    def read(self, start: int, length: int) -> bytes:
+        """
+        Read a range of the extent.
+
+        :param start: The offset of the range within the extent.
+        :param length: The length of the range, which must lie within the extent.
+        :return: The bytes of the range.
+        """
+
+    @abc.abstractmethod
+    def slice(self, start: int, end: int) -> "Extent":
+        """
+        Get a part of the extent.
+
+        :param start: The offset of the part within the extent.
+        :param end: The offset just past the part within the extent.
+        :return: An extent with the contents of the part.
+        """
+
+    @abc.abstractmethod
+    def to_record(self) -> list[Any]:
+        """:return: A JSON-serializable description of the extent, see `extent_from_record`."""
+
+
+@dataclass(frozen=True)
+class Generated(Extent):
+    """A range of the stream of generated data of a seed, see `sex.payload.Profile`."""
+
+    seed: int
+    offset: int
+    size: int
+    #: The name of the profile of the data.
+    profile: str = DEFAULT_PROFILE
+
+    @property
+    def length(self) -> int:
+        return self.size
+
+    def read(self, start: int, length: int) -> bytes:
+        return PROFILES[self.profile].generate(self.seed, self.offset + start, length)
+
+    def slice(self, start: int, end: int) -> "Generated":
+        return Generated(self.seed, self.offset + start, end - start, self.profile)
+
+    def to_record(self) -> list[Any]:
+        return ["generated", self.seed, self.offset, self.size, self.profile]
+
+
+@dataclass(frozen=True)
+class Zero(Extent):
+    """A range of zero bytes, e.g. from extending a file."""
+
+    size: int
+
+    @property
+    def length(self) -> int:
+        return self.size
+
+    def read(self, start: int, length: int) -> bytes:
+        return bytes(length)
+
+    def slice(self, start: int, end: int) -> "Zero":
+        return Zero(end - start)
+
+    def to_record(self) -> list[Any]:
+        return ["zero", self.size]
+
+
+@dataclass(frozen=True)
+class Literal(Extent):
+    """A range of bytes that were given verbatim."""
+
+    data: bytes
+
+    @property
+    def length(self) -> int:
+        return len(self.data)
+
+    def read(self, start: int, length: int) -> bytes:
+        return self.data[start : start + length]
+
+    def slice(self, start: int, end: int) -> "Literal":
+        return Literal(self.data[start:end])
+
+    def to_record(self) -> list[Any]:
+        return ["literal", base64.b64encode(self.data).decode()]
+
+
+def extent_from_record(record: list[Any]) -> Extent:
+    """
+    Rebuild an extent from its description.
+
+    :param record: The description, see `Extent.to_record`.
+    :return: The extent.
+    :raises ValueError: If the description is not valid.
+    """
+    match record:
+        case ["generated", int(seed), int(offset), int(size), str(profile)]:
+            return Generated(seed, offset, size, profile)
+        case ["zero", int(size)]:
+            return Zero(size)
+        case ["literal", str(data)]:
+            return Literal(base64.b64decode(data))
+    raise ValueError(f"Invalid extent {record!r}")
+
+
+class Content(abc.ABC):
+    """
+    The contents of a file in the model.
+
+    Operations keep a `copy` of the contents they expect, which must not be affected by later changes to the file.
+    """
+
+    #: The name of the model, see `CONTENT_MODELS`.
+    name: str
+    #: Offsets and sizes of writes, truncations and created files must be multiples of this.
+    alignment = 1
+
+    @classmethod
+    @abc.abstractmethod
+    def zeros(cls, size: int) -> Self:
+        """
+        Create zero-filled contents.
+
+        :param size: The number of bytes.
+        """
+
+    @classmethod
+    def new(cls, size: int, file_id: int) -> Self:
+        """
+        Create the contents of a newly created file.
+
+        :param size: The number of bytes.
+        :param file_id: A random identifier of the new file.
+        """
+        return cls.zeros(size)
+
+    def overwrite(
+        self, offset: int, length: int, seed: int, profile: str = DEFAULT_PROFILE
+    ) -> "Content":
+        """
+        Create the data of a new write to these contents.
+
+        :param offset: The offset of the write.
+        :param length: The number of bytes to write.
+        :param seed: A random seed for the data.
+        :param profile: The name of the profile of the data, see `sex.payload.PROFILES`.
+        :return: The data to write, see `write`.
+        """
+        return generated(seed, length, profile)
+
+    def mismatch(self, offset: int, data: bytes) -> Optional[str]:
+        """
+        Check a range of actual contents against these contents.
+
+        :param offset: The offset of the range, a multiple of `alignment`.
+        :param data: The actual bytes of the range, which must lie within the contents.
+        :return: A description of how the range differs, or None if it matches.
+        """
+        expected = self.read(offset, len(data))
+        if data == expected:
+            return None
+        at = offset + first_difference(data, expected)
+        return f"differs from expected at offset 0x{at:04x} ({at})"
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """:return: The size of the contents in bytes."""
+
+    @abc.abstractmethod
+    def read(self, offset: int, length: int) -> bytes:
+        """
+        Read a range of the contents.
+
+        :param offset: The offset of the range.
+        :param length: The maximum length of the range; it is cut short at the end of the contents.
+        :return: The bytes of the range.
+        """
+
+    @abc.abstractmethod
+    def extents(self) -> list[Extent]:
+        """:return: Extents describing the contents, in order."""
+
+    def data_ranges(self, start: int, end: int) -> list[Tuple[int, int]]:
+        """
+        Find the parts of a range of the contents that may hold non-zero bytes.
+
+        :param start: The start of the range.
+        :param end: The end of the range.
+        :return: The disjoint (start, end) ranges, in order; everything else in the range is zero.
+        """
+        end = min(end, len(self))
+        return [(start, end)] if start < end else []
+
+    @abc.abstractmethod
+    def write(self, offset: int, data: "Content") -> None:
+        """
+        Overwrite a range of the contents, extending them if needed.
+
+        :param offset: The offset to write at. Any gap between the end of the contents and the offset is zero-filled.
+        :param data: The contents to write.
+        """
+
+    @abc.abstractmethod
+    def truncate(self, size: int) -> None:
+        """
+        Shrink the contents, or extend them with zeros.
+
+        :param size: The new size in bytes.
+        """
+
+    @abc.abstractmethod
+    def copy(self) -> Self:
+        """:return: Independent contents with the same bytes."""
+
+    @abc.abstractmethod
+    def to_record(self) -> dict[str, Any]:
+        """:return: A JSON-serializable description of the contents, see `content_from_record`."""
+
+    @classmethod
+    @abc.abstractmethod
+    def from_record(cls, record: dict[str, Any]) -> Self:
+        """
+        Rebuild contents of this model from their description.
+
+        :param record: The description, see `to_record`.
+        :return: The contents.
+        :raises ValueError: If the description is not valid.
+        """
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Read the contents in fixed-size chunks.
+
+        :param chunk_size: The size of every chunk but the last.
+        :return: An iterator over the chunks of the contents.
+        """
+        for offset in range(0, len(self), chunk_size):
+            yield self.read(offset, chunk_size)
+
+    def __bytes__(self) -> bytes:
+        """:return: All of the contents."""
+        return self.read(0, len(self))
+
+
+class BytesContent(Content):
+    """Contents held in memory in full."""
+
+    name = "bytes"
+
+    def __init__(self, data: bytes | bytearray = b"") -> None:
+        """
+        Initialize new contents.
+
+        :param data: The bytes of the contents.
+        """
+        self.data = bytearray(data)
+
+    @classmethod
+    def zeros(cls, size: int) -> Self:
+        return cls(bytes(size))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def read(self, offset: int, length: int) -> bytes:
+        return bytes(self.data[offset : offset + length])
+
+    def extents(self) -> list[Extent]:
+        return [Literal(bytes(self.data))]
+
+    def write(self, offset: int, data: Content) -> None:
+        if offset > len(self.data):
+            self.data.extend(bytes(offset - len(self.data)))
+        self.data[offset : offset + len(data)] = bytes(data)
+
+    def truncate(self, size: int) -> None:
+        if len(self.data) < size:
+            self.data.extend(bytes(size - len(self.data)))
+        else:
+            del self.data[size:]
+
+    def copy(self) -> Self:
+        return type(self)(self.data)
+
+    def to_record(self) -> dict[str, Any]:
+        return {"model": self.name, "data": base64.b64encode(self.data).decode()}
+
+    @classmethod
+    def from_record(cls, record: dict[str, Any]) -> Self:
+        return cls(base64.b64decode(record["data"]))
+
+
+class ExtentContent(Content):
+    """
+    Contents described by extents of data at given offsets, whose bytes are produced on demand.
+
+    Ranges that no extent covers are holes, which read as zeros and cost nothing, so zero-filled files and extending
+    truncations cost the same at any size. Generated data only costs its seed, offset and length, so the size of the
+    model depends on the number of writes rather than on the size of the files. Extents are kept sorted by offset, so
+    writes, truncations and reads find the extents they touch by binary search.
+    """
+
+    name = "extents"
+
+    def __init__(self, extents: list[Extent] | None = None) -> None:
+        """
+        Initialize new contents.
+
+        :param extents: The extents of the contents, in order; `Zero` extents become holes.
+        """
+        self._offsets: list[int] = []
+        self._extents: list[Extent] = []
+        self._size = 0
+        for extent in extents or []:
+            if extent.length and not isinstance(extent, Zero):
+                self._offsets.append(self._size)
+                self._extents.append(extent)
+            self._size += extent.length
+
+    @classmethod
+    def zeros(cls, size: int) -> Self:
+        content = cls()
+        content._size = size
+        return content
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, offset: int, length: int) -> bytes:
+        end = min(offset + length, self._size)
+        if end <= offset:
+            return b""
+        data = bytearray(end - offset)
+        for position, extent in self._mapped(offset, end):
+            start = position - offset
+            data[start : start + extent.length] = extent.read(0, extent.length)
+        return bytes(data)
+
+    def extents(self) -> list[Extent]:
+        extents: list[Extent] = []
+        position = 0
+        for offset, extent in zip(self._offsets, self._extents, strict=True):
+            if offset > position:
+                extents.append(Zero(offset - position))
+            extents.append(extent)
+            position = offset + extent.length
+        if self._size > position:
+            extents.append(Zero(self._size - position))
+        return extents
+
+    def data_ranges(self, start: int, end: int) -> list[Tuple[int, int]]:
+        return [
+            (position, position + extent.length)
+            for position, extent in self._mapped(start, end)
+        ]
+
+    def _mapped(self, start: int, end: int) -> list[Tuple[int, Extent]]:
+        # the extents overlapping a range of the contents and their offsets, cut to the range
+        mapped = []
+        for index in range(self._first(start), bisect.bisect_left(self._offsets, end)):
+            offset, extent = self._offsets[index], self._extents[index]
+            cut_start = max(start - offset, 0)
+            cut_end = min(end - offset, extent.length)
+            mapped.append((offset + cut_start, extent.slice(cut_start, cut_end)))
+        return mapped
+
+    def _first(self, offset: int) -> int:
+        # the index of the first extent that ends past the offset
+        index = bisect.bisect_right(self._offsets, offset) - 1
+        if index < 0 or self._offsets[index] + self._extents[index].length <= offset:
+            index += 1
+        return index
+
+    def _clear(self, start: int, end: int) -> int:
+        # punch a hole over a range, returning the index extents inserted at its start would go at
+        first = self._first(start)
+        last = bisect.bisect_left(self._offsets, end)
+        kept = []
+        if first < last:
+            offset, extent = self._offsets[first], self._extents[first]
+            if offset < start:
+                kept.append((offset, extent.slice(0, start - offset)))
+            offset, extent = self._offsets[last - 1], self._extents[last - 1]
+            if offset + extent.length > end:
+                kept.append((end, extent.slice(end - offset, extent.length)))
+        self._offsets[first:last] = [offset for offset, _ in kept]
+        self._extents[first:last] = [extent for _, extent in kept]
+        return first + (1 if kept and kept[0][0] < start else 0)
+
+    def write(self, offset: int, data: Content) -> None:
+        end = offset + len(data)
+        index = self._clear(offset, end)
+        offsets = []
+        extents = []
+        position = offset
+        for extent in data.extents():
+            if extent.length and not isinstance(extent, Zero):
+                offsets.append(position)
+                extents.append(extent)
+            position += extent.length
+        self._offsets[index:index] = offsets
+        self._extents[index:index] = extents
+        self._size = max(self._size, end)
+
+    def truncate(self, size: int) -> None:
+        if size < self._size:
+            self._clear(size, self._size)
+        self._size = size
+
+    def copy(self) -> Self:
+        copy = type(self)()
+        copy._offsets = list(self._offsets)
+        copy._extents = list(self._extents)
+        copy._size = self._size
+        return copy
+
+    def to_record(self) -> dict[str, Any]:
+        return {
+            "model": self.name,
+            "size": self._size,
+            "extents": [
+                [offset, *extent.to_record()]
+                for offset, extent in zip(self._offsets, self._extents, strict=True)
+            ],
+        }
+
+    @classmethod
+    def from_record(cls, record: dict[str, Any]) -> Self:
+        content = cls.zeros(record["size"])
+        for offset, *extent in record["extents"]:
+            content._offsets.append(offset)
+            content._extents.append(extent_from_record(extent))
+        return content
+
+
+class BlockContent(Content):
+    """
+    Contents made of self-describing blocks of `BLOCK_SIZE` bytes.
+
+    Every block starts with a `BLOCK_HEADER` of the id of its file, its index in the file, the generation of the
+    write that produced it and the CRC32 of the rest of the block, which is generated from the other three. Holes
+    (from extending a file) are zero-filled blocks of generation `HOLE`.
+
+    A block read back can therefore be checked for corruption, misplacement and staleness from its own bytes and the
+    generation the model expects, without the model holding any data. All offsets and sizes are multiples of
+    `BLOCK_SIZE`.
+    """
+
+    name = "blocks"
+    alignment = BLOCK_SIZE
+
+    def __init__(
+        self, file_id: int, generations: Iterable[int] = (), first: int = 0
+    ) -> None:
+        """
+        Initialize new contents.
+
+        :param file_id: The id of the file.
+        :param generations: The generation of every block.
+        :param first: The index of the first block in the file, for contents that are only part of a file.
+        """
+        self.file_id = file_id
+        self.generations = array.array("q", generations)
+        self.first = first
+        #: The latest generation of any block.
+        self.generation = max(self.generations, default=0)
+
+    @classmethod
+    def zeros(cls, size: int) -> Self:
+        return cls(0, [HOLE] * cls._blocks(size))
+
+    @classmethod
+    def new(cls, size: int, file_id: int) -> Self:
+        return cls(file_id, [0] * cls._blocks(size))
+
+    @staticmethod
+    def _blocks(size: int) -> int:
+        if size % BLOCK_SIZE:
+            raise ValueError(f"Size {size} is not a multiple of {BLOCK_SIZE}")
+        return size // BLOCK_SIZE
+
+    def __len__(self) -> int:
+        return len(self.generations) * BLOCK_SIZE
+
+    def block(self, index: int) -> bytes:
+        """
+        Generate a block.
+
+        :param index: The index of the block in these contents.
+        :return: The bytes of the block.
+        """
+        generation = self.generations[index]
+        if generation == HOLE:
+            return bytes(BLOCK_SIZE)
+        index += self.first
+        payload = random.Random(
+            (self.file_id << 96) | (index << 32) | generation
+        ).randbytes(BLOCK_SIZE - BLOCK_HEADER.size)
+        return (
+            BLOCK_HEADER.pack(self.file_id, index, generation, zlib.crc32(payload))
+            + payload
+        )
+
+    def read(self, offset: int, length: int) -> bytes:
+        end = min(offset + length, len(self))
+        if end <= offset:
+            return b""
+        first = offset // BLOCK_SIZE
+        data = b"".join(
+            self.block(index) for index in range(first, (end - 1) // BLOCK_SIZE + 1)
+        )
+        start = offset - first * BLOCK_SIZE
+        return data[start : start + end - offset]
+
+    def extents(self) -> list[Extent]:
+        return [Literal(bytes(self))]
+
+    def overwrite(
+        self, offset: int, length: int, seed: int, profile: str = DEFAULT_PROFILE
+    ) -> Content:
+        # blocks describe themselves, so their data has no profile
+        first = self._blocks(offset)
+        return BlockContent(
+            self.file_id, [self.generation + 1] * self._blocks(length), first
+        )
+
+    def write(self, offset: int, data: Content) -> None:
+        if not isinstance(data, BlockContent) or data.file_id != self.file_id:
+            raise ValueError(
+                "Block contents can only be overwritten with their own blocks"
+            )
+        first = self._blocks(offset)
+        if data.first != first:
+            raise ValueError(
+                f"Blocks of offset {data.first * BLOCK_SIZE} written at {offset}"
+            )
+        if first > len(self.generations):
+            self.generations.extend([HOLE] * (first - len(self.generations)))
+        self.generations[first : first + len(data.generations)] = data.generations
+        self.generation = max(self.generation, data.generation)
+
+    def truncate(self, size: int) -> None:
+        blocks = self._blocks(size)
+        if blocks > len(self.generations):
+            self.generations.extend([HOLE] * (blocks - len(self.generations)))
+        else:
+            del self.generations[blocks:]
+
+    def copy(self) -> Self:
+        copy = type(self)(self.file_id, self.generations, self.first)
+        copy.generation = self.generation
+        return copy
+
+    def to_record(self) -> dict[str, Any]:
+        # generations are run-length encoded, as writes produce runs of a single generation
+        runs: list[list[int]] = []
+        for generation in self.generations:
+            if runs and runs[-1][0] == generation:
+                runs[-1][1] += 1
+            else:
+                runs.append([generation, 1])
+        return {
+            "model": self.name,
+            "file_id": self.file_id,
+            "first": self.first,
+            "generation": self.generation,
+            "generations": runs,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict[str, Any]) -> Self:
+        content = cls(
+            record["file_id"],
+            (
+                generation
+                for generation, count in record["generations"]
+                for _ in range(count)
+            ),
+            record["first"],
+        )
+        content.generation = record["generation"]
+        return content
+
+    def mismatch(self, offset: int, data: bytes) -> Optional[str]:
+        for start in range(0, len(data), BLOCK_SIZE):
+            block = data[start : start + BLOCK_SIZE]
+            at = offset + start
+            index = at // BLOCK_SIZE
+            generation = self.generations[index]
+            where = f"block {index} at offset 0x{at:04x} ({at})"
+            if generation == HOLE:
+                if any(block):
+                    return f"{where} should be a hole but is not zero-filled"
+                continue
+            if len(block) < BLOCK_SIZE:
+                return f"{where} is cut short at {len(block)} bytes"
+            file_id, actual_index, actual_generation, crc = BLOCK_HEADER.unpack_from(
+                block
+            )
+            if zlib.crc32(block[BLOCK_HEADER.size :]) != crc:
+                return f"{where} is corrupt: its CRC32 does not match its header"
+            if (file_id, actual_index) != (self.file_id, index + self.first):
+                return (
+                    f"{where} is block {actual_index} of file {file_id:#x}, "
+                    f"expected file {self.file_id:#x}"
+                )
+            if actual_generation != generation:
+                return (
+                    f"{where} has generation {actual_generation}, expected {generation}"
+                    + (" (stale)" if actual_generation < generation else "")
+                )
+        return None
+
+
+#: The content models that can be chosen from, by name.
+CONTENT_MODELS: dict[str, type[Content]] = {
+    "bytes": BytesContent,
+    "extents": ExtentContent,
+    "blocks": BlockContent,
+}
+
+
+def content_from_record(record: dict[str, Any]) -> Content:
+    """
+    Rebuild contents of any model from their description.
+
+    :param record: The description, see `Content.to_record`.
+    :return: The contents.
+    :raises ValueError: If the description is not valid.
+    """
+    try:
+        return CONTENT_MODELS[record["model"]].from_record(record)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid contents {record!r}") from e
+
+
+def generated(seed: int, length: int, profile: str = DEFAULT_PROFILE) -> ExtentContent:
+    """
+    Create contents from the stream of generated data of a seed.
+
+    :param seed: The seed of the stream, see `sex.payload.Profile.generate`.
+    :param length: The number of bytes.
+    :param profile: The name of the profile of the data.
+    """
+    return ExtentContent([Generated(seed, 0, length, profile)])
+
+
+def literal(data: bytes) -> ExtentContent:
+    """
+    Create contents from the given bytes.
+
+    :param data: The bytes.
+    """
+    return ExtentContent([Literal(bytes(data))])
@@ -0,0 +1,293 @@
+"""Asyncio execution engine."""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import Callable
+from typing import Optional
+from typing import Self
+
+import click
+
+from sex.async_api import AsyncApi
+from sex.locks import AsyncPathLocks
+from sex.metrics import Metrics
+from sex.operation import Operation
+from sex.planner import random_operations
+from sex.state import State
+from sex.trace import TraceWriter
+from sex.verification import OperationFailedError
+from sex.verification import format_convergence
+from sex.watch import BackoffWatcher
+
+
+#: Default number of threads doing mount I/O for the asyncio engine.
+DEFAULT_MOUNT_WORKERS = 8
+
+
+async def verify_operation_async(
+    clients: list[Path | AsyncApi],
+    operation: Operation,
+    timeout: float,
+    show_progress: bool,
+    executor: ThreadPoolExecutor,
+) -> dict[Path | AsyncApi, float]:
+    """
+    Verify that an operation was successfully applied to all clients, from an event loop.
+
+    This is the asynchronous counterpart of `sex.verification.verify_operation`: every client has its own retry loop,
+    as a task rather than a thread. Mounts are verified on `executor`; between retries, tasks back off the same way
+    as a `BackoffWatcher` does.
+
+    :param clients: list of clients to verify the operation on.
+    :param operation: The operation to verify.
+    :param timeout: The timeout in seconds for verification on **each** client, counted from the call.
+    :param show_progress: If true, print remaining timeout to stdout while verifying.
+    :param executor: The executor to run mount I/O on.
+    :return: The time in seconds each client took to converge.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+
+    def print_progress(msg: str = "") -> None:
+        if show_progress:
+            print(msg.ljust(80), end="\r")
+
+    async def verify_client(client: Path | AsyncApi) -> float:
+        delay = BackoffWatcher.MIN_DELAY
+        while True:
+            try:
+                if isinstance(client, Path):
+                    await loop.run_in_executor(executor, operation.verify, client)
+                else:
+                    await operation.verify_async_api(client)
+            except Exception as e:
+                remaining = timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    raise e from None
+
+                print_progress(
+                    f"Verifying {operation.name} on {client}... ({remaining:.2f}s)",
+                )
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * 2, BackoffWatcher.MAX_DELAY)
+            else:
+                return time.perf_counter() - start
+            finally:
+                print_progress()
+
+    tasks = [asyncio.create_task(verify_client(client)) for client in clients]
+    try:
+        # the first failure is raised right away, abandoning the other clients
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if (error := task.exception()) is not None:
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+    return {client: task.result() for client, task in zip(clients, tasks, strict=True)}
+
+
+class AsyncEngine:
+    """
+    Execute and verify operations from a single event loop.
+
+    Like the `sex.scheduler.Scheduler`, up to `concurrency` operations over disjoint paths are in flight at once,
+    each holding the locks on its paths until it has been verified on every client, and operations are applied to the
+    model in dispatch order. API requests of all operations share the loop, while mount I/O runs on a bounded pool of
+    `mount_workers` threads, so a single process can keep hundreds of requests in flight.
+    """
+
+    def __init__(
+        self,
+        clients: list[Path | AsyncApi],
+        timeout: float,
+        show_progress: bool,
+        verbose: bool,
+        concurrency: int,
+        mount_workers: int = DEFAULT_MOUNT_WORKERS,
+        on_verified: Optional[Callable[[int, Operation], None]] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        """
+        Initialize a new engine.
+
+        :param clients: list of clients to execute and verify operations on.
+        :param timeout: The verification timeout in seconds, see `verify_operation_async`.
+        :param show_progress: If true, print remaining timeout to stdout while verifying.
+        :param verbose: If true, print convergence times of every verified operation.
+        :param concurrency: The maximum number of operations in flight at once.
+        :param mount_workers: The number of threads doing mount I/O.
+        :param on_verified: Called with the index and operation of every operation once it has been verified.
+        :param metrics: Where to record the latency of every execution and verification.
+        """
+        self.clients = clients
+        self.timeout = timeout
+        self.show_progress = show_progress
+        self.verbose = verbose
+        self.concurrency = max(concurrency, 1)
+        self.on_verified = on_verified
+        self.metrics = metrics
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=mount_workers, thread_name_prefix="mount"
+        )
+        self._locks = AsyncPathLocks()
+        self._slots = asyncio.BoundedSemaphore(self.concurrency)
+        self._pending: set[asyncio.Task[None]] = set()
+        self._failure: Optional[BaseException] = None
+
+    async def __aenter__(self) -> Self:
+        """Enter the engine context."""
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Exit the engine context, waiting for (or on error, abandoning) outstanding operations."""
+        try:
+            if exc_type is None:
+                await self.drain()
+            else:
+                for task in self._pending:
+                    task.cancel()
+                await asyncio.gather(*self._pending, return_exceptions=True)
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            for client in self.clients:
+                if isinstance(client, AsyncApi):
+                    await client.close()
+
+    def _raise_failure(self) -> None:
+        if self._failure is not None:
+            raise self._failure
+
+    async def dispatch(
+        self, n: int, operation: Operation, client: Path | AsyncApi, state: State
+    ) -> None:
+        """
+        Apply an operation to the model and start executing and verifying it.
+
+        Waits while `concurrency` operations are in flight or while an earlier operation on a conflicting path is.
+
+        :param n: The index of the operation, for reporting.
+        :param operation: The operation to run.
+        :param client: The client to execute the operation on.
+        :param state: The model to apply the operation to.
+        :raises Exception: The error of an earlier operation that failed.
+        """
+        self._raise_failure()
+        await self._slots.acquire()
+        await self._locks.acquire(operation.read_paths(), operation.write_paths())
+        self._raise_failure()
+        operation.update(state)
+        task = asyncio.create_task(self._run_and_release(n, operation, client))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def drain(self) -> None:
+        """
+        Wait for all outstanding operations.
+
+        :raises Exception: The error of the first operation that failed.
+        """
+        while self._pending:
+            await asyncio.wait(list(self._pending))
+        self._raise_failure()
+
+    async def _execute(
+        self, n: int, operation: Operation, client: Path | AsyncApi
+    ) -> float:
+        start = time.perf_counter()
+        try:
+            if isinstance(client, Path):
+                await asyncio.get_running_loop().run_in_executor(
+                    self._executor, operation.execute, client
+                )
+            else:
+                await operation.execute_async_api(client)
+        except Exception as e:
+            raise OperationFailedError(n, operation) from e
+        end = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.record(operation.name, "execute", client, end - start)
+        return end
+
+    async def _verify(
+        self, n: int, operation: Operation, writer: Path | AsyncApi, executed_at: float
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            convergence = await verify_operation_async(
+                self.clients,
+                operation,
+                self.timeout,
+                self.show_progress,
+                self._executor,
+            )
+        except Exception as e:
+            raise OperationFailedError(n, operation) from e
+        if self.verbose:
+            click.echo(f"{n}: verified in {format_convergence(convergence)}")
+        if self.metrics is not None:
+            for client, elapsed in convergence.items():
+                self.metrics.record(operation.name, "verify", client, elapsed)
+                # only changes propagate, so only they have a visibility latency
+                if client != writer and operation.write_paths():
+                    self.metrics.record_visibility(
+                        writer, client, start - executed_at + elapsed
+                    )
+        if self.on_verified is not None:
+            self.on_verified(n, operation)
+
+    async def _run_and_release(
+        self, n: int, operation: Operation, client: Path | AsyncApi
+    ) -> None:
+        try:
+            executed_at = await self._execute(n, operation, client)
+            await self._verify(n, operation, client, executed_at)
+        except Exception as e:
+            # raised from `dispatch` or `drain`, so that the task itself completes quietly
+            if self._failure is None:
+                self._failure = e
+        finally:
+            await self._locks.release(operation.read_paths(), operation.write_paths())
+            self._slots.release()
+
+
+async def exercise_random_async(
+    state: State,
+    verbose: bool,
+    num_operations: int,
+    operations: list[type[Operation]],
+    engine: AsyncEngine,
+    trace: Optional[TraceWriter] = None,
+) -> None:
+    """
+    Run the exerciser with random operations on the asyncio engine.
+
+    For a given seed, this generates the same operations as `sex.exerciser.exercise_random`.
+
+    :param num_operations: The number of operations to generate.
+    :param operations: The types of operations to pick from.
+    :param engine: The engine to dispatch operations through.
+    :param trace: Where to record every operation before it is dispatched.
+    """
+    clients = engine.clients
+    for n, operation, main_client in random_operations(
+        state, clients, num_operations, operations
+    ):
+        if verbose:
+            click.echo(f"{n}: {operation} on {main_client}")
+
+        if trace is not None:
+            trace.write(n, operation, clients.index(main_client))
+
+        # apply, execute and verify it
+        await engine.dispatch(n, operation, main_client, state)
@@ -1,14 +1,36 @@
 """SEx main command."""
 
+import asyncio
+import json
 import random
-import time
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Callable
 from typing import Optional
 
 import click
 
+from sex.api import DEFAULT_POOL_SIZE
 from sex.api import Api
 from sex.api import ApiAddrType
+from sex.async_api import AsyncApi
+from sex.audit import DEFAULT_AUDIT_JOBS
+from sex.audit import AuditError
+from sex.audit import Auditor
+from sex.audit import audit
+from sex.bisection import Bisector
+from sex.checkpoint import Checkpoint
+from sex.checkpoint import Checkpointer
+from sex.checkpoint import CheckpointError
+from sex.checkpoint import load_checkpoint
+from sex.content import CONTENT_MODELS
+from sex.engine import DEFAULT_MOUNT_WORKERS
+from sex.engine import AsyncEngine
+from sex.engine import exercise_random_async
+from sex.metrics import Metrics
+from sex.minimize import Minimizer
+from sex.minimize import read_candidate
+from sex.minimize import write_trace
 from sex.operation import Operation
 from sex.operations.create import Create
 from sex.operations.delete import Delete
@@ -16,10 +38,30 @@ from sex.operations.listdir import Listdir
 from sex.operations.read import Read
 from sex.operations.truncate import Truncate
 from sex.operations.write import Write
+from sex.payload import DEFAULT_PROFILE
+from sex.payload import PROFILES
+from sex.planner import plan_random
+from sex.planner import random_operations
+from sex.scheduler import DependencyScheduler
+from sex.scheduler import Scheduler
+from sex.sharding import prepare_shards
+from sex.sharding import remove_shards
+from sex.sharding import run_shard
+from sex.sharding import run_workers
+from sex.sizes import DEFAULT_FILE_SIZES
+from sex.sizes import SizeDistribution
+from sex.sizes import SizeDistributionType
+from sex.sizes import parse_size_distribution
 from sex.state import State
+from sex.state import StateError
+from sex.trace import TraceError
+from sex.trace import TraceWriter
+from sex.trace import from_record
+from sex.trace import read_trace
+from sex.verification import VerificationPipeline
 
 
-operations = [Read, Write, Create, Delete, Truncate, Listdir]
+operations: list[type[Operation]] = [Read, Write, Create, Delete, Truncate, Listdir]
 
 
 @click.command()
@@ -32,7 +74,92 @@ operations = [Read, Write, Create, Delete, Truncate, Listdir]
     type=click.Path(
         exists=True, file_okay=True, dir_okay=False, resolve_path=True, path_type=Path
     ),
-    help="Path to a position file to run.",
+    help="Path to a trace to replay, see --trace.",
+)
+@click.option(
+    "--trace",
+    "trace_path",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Write a trace of the operations of the run to a file, to replay with --position.",
+)
+@click.option(
+    "--plan",
+    "plan_path",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help=(
+        "Only generate the operations of the run against the model, without running them, and write them to a trace "
+        "to run later with --position. Requires --num-operations."
+    ),
+)
+@click.option(
+    "--trace-digests",
+    is_flag=True,
+    help="Record the digests of the files that operations expect in the trace, to check replays against.",
+)
+@click.option(
+    "--checkpoint-dir",
+    type=click.Path(file_okay=False, writable=True, path_type=Path),
+    help="Periodically write checkpoints of the model to a directory, to resume the run from with --resume.",
+)
+@click.option(
+    "--checkpoint-every",
+    type=click.IntRange(min=1),
+    default=10000,
+    help="Number of operations between checkpoints.",
+)
+@click.option(
+    "--resume",
+    type=click.Path(
+        exists=True, file_okay=True, dir_okay=False, resolve_path=True, path_type=Path
+    ),
+    help=(
+        "Continue a run from a checkpoint, see --checkpoint-dir, with the options it was taken with. The mounts "
+        "must hold the files of the checkpoint."
+    ),
+)
+@click.option(
+    "--bisect",
+    "bisect_dir",
+    type=click.Path(
+        exists=True, file_okay=False, dir_okay=True, resolve_path=True, path_type=Path
+    ),
+    help=(
+        "Find the earliest operation after which the mounts diverge from the model, among the first "
+        "--num-operations operations of the run that wrote the checkpoints in a directory. Every attempt restarts "
+        "from a checkpoint in a fresh subdirectory of the mounts."
+    ),
+)
+@click.option(
+    "--minimize",
+    "minimize_path",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help=(
+        "Shrink the failing trace given with --position to a small subsequence of its operations that fails the "
+        "same way, and write it to a file. Every attempt runs in a fresh subdirectory of the mounts."
+    ),
+)
+@click.option(
+    "--minimize-jobs",
+    type=click.IntRange(min=1),
+    default=4,
+    help="Number of attempts of --minimize run at once.",
+)
+@click.option(
+    "--audit-every",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Compare the whole namespace of every client with the model every N operations.",
+)
+@click.option(
+    "--audit-at-exit",
+    is_flag=True,
+    help="Compare the whole namespace of every client with the model at the end of the run.",
+)
+@click.option(
+    "--audit-jobs",
+    type=click.IntRange(min=1),
+    default=DEFAULT_AUDIT_JOBS,
+    help="Number of threads listing directories and hashing files during audits.",
 )
 @click.option(
     "-i",
@@ -51,6 +178,93 @@ operations = [Read, Write, Create, Delete, Truncate, Listdir]
 @click.option(
     "-t", "--timeout", type=float, help="Verification timeout in seconds.", default=60
 )
+@click.option(
+    "--pipeline",
+    "window",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Keep executing while up to N operations are verified in the background.",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Execute up to N operations over disjoint paths at once.",
+)
+@click.option(
+    "--replay-jobs",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Replay up to N operations of a trace at once, ordering only those that depend on each other's paths.",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(["threads", "asyncio"]),
+    default="threads",
+    help="Run operations on threads, or on a single asyncio event loop.",
+)
+@click.option(
+    "--mount-workers",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MOUNT_WORKERS,
+    help="Number of threads doing mount I/O for the asyncio engine.",
+)
+@click.option(
+    "--content-model",
+    type=click.Choice(list(CONTENT_MODELS)),
+    default="extents",
+    help=(
+        "Keep the contents of modeled files as extents of generated data regenerated on demand, in memory in "
+        "full, or as self-describing 4 KiB blocks checked from their headers."
+    ),
+)
+@click.option(
+    "--verify-samples",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Verify N random 4 KiB blocks of files read from mounts instead of their whole contents.",
+)
+@click.option(
+    "--file-size",
+    "file_sizes",
+    type=SizeDistributionType(),
+    default=str(DEFAULT_FILE_SIZES),
+    help=(
+        "Sizes of created and truncated files: a fixed size N, a uniform range MIN-MAX or a log-uniform range "
+        "log:MIN-MAX, with optional K/M/G/T suffixes, e.g. log:4K-8G."
+    ),
+)
+@click.option(
+    "--payload",
+    type=click.Choice(list(PROFILES)),
+    default=DEFAULT_PROFILE,
+    help=(
+        "Data of writes: incompressible random bytes, compressible text, repeated 4 KiB chunks for deduplication, "
+        "or zeros."
+    ),
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Run N worker processes, each in its own subdirectory with its own seed.",
+)
+@click.option(
+    "--shard",
+    type=click.IntRange(min=0),
+    help="Only run the given shard of a --workers run, in this process.",
+)
+@click.option(
+    "--report",
+    type=click.Choice(["text", "json"]),
+    default="text",
+    help="Format of the latency and throughput report printed at the end of the run.",
+)
+@click.option(
+    "--report-file",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Write the report to a file instead of stdout.",
+)
 @click.option(
     "-c",
     "--cleanup",
@@ -75,17 +289,62 @@ operations = [Read, Write, Create, Delete, Truncate, Listdir]
     multiple=True,
     type=ApiAddrType(),
 )
+@click.option(
+    "--api-pool-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_POOL_SIZE,
+    help="Maximum number of connections kept open to each API server.",
+)
+@click.option(
+    "--api-keep-alive/--no-api-keep-alive",
+    default=True,
+    help="Reuse connections to the API servers across requests.",
+)
+@click.option(
+    "--api-retries",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Retry API requests that failed to connect up to N times.",
+)
 def exercise(
     verbose: bool,
     position: Optional[Path],
+    trace_path: Optional[Path],
+    plan_path: Optional[Path],
+    trace_digests: bool,
+    checkpoint_dir: Optional[Path],
+    checkpoint_every: int,
+    resume: Optional[Path],
+    bisect_dir: Optional[Path],
+    minimize_path: Optional[Path],
+    minimize_jobs: int,
+    audit_every: int,
+    audit_at_exit: bool,
+    audit_jobs: int,
     seed: Optional[int],
     interactive: Optional[int],
     progress: bool,
-    num_operations: Optional[int],
+    num_operations: int,
     timeout: float,
+    window: int,
+    concurrency: int,
+    replay_jobs: int,
+    engine: str,
+    mount_workers: int,
+    content_model: str,
+    verify_samples: int,
+    file_sizes: SizeDistribution,
+    payload: str,
+    workers: int,
+    shard: Optional[int],
+    report: str,
+    report_file: Optional[Path],
     cleanup: Optional[Path],
     mountpoints: list[Path],
     apis: list[Api],
+    api_pool_size: int,
+    api_keep_alive: bool,
+    api_retries: int,
 ) -> None:
     """Run the exerciser."""
     if not mountpoints and not apis:
@@ -93,130 +352,501 @@ def exercise(
             "At least one mountpoint or API URL must be provided."
         )
 
+    if window and concurrency:
+        raise click.ClickException("--pipeline and --concurrency are exclusive.")
+
+    if replay_jobs and (
+        not position or window or concurrency or interactive is not None
+    ):
+        raise click.ClickException(
+            "--replay-jobs requires --position, and cannot be combined with --pipeline, --concurrency or "
+            "--interactive."
+        )
+
+    if engine == "asyncio" and (window or position or interactive is not None):
+        raise click.ClickException(
+            "The asyncio engine cannot be combined with --pipeline, --position or --interactive."
+        )
+
+    if workers and (position or interactive is not None or trace_path):
+        raise click.ClickException(
+            "--workers cannot be combined with --position, --interactive or --trace."
+        )
+
+    if position and trace_path:
+        raise click.ClickException("--position and --trace are exclusive.")
+
+    if plan_path and (position or trace_path or workers or interactive is not None):
+        raise click.ClickException(
+            "--plan cannot be combined with --position, --trace, --workers or --interactive."
+        )
+
+    if plan_path and num_operations == -1:
+        raise click.ClickException("--plan requires --num-operations.")
+
+    if (checkpoint_dir or resume) and (
+        position or plan_path or workers or concurrency or engine == "asyncio"
+    ):
+        raise click.ClickException(
+            "--checkpoint-dir and --resume cannot be combined with --position, --plan, --workers, --concurrency "
+            "or the asyncio engine."
+        )
+
+    if resume and trace_path:
+        raise click.ClickException("--resume and --trace are exclusive.")
+
+    if bisect_dir and (
+        position
+        or plan_path
+        or trace_path
+        or checkpoint_dir
+        or resume
+        or workers
+        or window
+        or concurrency
+        or interactive is not None
+        or engine == "asyncio"
+    ):
+        raise click.ClickException(
+            "--bisect cannot be combined with --position, --plan, --trace, --checkpoint-dir, --resume, --workers, "
+            "--pipeline, --concurrency, --interactive or the asyncio engine."
+        )
+
+    if minimize_path and (
+        not position
+        or not cleanup
+        or trace_path
+        or checkpoint_dir
+        or bisect_dir
+        or window
+        or concurrency
+        or replay_jobs
+        or interactive is not None
+    ):
+        raise click.ClickException(
+            "--minimize requires --position and --cleanup, and cannot be combined with --trace, --checkpoint-dir, "
+            "--bisect, --pipeline, --concurrency, --replay-jobs or --interactive."
+        )
+
+    if (audit_every or audit_at_exit) and (
+        plan_path or bisect_dir or minimize_path or workers or engine == "asyncio"
+    ):
+        raise click.ClickException(
+            "--audit-every and --audit-at-exit cannot be combined with --plan, --bisect, --minimize, --workers or "
+            "the asyncio engine."
+        )
+
+    if bisect_dir and (num_operations == -1 or not mountpoints):
+        raise click.ClickException(
+            "--bisect requires --num-operations and at least one mountpoint."
+        )
+
+    if shard is not None and shard >= workers:
+        raise click.ClickException("--shard must be one of the shards of --workers.")
+
     if cleanup and cleanup not in mountpoints:
         raise click.ClickException("Path to clean up must be a mountpoint.")
 
-    # ensure mountpoints are empty
-    for mountpoint in mountpoints:
-        existing_paths = [
-            path for path in mountpoint.iterdir() if not path.name.startswith(".")
-        ]
-        if existing_paths:
+    clients: list[Path | Api] = [*mountpoints, *apis]
+    names = [str(client) for client in clients]
+    # `name` is a class property, see `sex.trace.OPERATIONS`
+    operation_names = [str(operation.name) for operation in operations]
+
+    checkpoint: Optional[Checkpoint] = None
+    if resume:
+        try:
+            checkpoint = load_checkpoint(resume)
+        except CheckpointError as e:
+            raise click.ClickException(str(e)) from e
+        if checkpoint.clients != names:
             raise click.ClickException(
-                f"Mountpoint {mountpoint} is not empty: {", ".join(str(p) for p in existing_paths)} exist.\n"
+                f"The checkpoint was taken with clients {", ".join(checkpoint.clients)}, not {", ".join(names)}."
             )
-
-    # ensure apis are empty
-    for api_url in apis:
-        existing_paths = [Path(obj["path"]) for obj in api_url.listdir("/")]
-        existing_paths = [
-            path for path in existing_paths if not path.name.startswith(".")
-        ]
-        if existing_paths:
+        # operations are picked at random from this list, so a different list makes a different run
+        if checkpoint.options["operations"] != operation_names:
             raise click.ClickException(
-                f"API {api_url.url} is not empty: {", ".join(str(p) for p in existing_paths)} exist.\n"
+                f"The checkpoint was taken with operations {", ".join(checkpoint.options["operations"])}, "
+                f"not {", ".join(operation_names)}."
             )
-
-    with State(cleanup) as state:
-        if position:
-            click.echo(f"Using position file: {position}")
-            exercise_position(
-                state,
-                verbose,
-                position,
-                timeout,
-                mountpoints,
-                apis,
-                interactive,
-                progress,
+        seed = checkpoint.seed
+        content_model = checkpoint.options["content_model"]
+        verify_samples = checkpoint.options["verify_samples"]
+        file_sizes = parse_size_distribution(checkpoint.options["file_sizes"])
+        payload = checkpoint.options["payload"]
+
+    if plan_path:
+        # nothing is created, so there is nothing to check on the clients, nor to clean up
+        if seed is None:
+            seed = random.randint(0, 2**8)
+        click.echo(f"Using seed: {seed}")
+        random.seed(seed)
+        click.echo(f"Writing plan: {plan_path}")
+        # files are only hashed to record their digests
+        with State(
+            None,
+            CONTENT_MODELS[content_model],
+            verify_samples,
+            file_sizes,
+            payload,
+            hashed=trace_digests,
+        ) as state, TraceWriter(plan_path, clients, trace_digests) as plan:
+            plan_random(state, verbose, num_operations, clients, operations, plan)
+        return
+
+    for api in apis:
+        api.configure(api_pool_size, api_keep_alive, api_retries)
+
+    # --minimize requires --position and --cleanup, see above
+    if minimize_path and position and cleanup:
+        try:
+            candidate = read_candidate(position)
+        except TraceError as e:
+            raise click.ClickException(f"Cannot minimize {position}: {e}") from e
+        minimizer = Minimizer(mountpoints, apis, timeout, minimize_jobs, cleanup)
+        candidate = minimizer.applicable(candidate)
+        failure = minimizer.test(candidate)
+        if failure is None:
+            raise click.ClickException(
+                f"{position} does not fail, there is nothing to minimize."
             )
-        else:
-            if seed is None:
-                seed = random.randint(0, 2**8)
+        click.echo(f"Minimizing {len(candidate)} operations failing with {failure}")
+        candidate = minimizer.minimize(candidate, failure)
+        write_trace(minimize_path, clients, candidate)
+        click.echo(f"Wrote {len(candidate)} operations to {minimize_path}")
+        return
+
+    if bisect_dir:
+        bisector = Bisector(
+            bisect_dir,
+            mountpoints,
+            apis,
+            operations,
+            timeout,
+            progress,
+            verbose,
+            cleanup,
+        )
+        if bisector.initial.clients != names:
+            raise click.ClickException(
+                f"The checkpoints were taken with clients {", ".join(bisector.initial.clients)}, "
+                f"not {", ".join(names)}."
+            )
+        if bisector.initial.options["operations"] != operation_names:
+            raise click.ClickException(
+                f"The checkpoints were taken with operations {", ".join(bisector.initial.options["operations"])}, "
+                f"not {", ".join(operation_names)}."
+            )
+        click.echo(
+            f"Bisecting {num_operations} operations over {len(bisector.checkpoints)} checkpoints in {bisect_dir}"
+        )
+        good, bad, problems = bisector.bisect(num_operations)
+        click.echo(f"The mounts diverge from the model after operation {bad - 1}:")
+        for line in bisector.describe(good, bad):
+            click.echo(f"  {line}")
+        for problem in problems:
+            click.echo(f"  {problem}")
+        _, path = bisector.nearest(bad - 1)
+        command = f"--resume {path}" if path else f"--seed {bisector.initial.seed}"
+        click.echo(f"Run up to it with: {command} --num-operations {bad}")
+        return
+
+    # a resumed run continues on mounts that hold the files of the checkpoint
+    if checkpoint is None:
+        # ensure mountpoints are empty
+        for mountpoint in mountpoints:
+            existing_paths = [
+                path for path in mountpoint.iterdir() if not path.name.startswith(".")
+            ]
+            if existing_paths:
+                raise click.ClickException(
+                    f"Mountpoint {mountpoint} is not empty: {", ".join(str(p) for p in existing_paths)} exist.\n"
+                )
 
-            click.echo(f"Using seed: {seed}")
-            random.seed(seed)
+        # ensure apis are empty
+        for api_url in apis:
+            existing_paths = [Path(obj["path"]) for obj in api_url.listdir(Path("/"))]
+            existing_paths = [
+                path for path in existing_paths if not path.name.startswith(".")
+            ]
+            if existing_paths:
+                raise click.ClickException(
+                    f"API {api_url.url} is not empty: {", ".join(str(p) for p in existing_paths)} exist.\n"
+                )
+
+    metrics = Metrics()
+
+    def pipeline(
+        mountpoints: list[Path],
+        apis: list[Api],
+        metrics: Metrics,
+        on_verified: Optional[Callable[[int, Operation], None]] = None,
+    ) -> VerificationPipeline:
+        for api in apis:
+            api.hooks.append(metrics.record_request)
+        return make_pipeline(
+            mountpoints + apis,
+            timeout,
+            progress,
+            verbose,
+            window,
+            concurrency,
+            on_verified,
+            metrics,
+            replay_jobs,
+        )
 
+    def run_random(
+        state: State,
+        mountpoints: list[Path],
+        apis: list[Api],
+        metrics: Metrics,
+        on_verified: Optional[Callable[[int, Operation], None]] = None,
+        trace: Optional[TraceWriter] = None,
+        checkpoints: Optional[Checkpointer] = None,
+        start: int = 0,
+        auditor: Optional[Auditor] = None,
+    ) -> None:
+        if engine == "asyncio":
+            asyncio.run(
+                exercise_asyncio(
+                    state,
+                    verbose,
+                    num_operations,
+                    mountpoints,
+                    apis,
+                    timeout,
+                    progress,
+                    concurrency,
+                    mount_workers,
+                    on_verified,
+                    metrics,
+                    trace,
+                )
+            )
+            return
+        with pipeline(mountpoints, apis, metrics, on_verified) as p:
             exercise_random(
                 state,
                 verbose,
                 num_operations,
-                timeout,
                 mountpoints,
                 apis,
                 interactive,
-                progress,
+                p,
+                trace,
+                checkpoints,
+                start,
+                auditor,
             )
 
+    auditor = Auditor(clients, audit_every, audit_jobs)
+
+    try:
+        if workers:
+            if seed is None:
+                seed = random.randint(0, 2**8)
+            click.echo(f"Using seed: {seed}")
+
+            def run(
+                mountpoints: list[Path],
+                apis: list[Api],
+                cleanup: Optional[Path],
+                on_verified: Callable[[int, Operation], None],
+                metrics: Metrics,
+            ) -> None:
+                with State(
+                    cleanup,
+                    CONTENT_MODELS[content_model],
+                    verify_samples,
+                    file_sizes,
+                    payload,
+                ) as state:
+                    run_random(state, mountpoints, apis, metrics, on_verified)
+
+            if shard is None:
+                run_workers(
+                    workers, seed, mountpoints, apis, cleanup, timeout, run, metrics
+                )
+            else:
+                click.echo(f"Running shard {shard} only")
+                prepare_shards(mountpoints, apis, [shard], timeout)
+                try:
+                    run_shard(
+                        shard,
+                        seed,
+                        mountpoints,
+                        apis,
+                        cleanup,
+                        run,
+                        lambda n, op: None,
+                        metrics,
+                    )
+                finally:
+                    if cleanup:
+                        remove_shards(cleanup, [shard])
+            return
+
+        with State(
+            cleanup,
+            CONTENT_MODELS[content_model],
+            verify_samples,
+            file_sizes,
+            payload,
+        ) as state:
+            if position:
+                click.echo(f"Using position file: {position}")
+                with pipeline(mountpoints, apis, metrics) as p:
+                    exercise_position(
+                        state,
+                        verbose,
+                        position,
+                        clients,
+                        interactive,
+                        p,
+                        auditor,
+                    )
+            else:
+                start = 0
+                if checkpoint is not None:
+                    click.echo(f"Resuming {resume} at operation {checkpoint.n}")
+                    checkpoint.restore(state)
+                    problems = audit(state, clients, audit_jobs)
+                    if problems:
+                        raise click.ClickException(
+                            "The clients do not match the checkpoint:\n"
+                            + "\n".join(problems)
+                        )
+                    start = checkpoint.n
+                else:
+                    if seed is None:
+                        seed = random.randint(0, 2**8)
+
+                    click.echo(f"Using seed: {seed}")
+                    random.seed(seed)
+
+                if trace_path:
+                    click.echo(f"Writing trace: {trace_path}")
+                if checkpoint_dir:
+                    click.echo(f"Writing checkpoints: {checkpoint_dir}")
+                options = {
+                    "operations": operation_names,
+                    "content_model": content_model,
+                    "verify_samples": verify_samples,
+                    "file_sizes": str(file_sizes),
+                    "payload": payload,
+                }
+                with (
+                    TraceWriter(trace_path, clients, trace_digests)
+                    if trace_path
+                    else nullcontext()
+                ) as trace, (
+                    Checkpointer(
+                        checkpoint_dir,
+                        checkpoint_every,
+                        seed,
+                        clients,
+                        options,
+                    )
+                    if checkpoint_dir
+                    else nullcontext()
+                ) as checkpoints:
+                    run_random(
+                        state,
+                        mountpoints,
+                        apis,
+                        metrics,
+                        trace=trace,
+                        checkpoints=checkpoints,
+                        start=start,
+                        auditor=auditor,
+                    )
+
+            if audit_at_exit:
+                click.echo("Auditing all clients")
+                auditor.check(state)
+    except AuditError as e:
+        raise click.ClickException(str(e)) from e
+    finally:
+        metrics.stop()
+        if report == "json":
+            text = json.dumps(metrics.report(), indent=2)
+        else:
+            text = metrics.format()
+        if report_file:
+            report_file.write_text(text + "\n")
+        else:
+            click.echo(text)
+
 
 def exercise_position(
     state: State,
     verbose: bool,
     position_file: Path,
-    timeout: float,
-    mountpoints: list[Path],
-    apis: list[Api],
+    clients: list[Path | Api],
     interactive: Optional[int],
-    progress: bool,
+    pipeline: VerificationPipeline,
+    auditor: Optional[Auditor] = None,
 ) -> None:
     """
-    Run the exerciser using a position file.
+    Run the exerciser by replaying a trace.
+
+    Operations are read and rebuilt against the model one at a time, so traces of any length can be replayed.
 
-    :param position_file: Path to position file describing the operations to run.
+    :param position_file: Path to the trace to replay, see `sex.trace.TraceWriter`.
+    :param clients: The clients that the client indices of the trace refer to.
+    :param pipeline: The pipeline to dispatch operations through, see `make_pipeline`.
+    :param auditor: What audits the clients between operations.
     """
-    for n, step in enumerate(eval(position_file.read_text())):  # noqa: S307
-        mountpoint_idx, operation = step(state)
-        try:
-            mountpoint = mountpoints[mountpoint_idx]
-        except IndexError:
-            raise click.ClickException(
-                f"Invalid mountpoint index: {mountpoint_idx} in position file {position_file}"
-            ) from None
+    try:
+        for n, record in enumerate(read_trace(position_file)):
+            client_idx, operation = from_record(state, record)
+            if not 0 <= client_idx < len(clients):
+                raise TraceError(f"Invalid client index: {client_idx}")
+            client = clients[client_idx]
 
-        if verbose:
-            click.echo(f"{n}: {operation} on {mountpoint}")
+            if verbose:
+                click.echo(f"{n}: {operation} on {client}")
 
-        if interactive is not None and interactive <= n:
-            print("Press Enter to execute the operation...", end="")
-            input()
+            if interactive is not None and interactive <= n:
+                print("Press Enter to execute the operation...", end="")
+                input()
 
-        # apply it
-        operation.execute(mountpoint)
-        operation.update(state)
+            # apply and verify it
+            pipeline.dispatch(n, operation, client, state)
 
-        # verify it
-        verify_operation(mountpoints + apis, operation, timeout, progress)
+            if auditor is not None:
+                auditor.after(n + 1, state, pipeline)
+    except (TraceError, StateError) as e:
+        raise click.ClickException(f"Cannot replay {position_file}: {e}") from e
 
 
 def exercise_random(
     state: State,
     verbose: bool,
     num_operations: int,
-    timeout: float,
     mountpoints: list[Path],
     apis: list[Api],
     interactive: Optional[int],
-    progress: bool,
+    pipeline: VerificationPipeline,
+    trace: Optional[TraceWriter] = None,
+    checkpoints: Optional[Checkpointer] = None,
+    start: int = 0,
+    auditor: Optional[Auditor] = None,
 ) -> None:
     """
     Run the exerciser with random operations.
 
     :param num_operations: The number of operations to generate.
+    :param pipeline: The pipeline to dispatch operations through, see `make_pipeline`.
+    :param trace: Where to record every operation before it is dispatched.
+    :param checkpoints: Where to checkpoint the run between operations.
+    :param start: The index of the first operation, when resuming a run from a checkpoint.
+    :param auditor: What audits the clients between operations.
     """
-    n = 0
-    while num_operations == -1 or n < num_operations:
-        # pick a new operation at random
-        op_cls = random.choice(operations)
-        operation = op_cls.build(state)
-        if operation is None:
-            # skip operation
-            continue
-
-        # pick a mountpoint for the operation
-        main_client = random.choice(mountpoints + apis)
-        if not operation.is_executable_for_client(main_client):
-            continue
-
+    clients = mountpoints + apis
+    for n, operation, main_client in random_operations(
+        state, clients, num_operations, operations, start
+    ):
         if verbose:
             click.echo(f"{n}: {operation} on {main_client}")
 
@@ -224,47 +854,93 @@ def exercise_random(
             print("Press Enter to execute the operation...", end="")
             input()
 
-        # apply it
-        operation.execute(main_client)
-        operation.update(state)
+        if trace is not None:
+            trace.write(n, operation, clients.index(main_client))
+
+        # apply and verify it
+        pipeline.dispatch(n, operation, main_client, state)
 
-        # verify it
-        verify_operation(mountpoints + apis, operation, timeout, progress)
+        if auditor is not None:
+            auditor.after(n + 1, state, pipeline)
 
-        n += 1
+        if checkpoints is not None:
+            checkpoints.save(n + 1, state)
 
 
-def verify_operation(
-    clients: list[Path | Api], operation: Operation, timeout: float, show_progress: bool
+async def exercise_asyncio(
+    state: State,
+    verbose: bool,
+    num_operations: int,
+    mountpoints: list[Path],
+    apis: list[Api],
+    timeout: float,
+    progress: bool,
+    concurrency: int,
+    mount_workers: int,
+    on_verified: Optional[Callable[[int, Operation], None]] = None,
+    metrics: Optional[Metrics] = None,
+    trace: Optional[TraceWriter] = None,
 ) -> None:
     """
-    Verify that an operation was successfully applied to all mountpoints.
+    Run the exerciser with random operations on the asyncio engine.
 
-    :param clients: list of clients to verify the operation on.
-    :param operation: The operation to verify.
-    :param timeout: The **total** timeout in seconds for verification across **all** mountpoints.
-    :param show_progress: If true, print remaining timeout to stdout while verifying.
+    :param num_operations: The number of operations to generate.
+    :param concurrency: The number of operations that may run at once.
+    :param mount_workers: The number of threads doing mount I/O.
+    :param on_verified: Called with the index and operation of every operation once it has been verified.
+    :param metrics: Where to record the latency of every execution and verification.
+    :param trace: Where to record every operation before it is dispatched.
     """
+    async_apis = [AsyncApi(api) for api in apis]
+    if metrics is not None:
+        for api in async_apis:
+            api.hooks.append(metrics.record_request)
+    async with AsyncEngine(
+        [*mountpoints, *async_apis],
+        timeout,
+        progress,
+        verbose,
+        concurrency,
+        mount_workers,
+        on_verified,
+        metrics,
+    ) as engine:
+        await exercise_random_async(
+            state, verbose, num_operations, operations, engine, trace
+        )
 
-    def print_progress(msg: str = ""):
-        if show_progress:
-            print(msg.ljust(80), end="\r")
-
-    start = time.perf_counter()
-    for client in clients:
-        while True:
-            try:
-                operation.verify(client)
-            except Exception as e:
-                remaining = timeout - (time.perf_counter() - start)
-                if remaining <= 0:
-                    raise e from None
-
-                print_progress(
-                    f"Verifying {operation.name} on {client}... ({remaining:.2f}s)",
-                )
-                time.sleep(0.1)
-            else:
-                break
-            finally:
-                print_progress()
+
+def make_pipeline(
+    clients: list[Path | Api],
+    timeout: float,
+    progress: bool,
+    verbose: bool,
+    window: int,
+    concurrency: int,
+    on_verified: Optional[Callable[[int, Operation], None]] = None,
+    metrics: Optional[Metrics] = None,
+    replay_jobs: int = 0,
+) -> VerificationPipeline:
+    """
+    Create the pipeline that operations are dispatched through.
+
+    :param window: The number of operations that may be verified in the background.
+    :param concurrency: The number of operations that may run at once. Takes precedence over `window`.
+    :param on_verified: Called with the index and operation of every operation once it has been verified.
+    :param metrics: Where to record the latency of every execution and verification.
+    :param replay_jobs: The number of operations that may run at once, in dependency order rather than dispatch
+        order. Takes precedence over `concurrency` and `window`.
+    :return: A `DependencyScheduler` if replay jobs were requested, a `Scheduler` if concurrency was requested,
+        otherwise a `VerificationPipeline`.
+    """
+    if replay_jobs:
+        return DependencyScheduler(
+            clients, timeout, progress, verbose, replay_jobs, on_verified, metrics
+        )
+    if concurrency:
+        return Scheduler(
+            clients, timeout, progress, verbose, concurrency, on_verified, metrics
+        )
+    return VerificationPipeline(
+        clients, timeout, progress, verbose, window, on_verified, metrics
+    )
@@ -0,0 +1,49 @@
+"""Chunked file I/O."""
+
+import os
+from pathlib import Path
+from typing import Iterable
+from typing import Iterator
+
+from sex.constants import CHUNK_SIZE
+
+
+def read_chunks(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Read a file in fixed-size chunks with `os.pread`.
+
+    :param path: The file to read.
+    :param chunk_size: The size of every chunk but the last.
+    :return: An iterator over the chunks of the file.
+    """
+    with path.open("rb", buffering=0) as f:
+        offset = 0
+        while chunk := os.pread(f.fileno(), chunk_size, offset):
+            yield chunk
+            offset += len(chunk)
+
+
+def drain(path: Path) -> None:
+    """
+    Read a file in full without keeping its contents.
+
+    :param path: The file to read.
+    """
+    for _ in read_chunks(path):
+        pass
+
+
+def pwrite_chunks(fd: int, offset: int, chunks: Iterable[bytes]) -> None:
+    """
+    Write consecutive chunks to a file with `os.pwrite`.
+
+    :param fd: The file descriptor of the file, open for writing.
+    :param offset: The offset to write the first chunk at.
+    :param chunks: The chunks to write.
+    """
+    for chunk in chunks:
+        view = memoryview(chunk)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
@@ -0,0 +1,110 @@
+"""Shared/exclusive locks over filesystem paths."""
+
+import asyncio
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+from typing import Tuple
+
+
+class _PathTable:
+    """Bookkeeping of the paths held by readers and writers."""
+
+    def __init__(self) -> None:
+        self._readers: Counter[Path] = Counter()
+        self._writers: set[Path] = set()
+
+    @staticmethod
+    def _normalize(
+        reads: Iterable[Path], writes: Iterable[Path]
+    ) -> Tuple[set[Path], set[Path]]:
+        writes = set(writes)
+        return set(reads) - writes, writes
+
+    def _is_available(self, reads: set[Path], writes: set[Path]) -> bool:
+        return not any(
+            path in self._writers or self._readers[path] for path in writes
+        ) and not any(path in self._writers for path in reads)
+
+    def _hold(self, reads: set[Path], writes: set[Path]) -> None:
+        self._readers.update(reads)
+        self._writers.update(writes)
+
+    def _unhold(self, reads: set[Path], writes: set[Path]) -> None:
+        for path in reads:
+            self._readers[path] -= 1
+            if not self._readers[path]:
+                del self._readers[path]
+        self._writers.difference_update(writes)
+
+
+class PathLocks(_PathTable):
+    """
+    Reader/writer locks keyed by path.
+
+    A path can be held either by any number of readers or by a single writer. All paths of a request are acquired
+    atomically, so two requests can never deadlock on each other.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a table with no locks held."""
+        super().__init__()
+        self._condition = threading.Condition()
+
+    def acquire(self, reads: Iterable[Path], writes: Iterable[Path]) -> None:
+        """
+        Block until the given paths can be held, then hold them.
+
+        :param reads: Paths to hold shared.
+        :param writes: Paths to hold exclusively. Paths that appear in both sets are held exclusively.
+        """
+        reads, writes = self._normalize(reads, writes)
+        with self._condition:
+            self._condition.wait_for(lambda: self._is_available(reads, writes))
+            self._hold(reads, writes)
+
+    def release(self, reads: Iterable[Path], writes: Iterable[Path]) -> None:
+        """
+        Release paths previously held with `acquire`.
+
+        :param reads: The paths that were passed to `acquire` as shared.
+        :param writes: The paths that were passed to `acquire` as exclusive.
+        """
+        reads, writes = self._normalize(reads, writes)
+        with self._condition:
+            self._unhold(reads, writes)
+            self._condition.notify_all()
+
+
+class AsyncPathLocks(_PathTable):
+    """Reader/writer locks keyed by path for asyncio tasks, see `PathLocks`."""
+
+    def __init__(self) -> None:
+        """Initialize a table with no locks held."""
+        super().__init__()
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, reads: Iterable[Path], writes: Iterable[Path]) -> None:
+        """
+        Wait until the given paths can be held, then hold them.
+
+        :param reads: Paths to hold shared.
+        :param writes: Paths to hold exclusively. Paths that appear in both sets are held exclusively.
+        """
+        reads, writes = self._normalize(reads, writes)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._is_available(reads, writes))
+            self._hold(reads, writes)
+
+    async def release(self, reads: Iterable[Path], writes: Iterable[Path]) -> None:
+        """
+        Release paths previously held with `acquire`.
+
+        :param reads: The paths that were passed to `acquire` as shared.
+        :param writes: The paths that were passed to `acquire` as exclusive.
+        """
+        reads, writes = self._normalize(reads, writes)
+        async with self._condition:
+            self._unhold(reads, writes)
+            self._condition.notify_all()
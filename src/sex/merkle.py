@@ -0,0 +1,183 @@
+"""Hash trees over file contents."""
+
+import hashlib
+from typing import Optional
+from typing import Self
+
+from sex.content import Content
+
+
+def digest(data: bytes) -> bytes:
+    """
+    Hash a leaf or a pair of child hashes.
+
+    :param data: The bytes to hash.
+    :return: The hash of the bytes.
+    """
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _zero_hashes(leaf_size: int, depth: int) -> list[bytes]:
+    hashes = [digest(bytes(leaf_size))]
+    for _ in range(depth):
+        hashes.append(digest(hashes[-1] * 2))
+    return hashes
+
+
+class MerkleTree:
+    """
+    Sparse hash tree of fixed depth over the contents of a file.
+
+    Leaves hash `LEAF_SIZE` bytes of contents each, zero-padded past the end of the file. Only nodes that differ from
+    the hash of an all-zero subtree are stored, so a tree costs memory in proportion to the non-zero parts of the
+    file, and updating a range costs one hash per leaf in the range plus one per level.
+    """
+
+    LEAF_SIZE = 1 << 16
+    #: Number of levels above the leaves, enough for files of 256 TiB.
+    DEPTH = 32
+
+    #: The hashes of all-zero subtrees, by level.
+    ZERO = _zero_hashes(LEAF_SIZE, DEPTH)
+
+    def __init__(self) -> None:
+        """Initialize the tree of an empty (or all-zero) file."""
+        self._nodes: dict[tuple[int, int], bytes] = {}
+
+    @classmethod
+    def leaf_digest(cls, data: bytes | memoryview) -> bytes:
+        """
+        Hash the contents of a leaf.
+
+        :param data: The contents of the leaf, at most `LEAF_SIZE` bytes.
+        :return: The hash of the contents padded with zeros to `LEAF_SIZE` bytes.
+        """
+        hash = hashlib.blake2b(data, digest_size=16)
+        hash.update(bytes(cls.LEAF_SIZE - len(data)))
+        return hash.digest()
+
+    @classmethod
+    def of(cls, content: Content) -> Self:
+        """
+        Build the tree of some contents, hashing only the leaves that may hold data.
+
+        :param content: The contents.
+        :return: The tree of the contents.
+        """
+        tree = cls()
+        for start, end in content.data_ranges(0, len(content)):
+            tree.update(content, start, end)
+        return tree
+
+    @classmethod
+    def of_leaves(cls, leaves: list[bytes]) -> Self:
+        """
+        Build the tree of contents whose leaves were already hashed, e.g. while streaming them.
+
+        :param leaves: The hashes of the leaves, in order, see `leaf_digest`.
+        :return: The tree of the contents.
+        """
+        tree = cls()
+        for index, leaf in enumerate(leaves):
+            tree._set(0, index, leaf)
+        if leaves:
+            tree._rehash(range(len(leaves)))
+        return tree
+
+    def node(self, level: int, index: int) -> bytes:
+        """
+        Get the hash of a node.
+
+        :param level: The level of the node, 0 for leaves.
+        :param index: The index of the node within its level.
+        :return: The hash of the node.
+        """
+        return self._nodes.get((level, index), self.ZERO[level])
+
+    def leaf(self, index: int) -> bytes:
+        """:return: The hash of the leaf with the given index."""
+        return self.node(0, index)
+
+    def root(self) -> bytes:
+        """:return: The hash of the root of the tree."""
+        return self.node(self.DEPTH, 0)
+
+    def update(
+        self,
+        content: Content,
+        start: int,
+        end: int,
+        source: Optional["MerkleTree"] = None,
+    ) -> None:
+        """
+        Rehash the leaves covering a range of the contents after it changed.
+
+        :param content: The contents the tree is for, after the change.
+        :param start: The start of the range that changed.
+        :param end: The end of the range that changed.
+        :param source: The tree of other contents in which the same range was overwritten with the same data. Its
+            leaves that lie entirely within the range are copied rather than rehashed.
+        """
+        if end <= start:
+            return
+        leaves = range(start // self.LEAF_SIZE, -(-end // self.LEAF_SIZE))
+        for index in leaves:
+            offset = index * self.LEAF_SIZE
+            if source is not None and start <= offset <= end - self.LEAF_SIZE:
+                leaf = source.leaf(index)
+            else:
+                leaf = self.leaf_digest(content.read(offset, self.LEAF_SIZE))
+            self._set(0, index, leaf)
+        self._rehash(leaves)
+
+    def truncate(self, content: Content) -> None:
+        """
+        Forget the leaves past the end of the contents after they were truncated.
+
+        :param content: The contents the tree is for, after truncation.
+        """
+        size = len(content)
+        leaves = -(-size // self.LEAF_SIZE)
+        self._nodes = {
+            (level, index): node
+            for (level, index), node in self._nodes.items()
+            if index << level < leaves
+        }
+        if size % self.LEAF_SIZE:
+            # the last leaf was cut short, or grew into its zero-padding
+            last = size // self.LEAF_SIZE
+            self._set(
+                0,
+                last,
+                self.leaf_digest(content.read(last * self.LEAF_SIZE, self.LEAF_SIZE)),
+            )
+        if leaves:
+            self._rehash(range(leaves - 1, leaves))
+
+    def copy(self) -> "MerkleTree":
+        """:return: An independent tree with the same hashes."""
+        copy = MerkleTree()
+        copy._nodes = dict(self._nodes)
+        return copy
+
+    def _set(self, level: int, index: int, node: bytes) -> None:
+        if node == self.ZERO[level]:
+            self._nodes.pop((level, index), None)
+        else:
+            self._nodes[(level, index)] = node
+
+    def _rehash(self, leaves: range) -> None:
+        # recompute the ancestors of a contiguous range of leaves, level by level
+        first, last = leaves.start, leaves.stop - 1
+        for level in range(1, self.DEPTH + 1):
+            first >>= 1
+            last >>= 1
+            for index in range(first, last + 1):
+                self._set(
+                    level,
+                    index,
+                    digest(
+                        self.node(level - 1, 2 * index)
+                        + self.node(level - 1, 2 * index + 1)
+                    ),
+                )
@@ -0,0 +1,343 @@
+"""Latency and throughput metrics."""
+
+import threading
+import time
+from typing import Any
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+from sex.api import RequestTiming
+
+
+#: The percentiles included in reports.
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class Histogram:
+    """
+    Log-linear histogram of durations with constant memory.
+
+    Durations are recorded in nanoseconds. Values below `2 ** SUB_BITS` get a bucket each; above that, every power of
+    two is split into `2 ** (SUB_BITS - 1)` linear buckets, so any recorded value is known to within
+    `2 ** -(SUB_BITS - 1)` (about 1.6%) of its true value.
+    """
+
+    SUB_BITS = 7
+    HALF = 1 << (SUB_BITS - 1)
+    #: Values are clamped to about 4.9 hours.
+    MAX_BITS = 44
+    BUCKETS = (MAX_BITS - SUB_BITS + 2) * HALF
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        shift = value.bit_length() - cls.SUB_BITS
+        if shift <= 0:
+            return value
+        return shift * cls.HALF + (value >> shift)
+
+    @classmethod
+    def _bounds(cls, index: int) -> Tuple[int, int]:
+        if index < 2 * cls.HALF:
+            return index, index
+        shift = index // cls.HALF - 1
+        mantissa = index - shift * cls.HALF
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        """
+        Record a duration.
+
+        :param seconds: The duration in seconds.
+        """
+        value = min(max(int(seconds * 1e9), 0), (1 << self.MAX_BITS) - 1)
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Add all values recorded in another histogram to this one.
+
+        :param other: The histogram to merge.
+        """
+        self.counts = [a + b for a, b in zip(self.counts, other.counts, strict=True)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> float:
+        """
+        Estimate a percentile of the recorded durations.
+
+        :param percentile: The percentile, between 0 and 100.
+        :return: The estimated duration in seconds, or 0 if nothing was recorded.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, round(self.count * percentile / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                low, high = self._bounds(index)
+                return min((low + high) / 2, self.max) / 1e9
+        return self.max / 1e9
+
+    def mean(self) -> float:
+        """:return: The mean of the recorded durations in seconds, or 0 if nothing was recorded."""
+        return self.total / self.count / 1e9 if self.count else 0.0
+
+    def summary(self) -> dict[str, float]:
+        """:return: The count, mean, percentiles and maximum of the recorded durations, in seconds."""
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            **{f"p{p:g}": self.percentile(p) for p in PERCENTILES},
+            "max": self.max / 1e9,
+        }
+
+
+class Metrics:
+    """
+    Latency histograms keyed by operation type, phase (`execute` or `verify`) and client.
+
+    API requests are recorded alongside, split into the time spent connecting and the time spent waiting for the
+    server (see `record_request`).
+
+    Alongside, a visibility matrix keeps, for every pair of clients, how long a change made through the first (the
+    writer) took to become visible through the second (the reader).
+
+    Recording is thread-safe. The wall time of the run, used for throughput, runs from construction until `stop`.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty metrics and start the wall clock."""
+        self._lock = threading.Lock()
+        self._histograms: dict[Tuple[str, str, str], Histogram] = {}
+        self._visibility: dict[Tuple[str, str], Histogram] = {}
+        self._start = time.perf_counter()
+        self.elapsed: Optional[float] = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Get the state of the metrics for pickling, without the lock."""
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """Restore the state of pickled metrics."""
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def record(
+        self, operation: str, phase: str, client: object, seconds: float
+    ) -> None:
+        """
+        Record the duration of one phase of an operation on a client.
+
+        :param operation: The name of the operation type, e.g. `WRITE`.
+        :param phase: The phase of the operation, `execute` or `verify`.
+        :param client: The client, either a Path to a mountpoint or an Api.
+        :param seconds: The duration in seconds.
+        """
+        key = (operation, phase, str(client))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.record(seconds)
+
+    def record_request(self, client: object, timing: RequestTiming) -> None:
+        """
+        Record the timing of an API request, as `connect` and `server` phases of the operation `API <endpoint>`.
+
+        The `connect` phase is only recorded for requests that had to open a new connection.
+
+        :param client: The API client that made the request.
+        :param timing: The timing of the request.
+        """
+        operation = f"API {timing.endpoint.rsplit('/', 1)[-1]}"
+        if timing.connect:
+            self.record(operation, "connect", client, timing.connect)
+        self.record(operation, "server", client, timing.server)
+
+    def record_visibility(self, writer: object, reader: object, seconds: float) -> None:
+        """
+        Record how long a change took to become visible on another client.
+
+        :param writer: The client the change was made through.
+        :param reader: The client the change was observed through.
+        :param seconds: The time from the end of the change to its first successful verification on the reader.
+        """
+        key = (str(writer), str(reader))
+        with self._lock:
+            histogram = self._visibility.get(key)
+            if histogram is None:
+                histogram = self._visibility[key] = Histogram()
+            histogram.record(seconds)
+
+    def stop(self) -> None:
+        """Stop the wall clock."""
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self._start
+
+    def wall_time(self) -> float:
+        """:return: The wall time of the run in seconds, so far if it has not been stopped."""
+        if self.elapsed is None:
+            return time.perf_counter() - self._start
+        return self.elapsed
+
+    def relabel(self, labels: dict[str, str]) -> None:
+        """
+        Rename clients, merging histograms that end up with the same key.
+
+        :param labels: New client names, keyed by the old ones. Clients not in the map keep their name.
+        """
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+            visibility, self._visibility = self._visibility, {}
+        for (operation, phase, client), histogram in histograms.items():
+            self._merge_histogram(
+                self._histograms,
+                (operation, phase, labels.get(client, client)),
+                histogram,
+            )
+        for (writer, reader), histogram in visibility.items():
+            self._merge_histogram(
+                self._visibility,
+                (labels.get(writer, writer), labels.get(reader, reader)),
+                histogram,
+            )
+
+    def merge(self, other: "Metrics") -> None:
+        """
+        Add the histograms of another run (e.g. a worker process) to these metrics.
+
+        :param other: The metrics to merge.
+        """
+        for key, histogram in other._histograms.items():
+            self._merge_histogram(self._histograms, key, histogram)
+        for pair, histogram in other._visibility.items():
+            self._merge_histogram(self._visibility, pair, histogram)
+
+    def _merge_histogram(
+        self, histograms: dict[Any, Histogram], key: Any, histogram: Histogram
+    ) -> None:
+        with self._lock:
+            if key in histograms:
+                histograms[key].merge(histogram)
+            else:
+                histograms[key] = histogram
+
+    def __iter__(self) -> Iterator[Tuple[Tuple[str, str, str], Histogram]]:
+        """Iterate over the histograms, sorted by key."""
+        with self._lock:
+            return iter(sorted(self._histograms.items()))
+
+    def operations(self) -> int:
+        """:return: The number of executed operations."""
+        return sum(h.count for (_, phase, _), h in self if phase == "execute")
+
+    def report(self) -> dict[str, Any]:
+        """:return: A JSON-serializable report of the metrics, with durations in seconds."""
+        elapsed = self.wall_time()
+        return {
+            "elapsed": elapsed,
+            "operations": self.operations(),
+            "throughput": self.operations() / elapsed if elapsed else 0.0,
+            "latencies": [
+                {
+                    "operation": operation,
+                    "phase": phase,
+                    "client": client,
+                    "throughput": histogram.count / elapsed if elapsed else 0.0,
+                    **histogram.summary(),
+                }
+                for (operation, phase, client), histogram in self
+            ],
+            "visibility": [
+                {"writer": writer, "reader": reader, **histogram.summary()}
+                for (writer, reader), histogram in self.visibility()
+            ],
+        }
+
+    def visibility(self) -> list[Tuple[Tuple[str, str], Histogram]]:
+        """:return: The visibility histograms keyed by writer and reader, sorted."""
+        with self._lock:
+            return sorted(self._visibility.items())
+
+    def format(self) -> str:
+        """:return: A human-readable table of the metrics, with durations in milliseconds."""
+        report = self.report()
+        columns = ["p50", "p90", "p99", "p99.9", "max"]
+        rows = [
+            ["operation", "phase", "client", "count", "ops/s", *columns],
+            *(
+                [
+                    row["operation"],
+                    row["phase"],
+                    row["client"],
+                    str(row["count"]),
+                    f"{row['throughput']:.1f}",
+                    *(f"{row[column] * 1000:.2f}ms" for column in columns),
+                ]
+                for row in report["latencies"]
+            ),
+        ]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = [
+            "  ".join(
+                cell.ljust(width) if i < 3 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths, strict=True))
+            )
+            for row in rows
+        ]
+        lines.append(
+            f"{report['operations']} operations in {report['elapsed']:.2f}s "
+            f"({report['throughput']:.1f} ops/s)"
+        )
+        if report["visibility"]:
+            lines.append("")
+            lines.append(self.format_visibility())
+        return "\n".join(lines)
+
+    def format_visibility(self) -> str:
+        """:return: A human-readable writer x reader matrix of p50 / p99 / max visibility latencies, in milliseconds."""
+        cells = {
+            pair: "/".join(
+                f"{value * 1000:.2f}"
+                for value in (
+                    histogram.percentile(50),
+                    histogram.percentile(99),
+                    histogram.max / 1e9,
+                )
+            )
+            for pair, histogram in self.visibility()
+        }
+        clients = sorted({client for pair in cells for client in pair})
+        rows = [
+            ["writer \\ reader", *clients],
+            *(
+                [writer, *(cells.get((writer, reader), "-") for reader in clients)]
+                for writer in clients
+            ),
+        ]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = ["visibility latency, p50/p99/max in ms"]
+        lines.extend(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths, strict=True))
+            )
+            for row in rows
+        )
+        return "\n".join(lines)
@@ -0,0 +1,235 @@
+"""Minimization of failing traces by delta debugging."""
+
+import itertools
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from typing import Optional
+from typing import Sequence
+
+import click
+
+from sex.api import Api
+from sex.compare import no_artifacts
+from sex.operations.mkdir import Mkdir
+from sex.state import State
+from sex.state import StateError
+from sex.trace import TraceError
+from sex.trace import TraceWriter
+from sex.trace import from_record
+from sex.trace import read_trace
+from sex.verification import OperationFailedError
+from sex.verification import VerificationPipeline
+from sex.verification import verify_operation
+
+
+#: The operations of a trace being minimized, as their index in the original trace and their description.
+Candidate = list[tuple[int, dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class Failure:
+    """How a trace fails: which operation on which path, and the type of the error."""
+
+    operation: str
+    path: str
+    error: str
+
+    @classmethod
+    def of(cls, failure: OperationFailedError) -> "Failure":
+        """
+        Describe how an operation failed.
+
+        :param failure: The failure.
+        :return: Its description.
+        """
+        return cls(
+            failure.operation.name,
+            str(getattr(failure.operation, "path", "")),
+            type(failure.__cause__).__name__,
+        )
+
+    def __str__(self) -> str:
+        return f"{self.error} in {self.operation} {self.path}"
+
+
+class Minimizer:
+    """
+    Delta debugging (ddmin) of a failing trace, to find a small subsequence of its operations that fails the same way.
+
+    Removing operations can make later ones meaningless, e.g. a write to a file that is no longer created, so every
+    candidate subsequence first drops the operations whose preconditions do not hold in the model. Candidates are
+    tested in parallel, each in a fresh directory of every client, without writing the artifacts of failed comparisons,
+    which they would overwrite.
+    """
+
+    def __init__(
+        self,
+        mountpoints: list[Path],
+        apis: list[Api],
+        timeout: float,
+        jobs: int,
+        cleanup: Path,
+    ) -> None:
+        """
+        Initialize a new minimizer.
+
+        :param mountpoints: The mountpoints to test candidates on.
+        :param apis: The API clients to test candidates on.
+        :param timeout: The verification timeout in seconds.
+        :param jobs: The number of candidates tested at once.
+        :param cleanup: The mountpoint to remove the directories of candidates from.
+        """
+        self.mountpoints = mountpoints
+        self.apis = apis
+        self.timeout = timeout
+        self.jobs = jobs
+        self.cleanup = cleanup
+        self._attempts = itertools.count()
+        self._results: dict[tuple[int, ...], Optional[Failure]] = {}
+
+    def applicable(self, candidate: Candidate) -> Candidate:
+        """
+        Drop the operations of a candidate that do not apply to the model, given the operations before them.
+
+        :param candidate: The operations.
+        :return: The operations that apply, in order.
+        """
+        clients = len(self.mountpoints) + len(self.apis)
+        state = State(None, hashed=False)
+        kept = []
+        for index, record in candidate:
+            try:
+                client, operation = from_record(state, record)
+                operation.update(state)
+            except (TraceError, StateError):
+                continue
+            if not 0 <= client < clients:
+                continue
+            kept.append((index, record))
+        return kept
+
+    def test(self, candidate: Candidate) -> Optional[Failure]:
+        """
+        Run the operations of a candidate in a fresh directory of every client.
+
+        :param candidate: The operations, which must all apply, see `applicable`.
+        :return: How the candidate failed, or None if it passed.
+        """
+        key = tuple(index for index, _ in candidate)
+        if key in self._results:
+            return self._results[key]
+        path = Path(f"/minimize-{next(self._attempts)}")
+        relative = path.relative_to(path.anchor)
+        clients: list[Path | Api] = [*self.mountpoints, *self.apis]
+        mkdir = Mkdir(path)
+        mkdir.execute(clients[0])
+        verify_operation(clients, mkdir, self.timeout, False)
+        clients = [mountpoint / relative for mountpoint in self.mountpoints]
+        clients += [api.subtree(path) for api in self.apis]
+        failure = None
+        try:
+            state = State(None)
+            with VerificationPipeline(clients, self.timeout, False, False) as pipeline:
+                for n, (_, record) in enumerate(candidate):
+                    client, operation = from_record(state, record)
+                    pipeline.dispatch(n, operation, clients[client], state)
+        except OperationFailedError as e:
+            failure = Failure.of(e)
+        finally:
+            shutil.rmtree(self.cleanup / relative, ignore_errors=True)
+        self._results[key] = failure
+        return failure
+
+    def _test_concurrently(self, candidate: Candidate) -> Optional[Failure]:
+        # attempts run side by side, and would overwrite each other's comparison artifacts
+        with no_artifacts():
+            return self.test(candidate)
+
+    def _first_failing(
+        self, candidates: list[Candidate], failure: Failure
+    ) -> Optional[Candidate]:
+        # test candidates in batches, in order, so that the result does not depend on timing
+        candidates = [c for c in map(self.applicable, candidates) if c]
+        with ThreadPoolExecutor(self.jobs, thread_name_prefix="minimize") as pool:
+            for start in range(0, len(candidates), self.jobs):
+                batch = candidates[start : start + self.jobs]
+                results = pool.map(self._test_concurrently, batch)
+                for candidate, result in zip(batch, results, strict=True):
+                    if result == failure:
+                        return candidate
+        return None
+
+    def minimize(self, candidate: Candidate, failure: Failure) -> Candidate:
+        """
+        Reduce a failing trace to a 1-minimal subsequence that fails the same way.
+
+        Removing any one operation of the result (along with those that then no longer apply) makes it pass or fail
+        differently.
+
+        :param candidate: The operations of the trace.
+        :param failure: How the trace fails, see `test`.
+        :return: The smallest failing subsequence that was found.
+        """
+        current = self.applicable(candidate)
+        granularity = 2
+        while len(current) >= 2:
+            size = -(-len(current) // granularity)
+            chunks = [current[i : i + size] for i in range(0, len(current), size)]
+            complements = [
+                [
+                    operation
+                    for other in chunks
+                    if other is not chunk
+                    for operation in other
+                ]
+                for chunk in chunks
+            ]
+            if (found := self._first_failing(chunks, failure)) is not None:
+                current, granularity = found, 2
+            elif (
+                len(chunks) > 2
+                and (found := self._first_failing(complements, failure)) is not None
+            ):
+                current, granularity = found, max(granularity - 1, 2)
+            elif granularity < len(current):
+                granularity = min(granularity * 2, len(current))
+                continue
+            else:
+                break
+            click.echo(f"Reduced to {len(current)} operations")
+        return current
+
+
+def read_candidate(path: Path) -> Candidate:
+    """
+    Read the operations of a trace to minimize.
+
+    The digests recorded in the trace are dropped, since files only have them in the full trace.
+
+    :param path: The trace file.
+    :return: The operations.
+    :raises TraceError: If the file is not a trace.
+    """
+    return [
+        (index, {key: value for key, value in record.items() if key != "digest"})
+        for index, record in enumerate(read_trace(path))
+    ]
+
+
+def write_trace(path: Path, clients: Sequence[object], candidate: Candidate) -> None:
+    """
+    Write the operations of a candidate as a trace, numbered from 0.
+
+    :param path: The trace file to write.
+    :param clients: The clients of the run, for the header.
+    :param candidate: The operations, which must all apply, see `Minimizer.applicable`.
+    """
+    state = State(None, hashed=False)
+    with TraceWriter(path, clients) as trace:
+        for n, (_, record) in enumerate(candidate):
+            client, operation = from_record(state, record)
+            trace.write(n, operation, client)
+            operation.update(state)
@@ -2,16 +2,21 @@
 
 import abc
 from pathlib import Path
+from typing import Any
 from typing import Optional
 from typing import Self
 
 from sex.api import Api
+from sex.async_api import AsyncApi
 from sex.state import State
 
 
 class Operation(abc.ABC):
     """Interface for filesystem operations."""
 
+    #: The path the operation acts on.
+    path: Path
+
     @classmethod
     @abc.abstractmethod
     def build(cls, state: State) -> Optional[Self]:
@@ -29,15 +34,74 @@ class Operation(abc.ABC):
         """
         pass
 
-    def is_executable_for_client(self, client: Path | Api) -> bool:
+    @classmethod
+    @abc.abstractmethod
+    def from_record(cls, state: State, record: dict[str, Any]) -> Self:
+        """
+        Rebuild an operation from its description, against the model as it is when the operation is replayed.
+
+        The model provides everything that the description leaves out, like the expected contents of files.
+
+        :param state: The current state of the system.
+        :param record: The description, see `to_record`.
+        :return: The operation.
+        :raises sex.state.StateError: If the operation does not apply to the model.
+        """
+        pass
+
+    def to_record(self) -> dict[str, Any]:
+        """
+        Describe the operation, to replay it later with `from_record`.
+
+        :return: A JSON-serializable description of the parameters of the operation.
+        """
+        return {"path": str(self.path)}
+
+    def digest(self) -> Optional[bytes]:
+        """:return: The digest of the file the operation expects to find, if any, see `sex.state.File.digest`."""
+        return None
+
+    def is_executable_for_client(self, client: Path | Api | AsyncApi) -> bool:
         """
         Check if the operation can be executed on the client.
 
-        :param client: The client to check, either a Path to a mountpoint or an Api.
+        :param client: The client to check, either a Path to a mountpoint or an Api or AsyncApi.
         :return: True if the operation can be executed on the client, False otherwise.
         """
         return True
 
+    def read_paths(self) -> set[Path]:
+        """
+        Paths whose state the operation depends on, without changing them.
+
+        Operations that read or write a common path must not be reordered with respect to each other.
+
+        :return: The set of paths read by the operation.
+        """
+        return set()
+
+    def write_paths(self) -> set[Path]:
+        """
+        Paths whose state the operation changes.
+
+        A file whose contents change is written; a directory whose entries change is written too.
+
+        :return: The set of paths written by the operation.
+        """
+        return set()
+
+    def conflicts_with(self, other: "Operation") -> bool:
+        """
+        Check whether the operation must be ordered with respect to another operation.
+
+        :param other: The other operation.
+        :return: True if one of the operations writes a path that the other reads or writes.
+        """
+        return bool(
+            self.write_paths() & (other.read_paths() | other.write_paths())
+            or other.write_paths() & self.read_paths()
+        )
+
     def execute(self, client: Path | Api) -> None:
         """
         Execute the operation on the client.
@@ -79,6 +143,17 @@ class Operation(abc.ABC):
         """
         raise NotImplementedError()
 
+    async def execute_async_api(self, api: AsyncApi) -> None:
+        """
+        Execute the operation on the API from the asyncio engine.
+
+        This is the asynchronous counterpart of `execute_api`, with the same semantics.
+
+        :param api: The API to operate on.
+        :return: None
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def update(self, state: State) -> None:
         """
@@ -147,6 +222,17 @@ class Operation(abc.ABC):
         """
         raise NotImplementedError()
 
+    async def verify_async_api(self, api: AsyncApi) -> None:
+        """
+        Verify that the operation was successful on the API from the asyncio engine.
+
+        This is the asynchronous counterpart of `verify_api`, with the same semantics.
+
+        :param api: The API to verify the operation on.
+        :return: None
+        """
+        raise NotImplementedError()
+
     @classmethod
     @property
     @abc.abstractmethod
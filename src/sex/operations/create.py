@@ -2,10 +2,16 @@
 
 import random
 from pathlib import Path
+from typing import Any
 from typing import Optional
 from typing import Self
 
 from sex.api import Api
+from sex.async_api import AsyncApi
+from sex.content import Content
+from sex.content import ExtentContent
+from sex.content import content_from_record
+from sex.fileio import pwrite_chunks
 from sex.name import gen_name
 from sex.operation import Operation
 from sex.operation import VerificationError
@@ -15,41 +21,63 @@ from sex.state import State
 class Create(Operation):
     """Create operation."""
 
-    MAX_SIZE = 0xFFFF
-
     @classmethod
     @property
-    def name(cls):
+    def name(cls) -> str:
         return "CREATE"
 
     @classmethod
     def build(cls, state: State) -> Optional[Self]:
         try:
-            path, dir = random.choice(state.directories())
+            path, dir = state.random_directory()
         except IndexError:
             return None
-        size = random.randint(0, cls.MAX_SIZE)
-        return cls(path / f"{gen_name()}.bin", size)
+        size = state.file_sizes.sample()
+        size -= size % state.content_type.alignment
+        path = path / f"{gen_name()}.bin"
+        content = state.content_type.new(size, random.getrandbits(48))
+        return cls(path, size, content)
+
+    @classmethod
+    def from_record(cls, state: State, record: dict[str, Any]) -> Self:
+        return cls(
+            Path(record["path"]), record["size"], content_from_record(record["content"])
+        )
 
-    def __init__(self, path: Path, size: int) -> None:
+    def __init__(
+        self, path: Path, size: int, content: Optional[Content] = None
+    ) -> None:
         """
         Initialize a new create operation.
 
         :param path: The path to the file to create.
         :param size: The size of the file to create.
+        :param content: The contents of the file to create, zero-filled by default.
         """
         self.path = path
         self.size = size
+        self.content = content if content is not None else ExtentContent.zeros(size)
+
+    def to_record(self) -> dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "size": self.size,
+            "content": self.content.to_record(),
+        }
 
-    def is_executable_for_client(self, client: Path | Api) -> bool:
+    def write_paths(self) -> set[Path]:
+        return {self.path, self.path.parent}
+
+    def is_executable_for_client(self, client: Path | Api | AsyncApi) -> bool:
         return isinstance(client, Path)
 
     def update(self, state: State) -> None:
-        state.create_file(self.path, bytearray(b"\0" * self.size))
+        state.create_file(self.path, self.content.copy())
 
     def execute_mount(self, root: Path) -> None:
         path = root / self.path.relative_to(root.anchor)
-        path.write_bytes(b"\0" * self.size)
+        with path.open("wb", buffering=0) as f:
+            pwrite_chunks(f.fileno(), 0, self.content.chunks())
 
     def verify_mount(self, root: Path) -> None:
         path = root / self.path.relative_to(root.anchor)
@@ -63,7 +91,12 @@ class Create(Operation):
             )
 
     def verify_api(self, api: Api) -> None:
-        data = api.getattr(self.path)
+        self._check_attributes(api.getattr(self.path))
+
+    async def verify_async_api(self, api: AsyncApi) -> None:
+        self._check_attributes(await api.getattr(self.path))
+
+    def _check_attributes(self, data: dict[str, Any]) -> None:
         if data["type"] != "file":
             raise VerificationError(f"Path {self.path} is not a file")
         if data["size"] != self.size:
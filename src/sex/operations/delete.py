@@ -1,13 +1,14 @@
 """Delete operation."""
 
-import random
 from pathlib import Path
+from typing import Any
 from typing import Optional
 from typing import Self
 
 from requests.exceptions import HTTPError
 
 from sex.api import Api
+from sex.async_api import AsyncApi
 from sex.operation import Operation
 from sex.operation import VerificationError
 from sex.state import State
@@ -18,13 +19,13 @@ class Delete(Operation):
 
     @classmethod
     @property
-    def name(cls):
+    def name(cls) -> str:
         return "DELETE"
 
     @classmethod
     def build(cls, state: State) -> Optional[Self]:
         try:
-            path, file = random.choice(state.files())
+            path, file = state.random_file()
         except IndexError:
             return None
         return cls(path)
@@ -37,6 +38,13 @@ class Delete(Operation):
         """
         self.path = path
 
+    @classmethod
+    def from_record(cls, state: State, record: dict[str, Any]) -> Self:
+        return cls(Path(record["path"]))
+
+    def write_paths(self) -> set[Path]:
+        return {self.path, self.path.parent}
+
     def execute_mount(self, root: Path) -> None:
         path = root / self.path.relative_to(root.anchor)
         path.unlink()
@@ -44,6 +52,9 @@ class Delete(Operation):
     def execute_api(self, api: Api) -> None:
         api.delete(self.path)
 
+    async def execute_async_api(self, api: AsyncApi) -> None:
+        await api.delete(self.path)
+
     def update(self, state: State) -> None:
         state.delete_file(self.path)
 
@@ -61,5 +72,14 @@ class Delete(Operation):
             raise
         raise VerificationError(f"File {self.path} still exists")
 
+    async def verify_async_api(self, api: AsyncApi) -> None:
+        try:
+            await api.getattr(self.path)
+        except HTTPError as e:
+            if e.response.status_code == 404:
+                return
+            raise
+        raise VerificationError(f"File {self.path} still exists")
+
     def __str__(self) -> str:
         return f"DELETE {self.path}"
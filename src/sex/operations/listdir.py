@@ -1,11 +1,12 @@
 """List directory operation."""
 
-import random
 from pathlib import Path
+from typing import Any
 from typing import Optional
 from typing import Self
 
 from sex.api import Api
+from sex.async_api import AsyncApi
 from sex.operation import Operation
 from sex.operation import VerificationError
 from sex.state import State
@@ -22,11 +23,16 @@ class Listdir(Operation):
     @classmethod
     def build(cls, state: State) -> Optional[Self]:
         try:
-            path, directory = random.choice(state.directories())
+            path, directory = state.random_directory()
         except IndexError:
             return None
         return cls(path, set(directory.children.keys()))
 
+    @classmethod
+    def from_record(cls, state: State, record: dict[str, Any]) -> Self:
+        path = Path(record["path"])
+        return cls(path, set(state.resolve_directory(path).children.keys()))
+
     def __init__(self, path: Path, expected: set[str]) -> None:
         """
         Initialize a new listdir operation.
@@ -37,6 +43,9 @@ class Listdir(Operation):
         self.path = path
         self.expected = expected
 
+    def read_paths(self) -> set[Path]:
+        return {self.path}
+
     def execute_mount(self, root: Path) -> None:
         path = root / self.path.relative_to(root.anchor)
         names = {
@@ -48,7 +57,13 @@ class Listdir(Operation):
             )
 
     def execute_api(self, api: Api) -> None:
-        names = {Path(obj["path"]).name for obj in api.listdir(self.path)}
+        self._check_listing(api.listdir(self.path))
+
+    async def execute_async_api(self, api: AsyncApi) -> None:
+        self._check_listing(await api.listdir(self.path))
+
+    def _check_listing(self, listing: list[dict[str, Any]]) -> None:
+        names = {Path(obj["path"]).name for obj in listing}
         names = {name for name in names if not name.startswith(".")}
         if names != self.expected:
             raise VerificationError(
@@ -64,5 +79,8 @@ class Listdir(Operation):
     def verify_api(self, api: Api) -> None:
         pass  # there is no change to verify
 
+    async def verify_async_api(self, api: AsyncApi) -> None:
+        pass  # there is no change to verify
+
     def __str__(self) -> str:
         return f"LISTDIR {self.path}"
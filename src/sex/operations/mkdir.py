@@ -0,0 +1,91 @@
+"""Make directory operation."""
+
+from pathlib import Path
+from typing import Any
+from typing import Optional
+from typing import Self
+
+from requests.exceptions import HTTPError
+
+from sex.api import Api
+from sex.async_api import AsyncApi
+from sex.operation import Operation
+from sex.operation import VerificationError
+from sex.state import State
+
+
+class Mkdir(Operation):
+    """
+    Make directory operation.
+
+    This operation is not generated randomly; it is used to lay out the directories that shards run in.
+    """
+
+    @classmethod
+    @property
+    def name(cls) -> str:
+        return "MKDIR"
+
+    @classmethod
+    def build(cls, state: State) -> Optional[Self]:
+        return None
+
+    def __init__(self, path: Path) -> None:
+        """
+        Initialize a new make directory operation.
+
+        :param path: The path to the directory to create.
+        """
+        self.path = path
+
+    @classmethod
+    def from_record(cls, state: State, record: dict[str, Any]) -> Self:
+        return cls(Path(record["path"]))
+
+    def write_paths(self) -> set[Path]:
+        return {self.path, self.path.parent}
+
+    def execute_mount(self, root: Path) -> None:
+        path = root / self.path.relative_to(root.anchor)
+        path.mkdir()
+
+    def execute_api(self, api: Api) -> None:
+        api.mkdir(self.path)
+
+    async def execute_async_api(self, api: AsyncApi) -> None:
+        await api.mkdir(self.path)
+
+    def update(self, state: State) -> None:
+        state.create_directory(self.path)
+
+    def verify_mount(self, root: Path) -> None:
+        path = root / self.path.relative_to(root.anchor)
+        if not path.is_dir():
+            raise VerificationError(f"Directory {path} does not exist")
+
+    def verify_api(self, api: Api) -> None:
+        try:
+            data = api.getattr(self.path)
+        except HTTPError as e:
+            if e.response.status_code == 404:
+                raise VerificationError(
+                    f"Directory {self.path} does not exist"
+                ) from None
+            raise
+        if data["type"] == "file":
+            raise VerificationError(f"Path {self.path} is not a directory")
+
+    async def verify_async_api(self, api: AsyncApi) -> None:
+        try:
+            data = await api.getattr(self.path)
+        except HTTPError as e:
+            if e.response.status_code == 404:
+                raise VerificationError(
+                    f"Directory {self.path} does not exist"
+                ) from None
+            raise
+        if data["type"] == "file":
+            raise VerificationError(f"Path {self.path} is not a directory")
+
+    def __str__(self) -> str:
+        return f"MKDIR {self.path}"
@@ -1,15 +1,19 @@
 """Read operation."""
 
-import random
 from pathlib import Path
+from typing import Any
 from typing import Optional
 from typing import Self
 
 from sex.api import Api
-from sex.constants import ACTUAL_DATA_FILENAME
-from sex.constants import EXPECTED_DATA_FILENAME
+from sex.async_api import AsyncApi
+from sex.compare import compare_chunks
+from sex.compare import compare_chunks_async
+from sex.compare import compare_samples
+from sex.constants import CHUNK_SIZE
+from sex.fileio import read_chunks
 from sex.operation import Operation
-from sex.operation import VerificationError
+from sex.state import File
 from sex.state import State
 
 
@@ -24,42 +28,51 @@ class Read(Operation):
     @classmethod
     def build(cls, state: State) -> Optional[Self]:
         try:
-            path, file = random.choice(state.files())
+            path, file = state.random_file()
         except IndexError:
             return None
-        return cls(path, file.data)
+        return cls(path, file.copy(), state.verify_samples)
 
-    def __init__(self, path: Path, expected: bytes) -> None:
+    @classmethod
+    def from_record(cls, state: State, record: dict[str, Any]) -> Self:
+        path = Path(record["path"])
+        return cls(path, state.resolve_file(path).copy(), state.verify_samples)
+
+    def __init__(self, path: Path, expected: File, samples: int = 0) -> None:
         """
         Initialize a new read operation.
 
         :param path: The path to the file to read.
-        :param offset: The offset in the file to start reading from.
-        :param length: The number of bytes to read.
-        :param expected: The expected bytes that should be read.
+        :param expected: The expected file, with the contents that should be read.
+        :param samples: The number of blocks to verify when reading from a mount, or 0 to verify the whole file.
         """
         self.path = path
         self.expected = expected
+        self.samples = samples
+
+    def digest(self) -> Optional[bytes]:
+        return self.expected.digest()
+
+    def read_paths(self) -> set[Path]:
+        return {self.path}
 
     def execute_mount(self, root: Path) -> None:
         path = root / self.path.relative_to(root.anchor)
-        with path.open("rb") as f:
-            data = f.read()
-        if data != self.expected:
-            Path(ACTUAL_DATA_FILENAME).write_bytes(data)
-            Path(EXPECTED_DATA_FILENAME).write_bytes(self.expected)
-            raise VerificationError(
-                f"Read data (at {ACTUAL_DATA_FILENAME}) does not match expected (at {EXPECTED_DATA_FILENAME})"
-            )
+        if self.samples:
+            compare_samples(path, path, self.expected, self.samples)
+        else:
+            compare_chunks(path, read_chunks(path), self.expected)
 
     def execute_api(self, api: Api) -> None:
-        data = api.download(self.path)
-        if data != self.expected:
-            Path(ACTUAL_DATA_FILENAME).write_bytes(data)
-            Path(EXPECTED_DATA_FILENAME).write_bytes(self.expected)
-            raise VerificationError(
-                f"Read data (at {ACTUAL_DATA_FILENAME}) does not match expected (at {EXPECTED_DATA_FILENAME})"
-            )
+        compare_chunks(
+            f"{api}{self.path}",
+            api.download_chunks(self.path, CHUNK_SIZE),
+            self.expected,
+        )
+
+    async def execute_async_api(self, api: AsyncApi) -> None:
+        async with api.download_chunks(self.path) as chunks:
+            await compare_chunks_async(f"{api}{self.path}", chunks, self.expected)
 
     def update(self, state: State) -> None:
         pass  # there is no change to the state
@@ -70,5 +83,8 @@ class Read(Operation):
     def verify_api(self, api: Api) -> None:
         pass  # there is no change to verify
 
+    async def verify_async_api(self, api: AsyncApi) -> None:
+        pass  # there is no change to verify
+
     def __str__(self) -> str:
         return f"READ {self.path}"
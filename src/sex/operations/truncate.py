@@ -1,11 +1,13 @@
 """Truncate operation."""
 
-import random
 from pathlib import Path
+from typing import Any
 from typing import Optional
 from typing import Self
 
 from sex.api import Api
+from sex.async_api import AsyncApi
+from sex.fileio import drain
 from sex.operation import Operation
 from sex.operation import VerificationError
 from sex.state import State
@@ -14,22 +16,25 @@ from sex.state import State
 class Truncate(Operation):
     """Truncate operation."""
 
-    MAX_SIZE = 0xFFFF
-
     @classmethod
     @property
-    def name(cls):
+    def name(cls) -> str:
         return "TRUNCATE"
 
     @classmethod
     def build(cls, state: State) -> Optional[Self]:
         try:
-            path, file = random.choice(state.files())
+            path, file = state.random_file()
         except IndexError:
             return None
-        size = random.randint(0, cls.MAX_SIZE)
+        size = state.file_sizes.sample()
+        size -= size % state.content_type.alignment
         return cls(path, size)
 
+    @classmethod
+    def from_record(cls, state: State, record: dict[str, Any]) -> Self:
+        return cls(Path(record["path"]), record["size"])
+
     def __init__(self, path: Path, size: int) -> None:
         """
         Initialize a new truncate operation.
@@ -40,21 +45,23 @@ class Truncate(Operation):
         self.path = path
         self.size = size
 
-    def is_executable_for_client(self, client: Path | Api) -> bool:
+    def to_record(self) -> dict[str, Any]:
+        return {"path": str(self.path), "size": self.size}
+
+    def write_paths(self) -> set[Path]:
+        return {self.path}
+
+    def is_executable_for_client(self, client: Path | Api | AsyncApi) -> bool:
         return isinstance(client, Path)
 
     def update(self, state: State) -> None:
-        data: bytearray = state.resolve_file(self.path).data
-        if len(data) < self.size:
-            data.extend(b"\0" * (self.size - len(data)))
-        else:
-            del data[self.size :]
+        state.truncate_file(self.path, self.size)
 
     def execute_mount(self, root: Path) -> None:
         path = root / self.path.relative_to(root.anchor)
 
         # TODO: workaround for unsupported async truncate in shadefs
-        path.read_bytes()
+        drain(path)
 
         with path.open("r+b") as f:
             f.truncate(self.size)
@@ -71,7 +78,12 @@ class Truncate(Operation):
             )
 
     def verify_api(self, api: Api) -> None:
-        data = api.getattr(self.path)
+        self._check_attributes(api.getattr(self.path))
+
+    async def verify_async_api(self, api: AsyncApi) -> None:
+        self._check_attributes(await api.getattr(self.path))
+
+    def _check_attributes(self, data: dict[str, Any]) -> None:
         if data["type"] != "file":
             raise VerificationError(f"Path {self.path} is not a file")
         if data["size"] != self.size:
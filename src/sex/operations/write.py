@@ -2,14 +2,24 @@
 
 import random
 from pathlib import Path
+from typing import Any
 from typing import Optional
 from typing import Self
 
 from sex.api import Api
-from sex.constants import ACTUAL_DATA_FILENAME
-from sex.constants import EXPECTED_DATA_FILENAME
+from sex.async_api import AsyncApi
+from sex.compare import compare_chunks
+from sex.compare import compare_chunks_async
+from sex.compare import compare_samples
+from sex.constants import CHUNK_SIZE
+from sex.content import Content
+from sex.content import content_from_record
+from sex.content import literal
+from sex.fileio import drain
+from sex.fileio import pwrite_chunks
+from sex.fileio import read_chunks
 from sex.operation import Operation
-from sex.operation import VerificationError
+from sex.state import File
 from sex.state import State
 
 
@@ -24,79 +34,130 @@ class Write(Operation):
     @classmethod
     def build(cls, state: State) -> Optional[Self]:
         try:
-            path, file = random.choice(state.files())
+            path, file = state.random_file()
         except IndexError:
             return None
-        offset = random.randint(0, len(file.data))
-        length = random.randint(0, len(file.data) - offset)
-        data = bytes(random.getrandbits(8) for _ in range(length))
-        return cls.build_with(state, path, offset, data)
+        alignment = file.content.alignment
+        offset = random.randint(0, len(file.content))
+        offset -= offset % alignment
+        length = random.randint(0, len(file.content) - offset)
+        length -= length % alignment
+        data = file.content.overwrite(
+            offset, length, random.getrandbits(64), state.payload
+        )
+        return cls.build_with(state, path, offset, data, state.verify_samples)
 
     @classmethod
-    def build_with(cls, state: State, path: Path, offset: int, data: bytes):
+    def build_with(
+        cls,
+        state: State,
+        path: Path,
+        offset: int,
+        data: bytes | Content,
+        samples: int = 0,
+    ) -> Self:
         file = state.resolve_file(path)
+        if not isinstance(data, Content):
+            data = literal(data)
 
         start = offset
         end = offset + len(data)
-        is_valid = 0 < start and end <= len(file.data)
+        is_valid = 0 <= start and end <= len(file.content)
 
         if not is_valid:
             raise ValueError("Data must fit within the file")
 
-        expected = file.data[:offset] + data + file.data[offset + len(data) :]
-        return cls(path, offset, data, expected)
+        expected = file.copy()
+        expected.write(offset, data)
+        return cls(path, offset, data, expected, samples)
 
-    def __init__(self, path: Path, offset: int, data: bytes, expected: bytes) -> None:
+    @classmethod
+    def from_record(cls, state: State, record: dict[str, Any]) -> Self:
+        return cls.build_with(
+            state,
+            Path(record["path"]),
+            record["offset"],
+            content_from_record(record["data"]),
+            state.verify_samples,
+        )
+
+    def __init__(
+        self,
+        path: Path,
+        offset: int,
+        data: Content,
+        expected: File,
+        samples: int = 0,
+    ) -> None:
         """
         Initialize a new write operation.
 
         :param path: The path to the file to write.
         :param offset: The offset in the file to start writing from.
-        :param data: The bytes to write.
+        :param data: The contents to write.
+        :param expected: The expected file after the write.
+        :param samples: The number of written blocks to verify on mounts, or 0 to verify the whole file.
         """
         # TODO pull the length from data
         self.path = path
         self.offset = offset
         self.data = data
         self.expected = expected
+        self.samples = samples
+
+    def to_record(self) -> dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "offset": self.offset,
+            "data": self.data.to_record(),
+        }
+
+    def digest(self) -> Optional[bytes]:
+        return self.expected.digest()
+
+    def write_paths(self) -> set[Path]:
+        return {self.path}
 
     def execute_mount(self, root: Path) -> None:
         path = root / self.path.relative_to(root.anchor)
 
         # TODO: workaround for unsupported async write in shadefs
-        path.read_bytes()
+        drain(path)
 
-        with path.open("r+b") as f:
-            f.seek(self.offset)
-            f.write(self.data)
+        with path.open("r+b", buffering=0) as f:
+            pwrite_chunks(f.fileno(), self.offset, self.data.chunks())
 
-    def is_executable_for_client(self, client: Path | Api) -> bool:
+    def is_executable_for_client(self, client: Path | Api | AsyncApi) -> bool:
         return isinstance(client, Path)
 
     def update(self, state: State) -> None:
-        state.resolve_file(self.path).data[
-            self.offset : self.offset + len(self.data)
-        ] = self.data
+        # the expected file already hashes the data
+        state.write_file(self.path, self.offset, self.data, self.expected)
 
     def verify_mount(self, root: Path) -> None:
         path = root / self.path.relative_to(root.anchor)
-        with path.open("rb") as f:
-            data = f.read()
-        if data != self.expected:
-            Path(ACTUAL_DATA_FILENAME).write_bytes(data)
-            Path(EXPECTED_DATA_FILENAME).write_bytes(self.expected)
-            raise VerificationError(
-                f"Read data (at {ACTUAL_DATA_FILENAME}) does not match expected (at {EXPECTED_DATA_FILENAME})"
+        if self.samples:
+            compare_samples(
+                path,
+                path,
+                self.expected,
+                self.samples,
+                self.offset,
+                self.offset + len(self.data),
             )
+        else:
+            compare_chunks(path, read_chunks(path), self.expected)
 
     def verify_api(self, api: Api) -> None:
-        data = api.download(self.path)
-        if data != self.expected:
-            Path(ACTUAL_DATA_FILENAME).write_bytes(data)
-            Path(EXPECTED_DATA_FILENAME).write_bytes(self.expected)
-            raise VerificationError(
-                f"Read data (at {ACTUAL_DATA_FILENAME}) does not match expected (at {EXPECTED_DATA_FILENAME})"
-            )
+        compare_chunks(
+            f"{api}{self.path}",
+            api.download_chunks(self.path, CHUNK_SIZE),
+            self.expected,
+        )
+
+    async def verify_async_api(self, api: AsyncApi) -> None:
+        async with api.download_chunks(self.path) as chunks:
+            await compare_chunks_async(f"{api}{self.path}", chunks, self.expected)
 
     def __str__(self) -> str:
         length = len(self.data)
@@ -0,0 +1,162 @@
+"""Deterministic generation of file data."""
+
+import abc
+import functools
+import hashlib
+import random
+
+from sex.words import words
+
+
+#: Size of the blocks of generated data; every block is derived independently from its seed and index.
+GENERATOR_BLOCK_SIZE = 1 << 16
+
+
+def _mix(seed: int, index: int, size: int = 8) -> bytes:
+    # a hash of a seed and block index, for profiles that only need a few random bytes per block
+    return hashlib.blake2b(
+        seed.to_bytes(8, "little") + index.to_bytes(8, "little"), digest_size=size
+    ).digest()
+
+
+class Profile(abc.ABC):
+    """
+    A kind of generated file data.
+
+    The data of a seed is a stream split into blocks of `GENERATOR_BLOCK_SIZE` that are generated independently
+    from the seed and their index, so any range can be regenerated without generating what comes before it.
+    """
+
+    #: The name of the profile, to select it with.
+    name: str
+
+    @abc.abstractmethod
+    def block(self, seed: int, index: int) -> bytes | memoryview:
+        """
+        Generate a block of the stream of a seed.
+
+        :param seed: The seed of the stream, below `2 ** 64`.
+        :param index: The index of the block in the stream.
+        :return: The `GENERATOR_BLOCK_SIZE` bytes of the block, possibly as a view of data that must not change.
+        """
+
+    def generate(self, seed: int, offset: int, length: int) -> bytes:
+        """
+        Generate a range of the stream of a seed.
+
+        :param seed: The seed of the stream, below `2 ** 64`.
+        :param offset: The offset of the range in the stream.
+        :param length: The length of the range.
+        :return: The bytes of the range.
+        """
+        if length <= 0:
+            return b""
+        end = offset + length
+        first = offset // GENERATOR_BLOCK_SIZE
+        last = (end - 1) // GENERATOR_BLOCK_SIZE
+        # blocks are cut as views, so that the data is copied once, when joined
+        blocks = [
+            memoryview(self.block(seed, index)) for index in range(first, last + 1)
+        ]
+        blocks[-1] = blocks[-1][: end - last * GENERATOR_BLOCK_SIZE]
+        blocks[0] = blocks[0][offset - first * GENERATOR_BLOCK_SIZE :]
+        return b"".join(blocks)
+
+
+class Incompressible(Profile):
+    """Pseudo-random bytes, which neither compress nor deduplicate."""
+
+    name = "random"
+
+    def block(self, seed: int, index: int) -> bytes:
+        return random.Random((seed << 32) | index).randbytes(GENERATOR_BLOCK_SIZE)
+
+
+class Text(Profile):
+    """
+    English text made of `sex.words`, which compresses well.
+
+    Every block is a window, at an offset derived from its seed and index, into a fixed corpus of random words, so
+    blocks cost a copy rather than drawing every word.
+    """
+
+    name = "text"
+    #: Size of the corpus that blocks are cut from.
+    CORPUS_SIZE = 1 << 20
+
+    @functools.cached_property
+    def corpus(self) -> bytes:
+        """:return: The corpus, with room for a block at any offset below `CORPUS_SIZE`."""
+        rng = random.Random(0)
+        size = self.CORPUS_SIZE + GENERATOR_BLOCK_SIZE
+        text = bytearray()
+        while len(text) < size:
+            line = " ".join(rng.choices(words, k=rng.randint(4, 16)))
+            text += line.capitalize().encode() + b".\n"
+        return bytes(text[:size])
+
+    def block(self, seed: int, index: int) -> memoryview:
+        start = int.from_bytes(_mix(seed, index)) % self.CORPUS_SIZE
+        return memoryview(self.corpus)[start : start + GENERATOR_BLOCK_SIZE]
+
+
+class Duplicated(Profile):
+    """
+    Data made of a small set of distinct chunks, so that most chunks of any file duplicate others.
+
+    Chunks are `CHUNK_SIZE` bytes, aligned to multiples of their size in the stream; every block picks its chunks
+    from the same `DISTINCT` ones, regardless of the seed.
+    """
+
+    name = "dedup"
+    CHUNK_SIZE = 4096
+    DISTINCT = 64
+
+    @functools.cached_property
+    def chunks(self) -> list[bytes]:
+        """:return: The distinct chunks."""
+        rng = random.Random(0)
+        return [rng.randbytes(self.CHUNK_SIZE) for _ in range(self.DISTINCT)]
+
+    def block(self, seed: int, index: int) -> bytes:
+        return self.generate(seed, index * GENERATOR_BLOCK_SIZE, GENERATOR_BLOCK_SIZE)
+
+    def generate(self, seed: int, offset: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+        end = offset + length
+        per_block = GENERATOR_BLOCK_SIZE // self.CHUNK_SIZE
+        first = offset // self.CHUNK_SIZE
+        last = (end - 1) // self.CHUNK_SIZE
+        chunks = []
+        picks = b""
+        for index in range(first, last + 1):
+            if not picks or index % per_block == 0:
+                picks = _mix(seed, index // per_block, per_block)
+            chunks.append(
+                memoryview(self.chunks[picks[index % per_block] % self.DISTINCT])
+            )
+        chunks[-1] = chunks[-1][: end - last * self.CHUNK_SIZE]
+        chunks[0] = chunks[0][offset - first * self.CHUNK_SIZE :]
+        return b"".join(chunks)
+
+
+class Zeros(Profile):
+    """Zero bytes only, e.g. for filesystems that detect zero runs."""
+
+    name = "zeros"
+
+    def block(self, seed: int, index: int) -> bytes:
+        return bytes(GENERATOR_BLOCK_SIZE)
+
+    def generate(self, seed: int, offset: int, length: int) -> bytes:
+        return bytes(max(length, 0))
+
+
+#: The profiles that can be chosen from, by name.
+PROFILES: dict[str, Profile] = {
+    profile.name: profile
+    for profile in (Incompressible(), Text(), Duplicated(), Zeros())
+}
+#: The name of the default profile.
+DEFAULT_PROFILE = Incompressible.name
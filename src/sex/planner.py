@@ -0,0 +1,94 @@
+"""Generation of random operations against the model."""
+
+import random
+import time
+from pathlib import Path
+from typing import Iterator
+from typing import Tuple
+from typing import TypeVar
+
+import click
+
+from sex.api import Api
+from sex.async_api import AsyncApi
+from sex.operation import Operation
+from sex.state import State
+from sex.trace import TraceWriter
+
+
+#: The type of the clients that operations are picked for.
+C = TypeVar("C", bound=Path | Api | AsyncApi)
+
+
+def random_operations(
+    state: State,
+    clients: list[C],
+    num_operations: int,
+    operations: list[type[Operation]],
+    start: int = 0,
+) -> Iterator[Tuple[int, Operation, C]]:
+    """
+    Generate random operations using the standard library `random` module.
+
+    Every operation is built against the state as it is when the operation is generated, so the consumer must apply
+    each operation to the state (see `Operation.update`) before asking for the next one. For a given seed, this
+    always generates the same operations.
+
+    :param state: The current state of the system.
+    :param clients: The clients to pick from, the mountpoints followed by the APIs.
+    :param num_operations: The number of operations to generate, or -1 to generate operations forever.
+    :param operations: The types of operations to pick from.
+    :param start: The index of the first operation, when continuing a run.
+    :return: An iterator over the indices of the operations, the operations, and the clients they run on.
+    """
+    n = start
+    while num_operations == -1 or n < num_operations:
+        # pick a new operation at random
+        op_cls = random.choice(operations)
+        operation = op_cls.build(state)
+        if operation is None:
+            # skip operation
+            continue
+
+        # pick a mountpoint for the operation
+        client = random.choice(clients)
+        if not operation.is_executable_for_client(client):
+            continue
+
+        yield n, operation, client
+        n += 1
+
+
+def plan_random(
+    state: State,
+    verbose: bool,
+    num_operations: int,
+    clients: list[Path | Api],
+    operations: list[type[Operation]],
+    trace: TraceWriter,
+) -> None:
+    """
+    Generate random operations against the model only and write them to a trace, without running them.
+
+    The trace holds the same operations as a run with the same seed, clients and options, and can be run against the
+    clients later by replaying it.
+
+    :param state: The model to plan against, whose cleanup must not be set since nothing is created.
+    :param num_operations: The number of operations to generate.
+    :param clients: The clients the operations are planned for, the mountpoints followed by the APIs.
+    :param operations: The types of operations to pick from.
+    :param trace: Where to write the operations.
+    """
+    start = time.perf_counter()
+    for n, operation, client in random_operations(
+        state, clients, num_operations, operations
+    ):
+        if verbose:
+            click.echo(f"{n}: {operation} on {client}")
+        trace.write(n, operation, clients.index(client))
+        operation.update(state)
+    elapsed = time.perf_counter() - start
+    click.echo(
+        f"Planned {num_operations} operations in {elapsed:.2f}s "
+        f"({num_operations / elapsed if elapsed else 0:.0f} operations/s)"
+    )
@@ -0,0 +1,187 @@
+"""Concurrent execution of operations over disjoint paths."""
+
+import threading
+from pathlib import Path
+from typing import Callable
+from typing import Optional
+
+from sex.api import Api
+from sex.metrics import Metrics
+from sex.operation import Operation
+from sex.state import State
+from sex.verification import VerificationPipeline
+
+
+class Scheduler(VerificationPipeline):
+    """
+    Execute and verify up to `concurrency` operations at once.
+
+    Each operation holds locks on the paths it reads and writes (including the parent directory of files it creates
+    or deletes) from the moment it is dispatched until it has been verified on every client, so only operations over
+    disjoint paths ever run together.
+
+    Operations are applied to the model in dispatch (commit) order as soon as their locks are granted, before they
+    are executed. Since every later operation is built from that model and waits for its conflicting predecessors,
+    the sequence of operations for a given seed does not depend on how the concurrent executions interleave.
+    """
+
+    def __init__(
+        self,
+        clients: list[Path | Api],
+        timeout: float,
+        show_progress: bool,
+        verbose: bool,
+        concurrency: int,
+        on_verified: Optional[Callable[[int, Operation], None]] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        """
+        Initialize a new scheduler.
+
+        :param clients: list of clients to verify operations on.
+        :param timeout: The verification timeout in seconds, see `verify_operation`.
+        :param show_progress: If true, print remaining timeout to stdout while verifying.
+        :param verbose: If true, print convergence times of every verified operation.
+        :param concurrency: The maximum number of operations in flight at once.
+        :param on_verified: Called with the index and operation of every operation once it has been verified.
+        :param metrics: Where to record the latency of every execution and verification.
+        """
+        super().__init__(
+            clients, timeout, show_progress, verbose, concurrency, on_verified, metrics
+        )
+
+    def dispatch(
+        self, n: int, operation: Operation, client: Path | Api, state: State
+    ) -> None:
+        self.admit(operation)
+        operation.update(state)
+        # execute in the background too
+        self._background(n, operation, client, None)
+
+
+class _Node:
+    """An operation of a `DependencyScheduler`, with its edges in the dependency graph."""
+
+    def __init__(self, n: int, operation: Operation, client: Path | Api) -> None:
+        self.n = n
+        self.operation = operation
+        self.client = client
+        self.reads = operation.read_paths() - operation.write_paths()
+        self.writes = operation.write_paths()
+        #: The number of earlier operations that must finish before this one may run.
+        self.waiting = 0
+        #: The later operations that wait for this one.
+        self.dependents: list["_Node"] = []
+
+
+class DependencyScheduler(VerificationPipeline):
+    """
+    Execute and verify operations as soon as every earlier operation they depend on has been verified.
+
+    Operations form a dependency graph in dispatch order: an operation depends on every earlier unfinished operation
+    that writes a path it reads or writes, or that reads a path it writes (see `Operation.conflicts_with`). Since
+    files created or deleted write their parent directory and listings read it, this orders operations on the same
+    file, on a directory and its entries, and listings of changing directories. Unlike `Scheduler`, dispatch never
+    waits for a conflict, so independent operations further ahead run while earlier ones wait for theirs.
+
+    Operations are applied to the model in dispatch order when they are dispatched, and every operation only runs
+    after the operations it depends on, so the final state is the same as that of a serial run.
+    """
+
+    #: Number of operations that may be dispatched but not yet finished, per job.
+    LOOKAHEAD = 16
+
+    def __init__(
+        self,
+        clients: list[Path | Api],
+        timeout: float,
+        show_progress: bool,
+        verbose: bool,
+        jobs: int,
+        on_verified: Optional[Callable[[int, Operation], None]] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        """
+        Initialize a new dependency scheduler.
+
+        :param clients: list of clients to verify operations on.
+        :param timeout: The verification timeout in seconds, see `verify_operation`.
+        :param show_progress: If true, print remaining timeout to stdout while verifying.
+        :param verbose: If true, print convergence times of every verified operation.
+        :param jobs: The maximum number of operations running at once.
+        :param on_verified: Called with the index and operation of every operation once it has been verified.
+        :param metrics: Where to record the latency of every execution and verification.
+        """
+        super().__init__(
+            clients, timeout, show_progress, verbose, jobs, on_verified, metrics
+        )
+        self._slots = threading.BoundedSemaphore(jobs * self.LOOKAHEAD)
+        #: The last unfinished operation writing each path.
+        self._writers: dict[Path, _Node] = {}
+        #: The unfinished operations reading each path since its last writer.
+        self._readers: dict[Path, set[_Node]] = {}
+
+    def dispatch(
+        self, n: int, operation: Operation, client: Path | Api, state: State
+    ) -> None:
+        self._raise_failure()
+        self._slots.acquire()
+        operation.update(state)
+        node = _Node(n, operation, client)
+        with self._mutex:
+            dependencies = {
+                self._writers[path]
+                for path in node.reads | node.writes
+                if path in self._writers
+            }
+            for path in node.writes:
+                dependencies.update(self._readers.pop(path, ()))
+                self._writers[path] = node
+            for path in node.reads:
+                self._readers.setdefault(path, set()).add(node)
+            node.waiting = len(dependencies)
+            for dependency in dependencies:
+                dependency.dependents.append(node)
+        if not node.waiting:
+            self._start(node)
+
+    def _start(self, node: _Node) -> None:
+        future = self._pool.submit(self._run_node, node)
+        with self._mutex:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _run_node(self, node: _Node) -> None:
+        try:
+            # once an operation failed, the rest of the graph is only unwound
+            if self._failure is None:
+                executed_at = self._execute(node.n, node.operation, node.client)
+                self._verify(node.n, node.operation, node.client, executed_at)
+        except BaseException as e:
+            with self._mutex:
+                if self._failure is None:
+                    self._failure = e
+            raise
+        finally:
+            self._finish(node)
+
+    def _finish(self, node: _Node) -> None:
+        ready = []
+        with self._mutex:
+            for path in node.writes:
+                if self._writers.get(path) is node:
+                    del self._writers[path]
+            for path in node.reads:
+                readers = self._readers.get(path)
+                if readers is not None:
+                    readers.discard(node)
+                    if not readers:
+                        del self._readers[path]
+            for dependent in node.dependents:
+                dependent.waiting -= 1
+                if not dependent.waiting:
+                    ready.append(dependent)
+        # dependents are started before this operation's future completes, so `drain` always sees them pending
+        for dependent in ready:
+            self._start(dependent)
+        self._slots.release()
@@ -0,0 +1,317 @@
+"""Multi-process exercising, with each worker confined to its own subtree."""
+
+import multiprocessing
+import queue
+import random
+import signal
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Optional
+
+import click
+
+from sex.api import Api
+from sex.metrics import Metrics
+from sex.operation import Operation
+from sex.operations.mkdir import Mkdir
+from sex.verification import OperationFailedError
+from sex.verification import verify_operation
+
+
+#: Runs the exerciser for one shard, given its clients, cleanup path, a callback for verified operations and the
+#: metrics to record into.
+ShardRunner = Callable[
+    [
+        list[Path],
+        list[Api],
+        Optional[Path],
+        Callable[[int, Operation], None],
+        Metrics,
+    ],
+    None,
+]
+
+#: Seconds between progress reports.
+REPORT_INTERVAL = 5.0
+
+
+def shard_path(shard: int) -> Path:
+    """
+    Get the directory a shard runs in.
+
+    :param shard: The shard id.
+    :return: The absolute path of the shard directory on every client.
+    """
+    return Path(f"/shard-{shard}")
+
+
+def shard_seed(seed: int, shard: int) -> str:
+    """
+    Derive the seed of a shard's random number generator stream.
+
+    :param seed: The seed of the whole run.
+    :param shard: The shard id.
+    :return: A seed for `random.seed`, distinct for every shard.
+    """
+    return f"{seed}/{shard}"
+
+
+def prepare_shards(
+    mountpoints: list[Path], apis: list[Api], shards: list[int], timeout: float
+) -> None:
+    """
+    Create the directories of the given shards and wait for them to be visible on every client.
+
+    :param mountpoints: The mountpoints of the run.
+    :param apis: The API clients of the run.
+    :param shards: The ids of the shards to create.
+    :param timeout: The verification timeout in seconds.
+    """
+    clients: list[Path | Api] = [*mountpoints, *apis]
+    for shard in shards:
+        mkdir = Mkdir(shard_path(shard))
+        mkdir.execute(clients[0])
+        verify_operation(clients, mkdir, timeout, False)
+
+
+def remove_shards(cleanup: Path, shards: list[int]) -> None:
+    """
+    Remove the directories of the given shards, leaving behind any that are not empty.
+
+    :param cleanup: The mountpoint to clean up.
+    :param shards: The ids of the shards to remove.
+    """
+    for shard in shards:
+        try:
+            (cleanup / shard_path(shard).relative_to("/")).rmdir()
+        except OSError as e:
+            click.echo(f"Could not remove shard {shard}: {e}", err=True)
+
+
+def run_shard(
+    shard: int,
+    seed: int,
+    mountpoints: list[Path],
+    apis: list[Api],
+    cleanup: Optional[Path],
+    runner: ShardRunner,
+    on_verified: Callable[[int, Operation], None],
+    metrics: Metrics,
+) -> None:
+    """
+    Run the exerciser for a single shard in the current process.
+
+    Metrics are recorded under the clients of the whole run rather than those of the shard.
+
+    :param shard: The shard id.
+    :param seed: The seed of the whole run.
+    :param mountpoints: The mountpoints of the run; the shard uses a subdirectory of each.
+    :param apis: The API clients of the run; the shard uses a subdirectory of each drive.
+    :param cleanup: The mountpoint to clean up, if any.
+    :param runner: The function running the exerciser.
+    :param on_verified: Called with the index and operation of every operation once it has been verified.
+    :param metrics: Where to record the latency of every execution and verification.
+    """
+    path = shard_path(shard)
+    relative = path.relative_to(path.anchor)
+    shard_mountpoints = [mountpoint / relative for mountpoint in mountpoints]
+    shard_apis = [api.subtree(path) for api in apis]
+    random.seed(shard_seed(seed, shard))
+    try:
+        runner(
+            shard_mountpoints,
+            shard_apis,
+            cleanup / relative if cleanup else None,
+            on_verified,
+            metrics,
+        )
+    finally:
+        metrics.relabel(
+            {
+                str(shard_client): str(client)
+                for shard_client, client in zip(
+                    [*shard_mountpoints, *shard_apis],
+                    [*mountpoints, *apis],
+                    strict=True,
+                )
+            }
+        )
+
+
+def _terminate(signum: int, frame: Any) -> None:
+    # unwind normally, so that the shard cleans up after itself
+    sys.exit(128 + signum)
+
+
+def _worker(
+    shard: int,
+    seed: int,
+    mountpoints: list[Path],
+    apis: list[Api],
+    cleanup: Optional[Path],
+    runner: ShardRunner,
+    reports: "multiprocessing.Queue[tuple[Any, ...]]",
+) -> None:
+    signal.signal(signal.SIGTERM, _terminate)
+
+    lock = threading.Lock()
+    completed = 0
+    last_report = time.monotonic()
+
+    def on_verified(n: int, operation: Operation) -> None:
+        nonlocal completed, last_report
+        with lock:
+            completed += 1
+            if time.monotonic() - last_report >= REPORT_INTERVAL / 2:
+                last_report = time.monotonic()
+                reports.put(("progress", shard, completed))
+
+    metrics = Metrics()
+    try:
+        run_shard(shard, seed, mountpoints, apis, cleanup, runner, on_verified, metrics)
+    except OperationFailedError as e:
+        click.echo(f"[shard {shard}] {traceback.format_exc()}", err=True)
+        reports.put(("failed", shard, completed, metrics, e.n, repr(e.__cause__)))
+    except Exception as e:
+        click.echo(f"[shard {shard}] {traceback.format_exc()}", err=True)
+        reports.put(("failed", shard, completed, metrics, None, repr(e)))
+    except SystemExit:
+        reports.put(("stopped", shard, completed, metrics))
+        raise
+    else:
+        reports.put(("done", shard, completed, metrics))
+
+
+def run_workers(
+    workers: int,
+    seed: int,
+    mountpoints: list[Path],
+    apis: list[Api],
+    cleanup: Optional[Path],
+    timeout: float,
+    runner: ShardRunner,
+    metrics: Metrics,
+) -> None:
+    """
+    Run the exerciser in `workers` forked processes, one shard each, and report on their progress.
+
+    Every worker owns the directory `shard_path(i)` on every client, its own model and its own random stream
+    (see `shard_seed`). The first failing worker stops all the others.
+
+    :param workers: The number of worker processes.
+    :param seed: The seed of the whole run.
+    :param mountpoints: The mountpoints of the run.
+    :param apis: The API clients of the run.
+    :param cleanup: The mountpoint to clean up, if any.
+    :param timeout: The verification timeout in seconds.
+    :param runner: The function running the exerciser for each shard.
+    :param metrics: Where to merge the metrics of every worker.
+    :raises ClickException: If any worker failed.
+    """
+    shards = list(range(workers))
+    prepare_shards(mountpoints, apis, shards, timeout)
+
+    context = multiprocessing.get_context("fork")
+    reports: "multiprocessing.Queue[tuple[Any, ...]]" = context.Queue()
+    processes = {
+        shard: context.Process(
+            target=_worker,
+            args=(shard, seed, mountpoints, apis, cleanup, runner, reports),
+            name=f"shard-{shard}",
+        )
+        for shard in shards
+    }
+
+    start = time.perf_counter()
+    for process in processes.values():
+        process.start()
+
+    completed = dict.fromkeys(shards, 0)
+    failures: list[tuple[int, Optional[int], str]] = []
+    running = set(shards)
+    stopping = False
+    last_report = time.monotonic()
+
+    def handle(report: tuple[Any, ...]) -> None:
+        nonlocal stopping
+        kind, shard, count, *details = report
+        completed[shard] = count
+        if kind in ("done", "stopped", "failed"):
+            metrics.merge(details.pop(0))
+        if kind == "failed":
+            failures.append((shard, *details))
+            running.discard(shard)
+            if not stopping:
+                stopping = True
+                for other in running:
+                    processes[other].terminate()
+        elif kind in ("done", "stopped"):
+            running.discard(shard)
+
+    while running:
+        try:
+            handle(reports.get(timeout=0.5))
+        except queue.Empty:
+            pass
+
+        for shard in list(running):
+            if processes[shard].exitcode is None:
+                continue
+            # the report of a worker that just exited may still be in flight
+            try:
+                while True:
+                    handle(reports.get(timeout=0.1))
+            except queue.Empty:
+                pass
+            if shard in running:
+                running.discard(shard)
+                if not stopping:
+                    failures.append(
+                        (
+                            shard,
+                            None,
+                            f"exited with code {processes[shard].exitcode}",
+                        )
+                    )
+
+        if time.monotonic() - last_report >= REPORT_INTERVAL:
+            last_report = time.monotonic()
+            total = sum(completed.values())
+            elapsed = time.perf_counter() - start
+            click.echo(
+                f"{total} operations ({total / elapsed:.1f} ops/s), "
+                f"{len(running)} of {workers} workers running"
+            )
+
+    for process in processes.values():
+        process.join()
+
+    elapsed = time.perf_counter() - start
+    total = sum(completed.values())
+    for shard in shards:
+        click.echo(
+            f"Shard {shard}: {completed[shard]} operations "
+            f"({completed[shard] / elapsed:.1f} ops/s)"
+        )
+    click.echo(f"Total: {total} operations ({total / elapsed:.1f} ops/s)")
+
+    if cleanup:
+        remove_shards(cleanup, shards)
+
+    for shard, n, error in failures:
+        at = f"operation {n}" if n is not None else "an unknown operation"
+        replay = f"--seed {seed} --workers {workers} --shard {shard}"
+        if n is not None:
+            replay += f" --num-operations {n + 1}"
+        click.echo(
+            f"Shard {shard} (seed {shard_seed(seed, shard)!r}) failed at {at}: {error}\n"
+            f"  replay it alone with: {replay}",
+            err=True,
+        )
+    if failures:
+        raise click.ClickException(f"{len(failures)} of {workers} workers failed.")
@@ -0,0 +1,125 @@
+"""Distributions of file sizes."""
+
+import abc
+import math
+import random
+import re
+from dataclasses import dataclass
+from typing import Any
+from typing import Optional
+
+import click
+
+
+#: Multipliers of the binary unit suffixes accepted in sizes.
+UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a size in bytes, optionally with a binary unit suffix, e.g. `512`, `64K`, `4GiB` or `0xFFFF`.
+
+    :param text: The size.
+    :return: The number of bytes.
+    :raises ValueError: If the size is not valid.
+    """
+    match = re.fullmatch(r"\s*(0x[0-9a-f]+|\d+)\s*([kmgt]?)(?:i?b)?\s*", text, re.I)
+    if match is None:
+        raise ValueError(f"Invalid size {text!r}")
+    return int(match[1], 0) * UNITS[match[2].upper()]
+
+
+class SizeDistribution(abc.ABC):
+    """A distribution of the sizes of created and truncated files."""
+
+    @abc.abstractmethod
+    def sample(self) -> int:
+        """
+        Draw a size using the standard library `random` module.
+
+        :return: The size in bytes.
+        """
+
+
+@dataclass(frozen=True)
+class Uniform(SizeDistribution):
+    """Sizes drawn uniformly from `low` (inclusive) to `high` (exclusive)."""
+
+    low: int
+    high: int
+
+    def sample(self) -> int:
+        return random.randrange(self.low, self.high)
+
+    def __str__(self) -> str:
+        return f"{self.low}-{self.high}"
+
+
+@dataclass(frozen=True)
+class LogUniform(SizeDistribution):
+    """
+    Sizes whose logarithm is drawn uniformly, from `low` (inclusive) to `high` (exclusive).
+
+    Every order of magnitude is equally likely, so a range from bytes to gigabytes yields small and huge files alike.
+    """
+
+    low: int
+    high: int
+
+    def sample(self) -> int:
+        size = math.exp(random.uniform(math.log(self.low + 1), math.log(self.high)))
+        return min(max(int(size) - 1, self.low), self.high - 1)
+
+    def __str__(self) -> str:
+        return f"log:{self.low}-{self.high}"
+
+
+#: The default distribution of file sizes.
+DEFAULT_FILE_SIZES = Uniform(0, 0x10000)
+
+
+def parse_size_distribution(spec: str) -> SizeDistribution:
+    """
+    Parse a size distribution.
+
+    The distribution is either a single size `N`, a uniform range `MIN-MAX`, or a log-uniform range `log:MIN-MAX`;
+    ranges include `MIN` but not `MAX`. Sizes are parsed with `parse_size`.
+
+    :param spec: The distribution.
+    :return: The distribution.
+    :raises ValueError: If the distribution is not valid.
+    """
+    kind, _, bounds = spec.rpartition(":")
+    if kind not in ("", "log"):
+        raise ValueError(f"Unknown size distribution {kind!r}")
+    low_text, dash, high_text = bounds.partition("-")
+    if not dash:
+        if kind:
+            raise ValueError(f"A log-uniform size distribution needs a range: {spec!r}")
+        size = parse_size(low_text)
+        return Uniform(size, size + 1)
+    low, high = parse_size(low_text), parse_size(high_text)
+    if high <= low:
+        raise ValueError(f"Empty size range {spec!r}")
+    return LogUniform(low, high) if kind else Uniform(low, high)
+
+
+# `ParamType` only takes type arguments since click 8.4
+class SizeDistributionType(click.ParamType):  # type: ignore[type-arg,unused-ignore]
+    """Click file size distribution type."""
+
+    name = "size_distribution"
+
+    def convert(
+        self, value: Any, param: Optional[click.Parameter], ctx: Optional[click.Context]
+    ) -> SizeDistribution:
+        if isinstance(value, SizeDistribution):
+            return value
+        try:
+            return parse_size_distribution(value)
+        except ValueError as e:
+            self.fail(
+                f"{e}. Please use N, MIN-MAX or log:MIN-MAX, e.g. 64K, 0-64K or log:4K-8G",
+                param,
+                ctx,
+            )
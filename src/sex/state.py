@@ -1,35 +1,239 @@
 """Code to track filesystem state."""
 
 import abc
+import random
 from dataclasses import dataclass
 from dataclasses import field
 from pathlib import Path
+from types import TracebackType
+from typing import Generic
 from typing import Iterator
 from typing import Optional
+from typing import Self
 from typing import Tuple
+from typing import TypeVar
+
+from sex.content import Content
+from sex.content import ExtentContent
+from sex.merkle import MerkleTree
+from sex.merkle import digest
+from sex.payload import DEFAULT_PROFILE
+from sex.sizes import DEFAULT_FILE_SIZES
+from sex.sizes import SizeDistribution
+
+
+# The path of the root directory of the model.
+ROOT = Path("/")
 
 
 class StateError(Exception):
     """Exception raised for errors in the filesystem state."""
 
 
+def file_digest(size: int, root: bytes) -> bytes:
+    """
+    Hash a file, see `File.digest`.
+
+    :param size: The size of the file.
+    :param root: The root of the hash tree of its contents, see `MerkleTree.root`.
+    :return: The hash of the file.
+    """
+    return digest(size.to_bytes(8, "little") + root)
+
+
+def entry_hash(name: str, kind: str, node_digest: bytes) -> int:
+    """
+    Hash an entry of a directory.
+
+    :param name: The name of the entry.
+    :param kind: "dir" or "file".
+    :param node_digest: The digest of the directory or file, see `Directory.digest` and `File.digest`.
+    :return: The hash, as an integer that the directory adds to its total.
+    """
+    return int.from_bytes(
+        digest(kind.encode() + b"\0" + name.encode() + b"\0" + node_digest), "little"
+    )
+
+
+def directory_digest(total: int) -> bytes:
+    """
+    Hash a directory, see `Directory.digest`.
+
+    :param total: The sum of the hashes of its entries, see `entry_hash`.
+    :return: The hash of the directory.
+    """
+    return digest(b"dir\0" + (total % (1 << 128)).to_bytes(16, "little"))
+
+
 @dataclass
 class Node(abc.ABC):
     """Representation of a filesystem node."""
 
+    @abc.abstractmethod
+    def digest(self) -> bytes:
+        """:return: A hash of the node and everything below it."""
+
 
 @dataclass
 class File(Node):
     """Representation of a file."""
 
-    data: bytearray = field(default_factory=bytearray)
+    content: Content = field(default_factory=ExtentContent)
+    #: Hash tree over the contents, kept up to date by `write` and `truncate`, or None if the file is not hashed.
+    tree: Optional[MerkleTree] = field(default_factory=MerkleTree)
+
+    @classmethod
+    def of(cls, content: Content, hashed: bool = True) -> "File":
+        """
+        Represent a file with the given contents.
+
+        :param content: The contents of the file.
+        :param hashed: If false, do not keep a tree of the contents, which saves generating and hashing them.
+        :return: The file, with the tree of its contents if hashed.
+        """
+        return cls(content, MerkleTree.of(content) if hashed else None)
+
+    def write(
+        self, offset: int, data: Content, source: Optional["File"] = None
+    ) -> None:
+        """
+        Overwrite part of the contents of the file, rehashing only the leaves of the tree that it covers.
+
+        :param offset: The offset to write at.
+        :param data: The contents to write, which must fit within the file.
+        :param source: Another file that the same data was written to at the same offset, whose hashes of the
+            written range are reused, see `MerkleTree.update`.
+        """
+        self.content.write(offset, data)
+        if self.tree is None:
+            return
+        self.tree.update(
+            self.content,
+            offset,
+            offset + len(data),
+            source.tree if source is not None else None,
+        )
+
+    def truncate(self, size: int) -> None:
+        """
+        Truncate or extend the file with zeros.
+
+        :param size: The new size of the file.
+        """
+        self.content.truncate(size)
+        if self.tree is not None:
+            self.tree.truncate(self.content)
+
+    def copy(self) -> "File":
+        """:return: A snapshot of the file that later changes to it do not affect."""
+        return File(
+            self.content.copy(), self.tree.copy() if self.tree is not None else None
+        )
+
+    def digest(self) -> bytes:
+        """
+        Hash the size of the file and the root of the tree of its contents.
+
+        :return: The hash.
+        :raises StateError: If the file is not hashed.
+        """
+        if self.tree is None:
+            raise StateError("Cannot digest a file that is not hashed")
+        return file_digest(len(self.content), self.tree.root())
 
 
 @dataclass
 class Directory(Node):
-    """Representation of a directory."""
+    """
+    Representation of a directory.
+
+    The hash of a directory covers the names, types and digests of its children. The hashes of the entries are
+    summed rather than hashed together, so that a change below a directory updates its hash in O(1) rather than
+    rehashing all of its children, and a change to a file costs one hash per directory above it.
+    """
 
     children: dict[str, Node] = field(default_factory=dict)
+    #: The hash of the entry of every child, see `entry_hash`, kept up to date by hashed models only.
+    hashes: dict[str, int] = field(default_factory=dict)
+    #: The sum of the hashes of the entries, modulo 2 ** 128.
+    total: int = 0
+
+    def digest(self) -> bytes:
+        """:return: A hash of the names, types and digests of the children of the directory."""
+        return directory_digest(self.total)
+
+    def rehash(self, name: str) -> None:
+        """
+        Update the hash of the entry of a child after it was added, removed or changed.
+
+        :param name: The name of the child.
+        """
+        self.total -= self.hashes.pop(name, 0)
+        child = self.children.get(name)
+        if child is not None:
+            kind = "dir" if isinstance(child, Directory) else "file"
+            self.hashes[name] = entry_hash(name, kind, child.digest())
+            self.total += self.hashes[name]
+        self.total %= 1 << 128
+
+
+N = TypeVar("N", bound=Node)
+
+
+class NodeIndex(Generic[N]):
+    """
+    Path-indexed registry of nodes of a single kind.
+
+    Nodes are kept in a dense list alongside a path -> position map, so insertion, deletion and uniform random
+    selection are all O(1). Deletion swaps the last entry into the freed slot, which keeps the order (and therefore
+    the random draws) a pure function of the sequence of insertions and deletions.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self._entries: list[Tuple[Path, N]] = []
+        self._positions: dict[Path, int] = {}
+
+    def add(self, path: Path, node: N) -> None:
+        """Register a node at the given path."""
+        if path in self._positions:
+            raise StateError(f"Path {path} is already indexed")
+        self._positions[path] = len(self._entries)
+        self._entries.append((path, node))
+
+    def remove(self, path: Path) -> None:
+        """Unregister the node at the given path."""
+        try:
+            position = self._positions.pop(path)
+        except KeyError:
+            raise StateError(f"Path {path} is not indexed") from None
+        last = self._entries.pop()
+        if position < len(self._entries):
+            self._entries[position] = last
+            self._positions[last[0]] = position
+
+    def choice(self) -> Tuple[Path, N]:
+        """
+        Pick a node uniformly at random using the standard library `random` module.
+
+        :return: The path and node that were picked.
+        :raises IndexError: If the index is empty.
+        """
+        if not self._entries:
+            raise IndexError("Cannot choose from an empty index")
+        return self._entries[random.randrange(len(self._entries))]
+
+    def __contains__(self, path: object) -> bool:
+        """Check whether a path is indexed."""
+        return path in self._positions
+
+    def __len__(self) -> int:
+        """:return: the number of indexed nodes."""
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Tuple[Path, N]]:
+        """Iterate over the indexed nodes in index order, which must not change while iterating."""
+        return iter(self._entries)
 
 
 class State:
@@ -37,62 +241,97 @@ class State:
 
     root: Directory
     cleanup_mount_path: Optional[Path]
+    #: The model of the contents of new files.
+    content_type: type[Content]
+    #: The number of blocks of a file to verify when reading it from a mount, or 0 to verify all of it.
+    verify_samples: int
+    #: The distribution of the sizes of created and truncated files.
+    file_sizes: SizeDistribution
+    #: The name of the profile of the data of writes, see `sex.payload.PROFILES`.
+    payload: str
+    #: Whether files keep hash trees of their contents and directories keep hashes of their children, which only
+    #: runs that verify files or digest them need.
+    hashed: bool
 
-    def __init__(self, cleanup_mount_path: Optional[Path]) -> None:
+    def __init__(
+        self,
+        cleanup_mount_path: Optional[Path],
+        content_type: type[Content] = ExtentContent,
+        verify_samples: int = 0,
+        file_sizes: SizeDistribution = DEFAULT_FILE_SIZES,
+        payload: str = DEFAULT_PROFILE,
+        hashed: bool = True,
+    ) -> None:
         """Initialize an empty virtual filesystem."""
         self.root = Directory()
         self.cleanup_mount_path = cleanup_mount_path
+        self.content_type = content_type
+        self.verify_samples = verify_samples
+        self.file_sizes = file_sizes
+        self.payload = payload
+        self.hashed = hashed
+        self._files: NodeIndex[File] = NodeIndex()
+        self._directories: NodeIndex[Directory] = NodeIndex()
+        self._directories.add(Path("/"), self.root)
 
-    def __enter__(self):
+    def __enter__(self) -> Self:
         """Enter the filesystem state context."""
         return self
 
-    def __exit__(self, exc_type, exc_value, traceback):
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
         """Exit the filesystem state context."""
         if not self.cleanup_mount_path:
             return
 
         for path, _ in self.files():
-            (self.cleanup_mount_path / path.relative_to("/")).unlink()
+            # operations are applied to the model before they run when scheduled concurrently
+            (self.cleanup_mount_path / path.relative_to("/")).unlink(missing_ok=True)
 
-        for path, _ in self.directories():
+        # remove the deepest directories first so that every directory is empty by the time it is removed
+        directories = sorted(
+            self.directories(), key=lambda e: len(e[0].parts), reverse=True
+        )
+        for path, _ in directories:
             # don't try to remove the mountpoint
             if path == Path("/"):
                 continue
 
             (self.cleanup_mount_path / path.relative_to("/")).rmdir()
 
-    def _iter_nodes(self) -> Iterator[Tuple[Path, Node]]:
-        """Iterate over all nodes in the filesystem."""
-        q = [(Path("/"), self.root)]
-        while q:
-            path, node = q.pop()
-            yield path, node
-            if isinstance(node, Directory):
-                for name, child in node.children.items():
-                    q.append((path / name, child))
-
     def files(self) -> list[Tuple[Path, File]]:
-        """Iterate over all files in the filesystem."""
-        return [
-            (path, node) for path, node in self._iter_nodes() if isinstance(node, File)
-        ]
+        """:return: All files in the filesystem, in index order."""
+        return list(self._files)
 
     def directories(self) -> list[Tuple[Path, Directory]]:
-        """Iterate over all directories in the filesystem."""
-        return [
-            (path, node)
-            for path, node in self._iter_nodes()
-            if isinstance(node, Directory)
-        ]
+        """:return: All directories in the filesystem, in index order."""
+        return list(self._directories)
+
+    def random_file(self) -> Tuple[Path, File]:
+        """
+        Pick a file uniformly at random in O(1).
+
+        :raises IndexError: If there are no files.
+        """
+        return self._files.choice()
+
+    def random_directory(self) -> Tuple[Path, Directory]:
+        """
+        Pick a directory uniformly at random in O(1).
+
+        :raises IndexError: If there are no directories.
+        """
+        return self._directories.choice()
 
     def _resolve(self, path: Path) -> Node:
         """Resolve a path to a node in the filesystem."""
-        node = self.root
+        node: Node = self.root
         for name in path.parts[1:]:
-            if isinstance(node, File):
-                raise StateError(f"Path {path} does not exist")
-            if name not in node.children:
+            if not isinstance(node, Directory) or name not in node.children:
                 raise StateError(f"Path {path} does not exist")
             node = node.children[name]
         return node
@@ -110,23 +349,72 @@ class State:
             raise StateError(f"Path {path} is not a directory")
         return node
 
-    def create_file(self, path: Path, data: bytearray) -> None:
-        """Create a file at the given path with the given data."""
+    def digest(self, path: Path = ROOT) -> bytes:
+        """
+        Hash a file or a whole directory tree, without rehashing anything.
+
+        :param path: The path of the file or directory.
+        :return: The hash, see `File.digest` and `Directory.digest`.
+        :raises StateError: If the model is not hashed or the path does not exist.
+        """
+        if not self.hashed:
+            raise StateError("Cannot digest a model that is not hashed")
+        return self._resolve(path).digest()
+
+    def _rehash(self, path: Path) -> None:
+        # update the entry of the node at the path in its parent, then that of every directory above it
+        if not self.hashed:
+            return
+        directories = [self.root]
+        for name in path.parts[1:-1]:
+            child = directories[-1].children[name]
+            if not isinstance(child, Directory):
+                raise StateError(f"Path {path} does not exist")
+            directories.append(child)
+        for directory, name in zip(
+            reversed(directories), reversed(path.parts[1:]), strict=True
+        ):
+            directory.rehash(name)
+
+    def create_file(self, path: Path, content: Content) -> None:
+        """Create a file at the given path with the given contents."""
         directory = self.resolve_directory(path.parent)
         if path.name in directory.children:
             raise StateError(f"File {path} already exists")
-        directory.children[path.name] = File(data=data)
+        file = File.of(content, self.hashed)
+        directory.children[path.name] = file
+        self._files.add(path, file)
+        self._rehash(path)
+
+    def write_file(
+        self, path: Path, offset: int, data: Content, source: Optional[File] = None
+    ) -> None:
+        """Overwrite part of the contents of the file at the given path, see `File.write`."""
+        self.resolve_file(path).write(offset, data, source)
+        self._rehash(path)
+
+    def truncate_file(self, path: Path, size: int) -> None:
+        """Truncate or extend the file at the given path with zeros, see `File.truncate`."""
+        self.resolve_file(path).truncate(size)
+        self._rehash(path)
 
     def delete_file(self, path: Path) -> None:
         """Delete a file at the given path."""
         directory = self.resolve_directory(path.parent)
         if path.name not in directory.children:
             raise StateError(f"File {path} does not exist")
+        if not isinstance(directory.children[path.name], File):
+            raise StateError(f"Path {path} is not a file")
         del directory.children[path.name]
+        self._files.remove(path)
+        self._rehash(path)
 
     def create_directory(self, path: Path) -> None:
         """Create a directory at the given path."""
         directory = self.resolve_directory(path.parent)
         if path.name in directory.children:
             raise StateError(f"Directory {path} already exists")
-        directory.children[path.name] = Directory()
+        new_directory = Directory()
+        directory.children[path.name] = new_directory
+        self._directories.add(path, new_directory)
+        self._rehash(path)
@@ -0,0 +1,188 @@
+"""Streaming traces of operations."""
+
+import json
+import queue
+import threading
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+from typing import Iterator
+from typing import Optional
+from typing import Self
+from typing import Sequence
+from typing import Tuple
+
+from sex.operation import Operation
+from sex.operations.create import Create
+from sex.operations.delete import Delete
+from sex.operations.listdir import Listdir
+from sex.operations.mkdir import Mkdir
+from sex.operations.read import Read
+from sex.operations.truncate import Truncate
+from sex.operations.write import Write
+from sex.state import State
+
+
+#: Version of the trace format, recorded in the header of every trace.
+TRACE_VERSION = 1
+
+#: Number of operations queued for the background writer before `TraceWriter.write` blocks.
+DEFAULT_BUFFER_SIZE = 4096
+
+#: The operations that can be traced, by name.
+OPERATIONS: dict[str, type[Operation]] = {
+    # `name` is a class property, which mypy reads as a method
+    str(operation.name): operation
+    for operation in (Read, Write, Create, Delete, Truncate, Listdir, Mkdir)
+}
+
+
+class TraceError(Exception):
+    """Exception raised for invalid traces, and for traces that diverge from the model when replayed."""
+
+
+def to_record(
+    n: int, operation: Operation, client: int, digests: bool = False
+) -> dict[str, Any]:
+    """
+    Describe an operation of a run.
+
+    :param n: The index of the operation.
+    :param operation: The operation.
+    :param client: The index of the client the operation runs on, among the mountpoints followed by the APIs.
+    :param digests: If true, include the digest of the file the operation expects to find, if any.
+    :return: A JSON-serializable description of the operation.
+    """
+    record = {"n": n, "op": operation.name, "client": client, **operation.to_record()}
+    if digests and (digest := operation.digest()) is not None:
+        record["digest"] = digest.hex()
+    return record
+
+
+def from_record(state: State, record: dict[str, Any]) -> Tuple[int, Operation]:
+    """
+    Rebuild an operation of a run against the model.
+
+    :param state: The current state of the system.
+    :param record: The description of the operation, see `to_record`.
+    :return: The index of the client the operation runs on, and the operation.
+    :raises TraceError: If the description is not valid, or its digest does not match the model.
+    :raises sex.state.StateError: If the operation does not apply to the model.
+    """
+    try:
+        operation = OPERATIONS[record["op"]].from_record(state, record)
+        client = record["client"]
+    except (KeyError, TypeError, ValueError) as e:
+        raise TraceError(f"Invalid operation {record!r}") from e
+    if "digest" in record:
+        digest = operation.digest()
+        if digest is None or digest.hex() != record["digest"]:
+            raise TraceError(
+                f"{operation} expects a file with digest {digest.hex() if digest else None}, "
+                f"but the trace recorded {record['digest']}"
+            )
+    return client, operation
+
+
+def read_trace(path: Path) -> Iterator[dict[str, Any]]:
+    """
+    Read the operations of a trace lazily, one line at a time.
+
+    :param path: The trace file.
+    :return: An iterator over the descriptions of the operations, in order.
+    :raises TraceError: If the file is not a trace.
+    """
+    with path.open() as f:
+        try:
+            header = json.loads(f.readline())
+        except json.JSONDecodeError:
+            header = None
+        if not isinstance(header, dict) or header.get("trace") != TRACE_VERSION:
+            raise TraceError(f"{path} is not a version {TRACE_VERSION} trace")
+        for number, line in enumerate(f, 2):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise TraceError(f"Invalid JSON at {path}:{number}: {e}") from None
+
+
+class TraceWriter:
+    """
+    Writer of a trace, as a header line followed by one line of JSON per operation.
+
+    Operations are queued by `write` and described and written by a background thread, so that tracing barely slows
+    down the run. The queue is bounded, so that a slow disk throttles the run rather than exhausting memory.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        clients: Sequence[object],
+        digests: bool = False,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ) -> None:
+        """
+        Initialize a new trace writer.
+
+        :param path: The trace file to write, replacing it if it exists.
+        :param clients: The clients of the run, for the header.
+        :param digests: If true, record the digests of the files that operations expect to find.
+        :param buffer_size: The number of operations that can be queued before `write` blocks.
+        """
+        self.path = path
+        self.clients = clients
+        self.digests = digests
+        self._queue: queue.Queue[Optional[Tuple[int, Operation, int]]] = queue.Queue(
+            buffer_size
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="trace-writer", daemon=True
+        )
+        self._error: Optional[Exception] = None
+
+    def __enter__(self) -> Self:
+        """Enter the trace writer context, starting the background thread."""
+        self._file = self.path.open("w", buffering=1 << 20)
+        header = {"trace": TRACE_VERSION, "clients": [str(c) for c in self.clients]}
+        self._file.write(json.dumps(header) + "\n")
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Exit the trace writer context, writing all queued operations."""
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self._error is not None and exc_type is None:
+            raise self._error
+
+    def write(self, n: int, operation: Operation, client: int) -> None:
+        """
+        Queue an operation to be written.
+
+        The operation must not change once queued.
+
+        :param n: The index of the operation.
+        :param operation: The operation.
+        :param client: The index of the client the operation runs on, among the mountpoints followed by the APIs.
+        :raises Exception: The error that stopped the background thread, if any.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put((n, operation, client))
+
+    def _run(self) -> None:
+        while (item := self._queue.get()) is not None:
+            if self._error is not None:
+                continue  # keep draining, so that `write` never blocks forever
+            try:
+                self._file.write(json.dumps(to_record(*item, self.digests)) + "\n")
+            except Exception as e:
+                self._error = e
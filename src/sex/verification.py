@@ -0,0 +1,353 @@
+"""Verification of operations across clients."""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from pathlib import Path
+from types import TracebackType
+from typing import Callable
+from typing import Optional
+from typing import Self
+
+import click
+
+from sex.api import Api
+from sex.async_api import AsyncApi
+from sex.locks import PathLocks
+from sex.metrics import Metrics
+from sex.operation import Operation
+from sex.state import State
+from sex.watch import Watcher
+from sex.watch import watch
+
+
+def verify_operation(
+    clients: list[Path | Api], operation: Operation, timeout: float, show_progress: bool
+) -> dict[Path | Api, float]:
+    """
+    Verify that an operation was successfully applied to all clients.
+
+    Every client is verified concurrently on its own thread with its own retry loop, so the wall time is that of the
+    slowest client rather than the sum over all of them. The first client to exhaust its timeout cancels the others
+    and its error is raised. Between retries, each client waits on a watcher (see `sex.watch`) rather than sleeping
+    for a fixed interval.
+
+    :param clients: list of clients to verify the operation on.
+    :param operation: The operation to verify.
+    :param timeout: The timeout in seconds for verification on **each** client, counted from the call.
+    :param show_progress: If true, print remaining timeout to stdout while verifying.
+    :return: The time in seconds each client took to converge.
+    """
+    lock = threading.Lock()
+    cancelled = threading.Event()
+
+    def print_progress(msg: str = "") -> None:
+        if show_progress:
+            with lock:
+                print(msg.ljust(80), end="\r")
+
+    start = time.perf_counter()
+
+    def verify_client(client: Path | Api) -> float:
+        watcher: Optional[Watcher] = None
+        try:
+            while True:
+                if cancelled.is_set():
+                    raise VerificationCancelledError()
+                try:
+                    operation.verify(client)
+                except Exception as e:
+                    remaining = timeout - (time.perf_counter() - start)
+                    if remaining <= 0:
+                        raise e from None
+
+                    print_progress(
+                        f"Verifying {operation.name} on {client}... ({remaining:.2f}s)",
+                    )
+                    if watcher is None:
+                        watcher = watch(client, operation.path)
+                    watcher.wait(remaining)
+                else:
+                    return time.perf_counter() - start
+                finally:
+                    print_progress()
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+    convergence: dict[Path | Api, float] = {}
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        # run in copies of the caller's context, so that e.g. `sex.compare.no_artifacts` applies
+        futures = {
+            pool.submit(contextvars.copy_context().run, verify_client, client): client
+            for client in clients
+        }
+        try:
+            for future in as_completed(futures):
+                convergence[futures[future]] = future.result()
+        except BaseException:
+            cancelled.set()
+            raise
+    return {client: convergence[client] for client in clients}
+
+
+def format_convergence(
+    convergence: dict[Path | Api, float] | dict[Path | AsyncApi, float],
+) -> str:
+    """
+    Format per-client convergence times for display.
+
+    :param convergence: The convergence times as returned by `verify_operation` or `sex.engine.verify_operation_async`.
+    :return: A human-readable, single line summary.
+    """
+    return ", ".join(
+        f"{client}: {elapsed * 1000:.1f}ms" for client, elapsed in convergence.items()
+    )
+
+
+class VerificationCancelledError(Exception):
+    """Verification on a client was abandoned because another client failed."""
+
+
+class OperationFailedError(Exception):
+    """An operation failed to execute or to verify; the cause is chained."""
+
+    def __init__(self, n: int, operation: Operation) -> None:
+        """
+        Initialize a new operation failure.
+
+        :param n: The index of the operation that failed.
+        :param operation: The operation that failed.
+        """
+        super().__init__(n, operation)
+        self.n = n
+        self.operation = operation
+
+    def __str__(self) -> str:
+        """Describe the failed operation."""
+        return f"Operation {self.n} failed: {self.operation}"
+
+
+class VerificationPipeline:
+    """
+    Verify operations in the background while execution continues.
+
+    Up to `window` operations may be awaiting verification at once; `admit` blocks (backpressure) once the window is
+    full. An operation is only admitted once every earlier operation that touches one of its paths has been
+    verified, so the model stays valid for the clients being checked.
+
+    With a window of 0, operations are verified synchronously by `submit`, which is the classic serial behaviour.
+    """
+
+    def __init__(
+        self,
+        clients: list[Path | Api],
+        timeout: float,
+        show_progress: bool,
+        verbose: bool,
+        window: int = 0,
+        on_verified: Optional[Callable[[int, Operation], None]] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        """
+        Initialize a new verification pipeline.
+
+        :param clients: list of clients to verify operations on.
+        :param timeout: The verification timeout in seconds, see `verify_operation`.
+        :param show_progress: If true, print remaining timeout to stdout while verifying.
+        :param verbose: If true, print convergence times of every verified operation.
+        :param window: The maximum number of operations verified in the background at once.
+        :param on_verified: Called with the index and operation of every operation once it has been verified.
+        :param metrics: Where to record the latency of every execution and verification.
+        """
+        self.clients = clients
+        self.timeout = timeout
+        self.show_progress = show_progress
+        self.verbose = verbose
+        self.window = window
+        self.on_verified = on_verified
+        self.metrics = metrics
+
+        self._locks = PathLocks()
+        self._slots = threading.BoundedSemaphore(max(window, 1))
+        # threads are only started once work is submitted, so this costs nothing without a window
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(window, 1), thread_name_prefix="verify"
+        )
+        self._pending: set[Future[None]] = set()
+        self._failure: Optional[BaseException] = None
+        self._mutex = threading.Lock()
+
+    def __enter__(self) -> Self:
+        """Enter the pipeline context."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Exit the pipeline context, waiting for (or on error, abandoning) outstanding verifications."""
+        if exc_type is None:
+            self.drain()
+        else:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _raise_failure(self) -> None:
+        if self._failure is not None:
+            raise self._failure
+
+    def admit(self, operation: Operation) -> None:
+        """
+        Wait until the operation may be executed.
+
+        Blocks while the window is full or while an earlier operation on a conflicting path is being verified.
+
+        :param operation: The operation about to be executed.
+        :raises Exception: The error of an earlier operation that failed verification.
+        """
+        self._raise_failure()
+        if not self.window:
+            return
+        self._slots.acquire()
+        self._locks.acquire(operation.read_paths(), operation.write_paths())
+        self._raise_failure()
+
+    def submit(
+        self, n: int, operation: Operation, client: Path | Api, executed_at: float
+    ) -> None:
+        """
+        Verify an executed operation, in the background if the pipeline has a window.
+
+        :param n: The index of the operation, for reporting.
+        :param operation: The operation to verify, which must have been passed to `admit`.
+        :param client: The client the operation was executed on.
+        :param executed_at: The `time.perf_counter` timestamp at which execution finished.
+        """
+        if not self.window:
+            self._verify(n, operation, client, executed_at)
+        else:
+            self._background(n, operation, client, executed_at)
+
+    def dispatch(
+        self, n: int, operation: Operation, client: Path | Api, state: State
+    ) -> None:
+        """
+        Execute an operation, apply it to the model and verify it.
+
+        :param n: The index of the operation, for reporting.
+        :param operation: The operation to run.
+        :param client: The client to execute the operation on.
+        :param state: The model to apply the operation to.
+        """
+        self.admit(operation)
+        executed_at = self._execute(n, operation, client)
+        operation.update(state)
+        self.submit(n, operation, client, executed_at)
+
+    def _background(
+        self,
+        n: int,
+        operation: Operation,
+        client: Path | Api,
+        executed_at: Optional[float],
+    ) -> None:
+        future = self._pool.submit(
+            contextvars.copy_context().run,
+            self._run_and_release,
+            n,
+            operation,
+            client,
+            executed_at,
+        )
+        with self._mutex:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def settle(self) -> None:
+        """
+        Wait for all outstanding verifications, after which the clients reflect every dispatched operation.
+
+        :raises Exception: The error of the first operation that failed verification.
+        """
+        while True:
+            with self._mutex:
+                pending = list(self._pending)
+            if not pending:
+                break
+            for future in pending:
+                future.exception()
+        self._raise_failure()
+
+    def drain(self) -> None:
+        """
+        Wait for all outstanding verifications, and stop the background threads.
+
+        :raises Exception: The error of the first operation that failed verification.
+        """
+        try:
+            self.settle()
+        finally:
+            self._pool.shutdown()
+
+    def _execute(self, n: int, operation: Operation, client: Path | Api) -> float:
+        start = time.perf_counter()
+        try:
+            operation.execute(client)
+        except Exception as e:
+            raise OperationFailedError(n, operation) from e
+        end = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.record(operation.name, "execute", client, end - start)
+        return end
+
+    def _verify(
+        self, n: int, operation: Operation, writer: Path | Api, executed_at: float
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            convergence = verify_operation(
+                self.clients, operation, self.timeout, self.show_progress
+            )
+        except Exception as e:
+            raise OperationFailedError(n, operation) from e
+        if self.verbose:
+            click.echo(f"{n}: verified in {format_convergence(convergence)}")
+        if self.metrics is not None:
+            for client, elapsed in convergence.items():
+                self.metrics.record(operation.name, "verify", client, elapsed)
+                # only changes propagate, so only they have a visibility latency
+                if client != writer and operation.write_paths():
+                    self.metrics.record_visibility(
+                        writer, client, start - executed_at + elapsed
+                    )
+        if self.on_verified is not None:
+            self.on_verified(n, operation)
+
+    def _run_and_release(
+        self,
+        n: int,
+        operation: Operation,
+        client: Path | Api,
+        executed_at: Optional[float],
+    ) -> None:
+        try:
+            if executed_at is None:
+                executed_at = self._execute(n, operation, client)
+            self._verify(n, operation, client, executed_at)
+        except BaseException as e:
+            with self._mutex:
+                if self._failure is None:
+                    self._failure = e
+            raise
+        finally:
+            self._locks.release(operation.read_paths(), operation.write_paths())
+            self._slots.release()
+
+    def _done(self, future: Future[None]) -> None:
+        with self._mutex:
+            self._pending.discard(future)
@@ -0,0 +1,191 @@
+"""Change notification used to pace verification retries."""
+
+import abc
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Optional
+from typing import Self
+
+from sex.api import Api
+
+
+# see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    """Load the C library if it provides inotify."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_init1.restype = ctypes.c_int
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        libc.inotify_add_watch.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+class Watcher(abc.ABC):
+    """Wait for a client to (possibly) change before verification is retried."""
+
+    @abc.abstractmethod
+    def wait(self, timeout: float) -> None:
+        """
+        Block until the watched client may have changed.
+
+        :param timeout: The maximum time to wait in seconds.
+        """
+
+    def close(self) -> None:
+        """
+        Release any resources held by the watcher.
+
+        This is intentionally a no-op: only watchers that hold resources, such as an inotify file descriptor, override
+        it.
+        """
+        return
+
+    def __enter__(self) -> Self:
+        """Enter the watcher context."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Exit the watcher context."""
+        self.close()
+
+
+class BackoffWatcher(Watcher):
+    """
+    Adaptive backoff polling.
+
+    Used for clients that cannot deliver change events, such as the API. The first retry happens almost immediately
+    and the delay doubles on every subsequent one, up to `MAX_DELAY`.
+    """
+
+    MIN_DELAY = 0.001
+    MAX_DELAY = 0.1
+
+    def __init__(self) -> None:
+        """Initialize a new backoff watcher."""
+        self.delay = self.MIN_DELAY
+
+    def wait(self, timeout: float) -> None:
+        time.sleep(max(0.0, min(self.delay, timeout)))
+        self.delay = min(self.delay * 2, self.MAX_DELAY)
+
+
+class InotifyWatcher(BackoffWatcher):
+    """
+    Wake up as soon as one of the watched paths changes.
+
+    Filesystems are not required to deliver events for changes made elsewhere (FUSE mounts typically only see local
+    changes), so waits are still bounded by the adaptive backoff delay. The delay is reset whenever an event arrives.
+    """
+
+    def __init__(self, paths: list[Path]) -> None:
+        """
+        Start watching the given paths.
+
+        Paths that do not exist (yet) are skipped.
+
+        :param paths: The files or directories to watch.
+        :raises OSError: If inotify is unavailable or none of the paths could be watched.
+        """
+        super().__init__()
+        if _libc is None:
+            raise OSError("inotify is not available")
+
+        self.fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        watched = 0
+        for path in paths:
+            if _libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK) >= 0:
+                watched += 1
+        if not watched:
+            os.close(self.fd)
+            raise OSError(f"Could not watch any of {', '.join(map(str, paths))}")
+
+    def wait(self, timeout: float) -> None:
+        ready, _, _ = select.select(
+            [self.fd], [], [], max(0.0, min(self.delay, timeout))
+        )
+        if not ready:
+            self.delay = min(self.delay * 2, self.MAX_DELAY)
+            return
+
+        # drain the queue, the events themselves don't matter
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self.delay = self.MIN_DELAY
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def watch(client: Path | Api, path: Path) -> Watcher:
+    """
+    Create the best available watcher for a path on a client.
+
+    Mountpoints are watched through inotify, on the path itself and on its parent directory. Everything else (and
+    any mountpoint where inotify cannot be used) falls back to adaptive backoff polling.
+
+    :param client: The client that is being verified.
+    :param path: The path targeted by the operation being verified.
+    :return: A watcher, which should be closed once verification is done.
+    """
+    if isinstance(client, Path) and _libc is not None:
+        target = client / path.relative_to(path.anchor)
+        try:
+            return InotifyWatcher([target, target.parent])
+        except OSError:
+            pass
+    return BackoffWatcher()
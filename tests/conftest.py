@@ -0,0 +1,137 @@
+"""Fixtures shared by the tests."""
+
+import contextlib
+import json
+import shutil
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+import pytest
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    """A ShadeFS admin API that serves the files of a local directory."""
+
+    def __init__(self, root: Path) -> None:
+        """
+        Start a new server on a free local port.
+
+        :param root: The directory served as the drive.
+        """
+        super().__init__(("127.0.0.1", 0), FakeApiHandler)
+        self.root = root
+        #: The number of connections accepted so far.
+        self.connections = 0
+        #: The connections that are open.
+        self.sockets: set[socket.socket] = set()
+        self._thread = threading.Thread(
+            target=self.serve_forever, args=(0.01,), daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def address(self) -> str:
+        """:return: The address of the drive, in the format of `sex.api.Api`."""
+        host, port = self.server_address[:2]
+        return f"{host!s}:{port}/drive"
+
+    def close(self) -> None:
+        """Stop the server, closing the connections that clients keep alive."""
+        self.shutdown()
+        for connection in list(self.sockets):
+            # the connection may have closed in the meantime
+            with contextlib.suppress(OSError):
+                connection.shutdown(socket.SHUT_RDWR)
+        # this waits for the threads of the connections
+        self.server_close()
+        self._thread.join()
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """Handler of the requests of a `FakeApiServer`."""
+
+    protocol_version = "HTTP/1.1"
+    # the headers and the body are written separately, so do not let the body wait for the client to acknowledge them
+    disable_nagle_algorithm = True
+    server: FakeApiServer
+
+    def setup(self) -> None:
+        """Count the new connection."""
+        super().setup()
+        self.server.connections += 1
+        self.server.sockets.add(self.request)
+
+    def finish(self) -> None:
+        """Forget the closed connection."""
+        super().finish()
+        self.server.sockets.discard(self.request)
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Do not log requests."""
+
+    def _send(self, status: int, body: bytes = b"{}") -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self) -> None:
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        def local(key: str = "path") -> Path:
+            return self.server.root / query[key].lstrip("/")
+
+        endpoint = url.path.rsplit("/", 1)[-1]
+        try:
+            if endpoint == "listdir":
+                listing = [
+                    {"path": f"{query['path'].rstrip('/')}/{child.name}"}
+                    for child in local().iterdir()
+                ]
+                self._send(200, json.dumps(listing).encode())
+            elif endpoint == "attr":
+                path = local()
+                kind = "dir" if path.is_dir() else "file"
+                attributes = {"type": kind, "size": path.stat().st_size}
+                self._send(200, json.dumps(attributes).encode())
+            elif endpoint == "download":
+                self._send(200, local().read_bytes())
+            elif endpoint == "mkdir":
+                local().mkdir()
+                self._send(200)
+            elif endpoint == "delete":
+                path = local()
+                shutil.rmtree(path) if path.is_dir() else path.unlink()
+                self._send(200)
+            elif endpoint == "copyfile":
+                shutil.copyfile(local("src"), local("dst"))
+                self._send(200)
+            elif endpoint == "move":
+                local("src").rename(local("dst"))
+                self._send(200)
+            else:
+                self._send(400)
+        except FileNotFoundError:
+            self._send(404)
+
+    # dispatched to by the name of the method of the request
+    do_GET = do_POST = do_DELETE = _handle
+
+
+@pytest.fixture
+def api_server(tmp_path: Path) -> Iterator[FakeApiServer]:
+    """:return: A fake API server for a new temporary directory."""
+    root = tmp_path / "drive"
+    root.mkdir()
+    server = FakeApiServer(root)
+    try:
+        yield server
+    finally:
+        server.close()
@@ -0,0 +1,81 @@
+"""Tests of the HTTP API client."""
+
+from pathlib import Path
+
+import click
+import pytest
+import requests
+
+from sex.api import Api
+from sex.api import ApiAddrType
+from sex.api import RequestTiming
+
+from .conftest import FakeApiServer
+
+
+def _timed(api: Api) -> list[RequestTiming]:
+    timings: list[RequestTiming] = []
+    api.hooks.append(lambda _, timing: timings.append(timing))
+    return timings
+
+
+def test_connections_are_kept_alive(api_server: FakeApiServer) -> None:
+    """Requests reuse one connection, and only the first request is charged for connecting."""
+    api = Api(api_server.address)
+    timings = _timed(api)
+    for _ in range(5):
+        assert api.listdir(Path("/")) == []
+    assert api_server.connections == 1
+    assert [timing.connect > 0 for timing in timings] == [True] + [False] * 4
+    assert all(timing.endpoint == "/admin/fs/listdir" for timing in timings)
+    assert all(timing.status == 200 for timing in timings)
+
+
+def test_connections_are_closed_without_keep_alive(
+    api_server: FakeApiServer,
+) -> None:
+    """Without keep-alive, every request connects anew."""
+    api = Api(api_server.address, keep_alive=False)
+    timings = _timed(api)
+    for _ in range(3):
+        api.listdir(Path("/"))
+    assert api_server.connections == 3
+    assert all(timing.connect > 0 for timing in timings)
+
+
+def test_requests(api_server: FakeApiServer) -> None:
+    """Every endpoint acts on the drive."""
+    api = Api(api_server.address)
+    api.mkdir(Path("/d"))
+    (api_server.root / "d" / "f").write_bytes(b"data" * 1000)
+    assert api.listdir(Path("/d")) == [{"path": "/d/f"}]
+    assert api.getattr(Path("/d/f")) == {"type": "file", "size": 4000}
+    assert api.download(Path("/d/f")) == b"data" * 1000
+    assert b"".join(api.download_chunks(Path("/d/f"), 1000)) == b"data" * 1000
+    api.copyfile(Path("/d/f"), Path("/d/g"))
+    api.move(Path("/d/g"), Path("/h"))
+    api.delete(Path("/d/f"))
+    assert sorted(path.name for path in api_server.root.rglob("*")) == ["d", "h"]
+    with pytest.raises(requests.HTTPError):
+        api.getattr(Path("/d/f"))
+
+
+def test_subtree(api_server: FakeApiServer) -> None:
+    """Clients of subtrees act on their subdirectory, with the settings of their parent."""
+    api = Api(api_server.address, pool_size=3, keep_alive=False)
+    api.mkdir(Path("/d"))
+    subtree = api.subtree(Path("/d"))
+    subtree.mkdir(Path("/e"))
+    assert (api_server.root / "d" / "e").is_dir()
+    assert subtree.subtree(Path("/e")).root == Path("/d/e")
+    assert (subtree.pool_size, subtree.keep_alive) == (3, False)
+    assert str(api) == f"http://{api_server.address}"
+    assert str(subtree) == f"http://{api_server.address}/d"
+
+
+def test_address_type() -> None:
+    """API addresses are parsed from the command line."""
+    api = ApiAddrType().convert("localhost:8000/drive", None, None)
+    assert (api.url, api.drive) == ("http://localhost:8000", "drive")
+    with pytest.raises(click.BadParameter, match="not a valid API URL"):
+        ApiAddrType().convert("localhost", None, None)
@@ -0,0 +1,138 @@
+"""Tests of the asynchronous HTTP API client."""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+import requests
+
+from sex.api import Api
+from sex.api import RequestTiming
+from sex.async_api import AsyncApi
+
+from .conftest import FakeApiServer
+
+
+class UnframedHandler(BaseHTTPRequestHandler):
+    """Answers without a length: `POST` with a 204, `DELETE` with a 200 without a body, `GET` until it closes."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Do not log requests."""
+
+    def _no_content(self) -> None:
+        self.send_response(204)
+        self.end_headers()
+
+    def _no_body(self) -> None:
+        self.send_response(200)
+        self.end_headers()
+
+    def _until_close(self) -> None:
+        self.send_response(200)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(b"[]")
+        self.close_connection = True
+
+    do_POST = _no_content
+    do_DELETE = _no_body
+    do_GET = _until_close
+
+
+@pytest.fixture
+def unframed_server() -> Iterator[str]:
+    """:return: The address of a `UnframedHandler` server, in the format of `sex.api.Api`."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UnframedHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+    thread.start()
+    try:
+        yield f"127.0.0.1:{server.server_address[1]}/drive"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_requests(api_server: FakeApiServer) -> None:
+    """Every endpoint acts on the drive, over a single kept-alive connection."""
+
+    async def run(api: AsyncApi) -> None:
+        try:
+            await api.mkdir(Path("/d"))
+            (api_server.root / "d" / "f").write_bytes(b"data" * 1000)
+            assert await api.listdir(Path("/d")) == [{"path": "/d/f"}]
+            assert await api.getattr(Path("/d/f")) == {"type": "file", "size": 4000}
+            assert await api.download(Path("/d/f")) == b"data" * 1000
+            async with api.download_chunks(Path("/d/f")) as chunks:
+                assert b"".join([chunk async for chunk in chunks]) == b"data" * 1000
+            await api.copyfile(Path("/d/f"), Path("/d/g"))
+            await api.move(Path("/d/g"), Path("/h"))
+            await api.delete(Path("/d/f"))
+        finally:
+            await api.close()
+
+    api = AsyncApi(Api(api_server.address))
+    timings: list[RequestTiming] = []
+    api.hooks.append(lambda _, timing: timings.append(timing))
+    asyncio.run(run(api))
+    assert sorted(path.name for path in api_server.root.rglob("*")) == ["d", "h"]
+    assert api_server.connections == 1
+    assert [timing.connect > 0 for timing in timings] == [True] + [False] * 7
+
+
+def test_error_responses(api_server: FakeApiServer) -> None:
+    """Error responses raise the same errors as with `requests`."""
+
+    async def run(api: AsyncApi) -> None:
+        try:
+            with pytest.raises(requests.HTTPError, match="404 Client Error") as error:
+                await api.getattr(Path("/f"))
+            assert error.value.response is not None
+            assert error.value.response.status_code == 404
+            with pytest.raises(requests.HTTPError):
+                async with api.download_chunks(Path("/f")):
+                    pass
+        finally:
+            await api.close()
+
+    asyncio.run(run(AsyncApi(Api(api_server.address))))
+
+
+def test_concurrent_requests(api_server: FakeApiServer) -> None:
+    """Requests in flight at once open up to `pool_size` connections."""
+
+    async def run(api: AsyncApi) -> None:
+        try:
+            await asyncio.gather(*(api.mkdir(Path(f"/{i}")) for i in range(20)))
+        finally:
+            await api.close()
+
+    asyncio.run(run(AsyncApi(Api(api_server.address, pool_size=3))))
+    assert len(list(api_server.root.iterdir())) == 20
+    assert api_server.connections <= 3
+
+
+@pytest.mark.parametrize("keep_alive", [True, False])
+def test_responses_without_length(unframed_server: str, keep_alive: bool) -> None:
+    """Responses without a length are read until the connection closes if either side says so, or else are empty."""
+
+    async def run(api: AsyncApi) -> None:
+        try:
+            async with asyncio.timeout(1):
+                await api.mkdir(Path("/d"))
+                await api.mkdir(Path("/e"))
+                await api.delete(Path("/d"))
+                await api.delete(Path("/e"))
+                assert await api.listdir(Path("/")) == []
+                assert await api.listdir(Path("/")) == []
+        finally:
+            await api.close()
+
+    asyncio.run(run(AsyncApi(Api(unframed_server, keep_alive=keep_alive))))
@@ -0,0 +1,92 @@
+"""Tests of audits of whole namespaces."""
+
+import copy
+import random
+from pathlib import Path
+
+import pytest
+
+from sex.audit import AuditError
+from sex.audit import Auditor
+from sex.audit import audit
+from sex.constants import ACTUAL_DATA_FILENAME
+from sex.operations.create import Create
+from sex.operations.mkdir import Mkdir
+from sex.operations.write import Write
+from sex.planner import random_operations
+from sex.state import State
+
+
+def _populate(mountpoint: Path, seed: int) -> State:
+    # run random operations against a plain directory and the model
+    random.seed(seed)
+    state = State(None)
+    for _, operation, client in random_operations(
+        state, [mountpoint], 60, [Mkdir, Create, Write]
+    ):
+        operation.execute(client)
+        operation.update(state)
+    return state
+
+
+def _files(state: State, mountpoint: Path) -> list[Path]:
+    # the files of the model that are not empty, on the mountpoint
+    return [
+        mountpoint / path.relative_to("/")
+        for path, node in sorted(state.files())
+        if len(node.content)
+    ]
+
+
+def test_matching_clients(tmp_path: Path) -> None:
+    """A client that matches the model, apart from dot files, passes."""
+    state = _populate(tmp_path, 1)
+    (tmp_path / ".hidden").write_bytes(b"ignored")
+    assert audit(state, [tmp_path]) == []
+    Auditor([tmp_path], 10).check(state)
+
+
+def test_namespace_differences(tmp_path: Path) -> None:
+    """Missing, unexpected and resized entries are all reported."""
+    state = _populate(tmp_path, 2)
+    missing, resized, *_ = _files(state, tmp_path)
+    missing.unlink()
+    (tmp_path / "unexpected").mkdir()
+    with resized.open("ab") as f:
+        f.write(b"!")
+    problems = audit(state, [tmp_path])
+    assert f"{tmp_path}: File /{missing.relative_to(tmp_path)} is missing" in problems
+    assert f"{tmp_path}: Directory /unexpected is unexpected" in problems
+    assert any(f"File /{resized.relative_to(tmp_path)} has size" in p for p in problems)
+
+
+def test_content_differences(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Files that differ only in contents are compared, without writing comparison artifacts."""
+    workdir = tmp_path / "cwd"
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    mountpoint = tmp_path / "mnt"
+    mountpoint.mkdir()
+    state = _populate(mountpoint, 3)
+    changed = _files(state, mountpoint)[0]
+    data = bytearray(changed.read_bytes())
+    data[0] ^= 1
+    changed.write_bytes(data)
+    with pytest.raises(AuditError) as error:
+        Auditor([mountpoint], 10).check(state)
+    [problem] = error.value.problems
+    assert str(changed) in problem and "0x0000" in problem
+    assert ACTUAL_DATA_FILENAME not in problem
+    assert not list(workdir.iterdir())
+
+
+def test_audit_errors() -> None:
+    """Audit errors show a bounded number of differences and survive copying."""
+    error = AuditError([f"problem {i}" for i in range(5)], limit=2)
+    assert str(error).splitlines()[1:] == [
+        "problem 0",
+        "problem 1",
+        "and 3 more differences",
+    ]
+    copied = copy.copy(error)
+    assert copied.problems == error.problems and str(copied) == str(error)
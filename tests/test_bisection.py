@@ -0,0 +1,86 @@
+"""Tests of the bisection of failed runs."""
+
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from click.testing import Result
+
+from sex.api import Api
+from sex.checkpoint import list_checkpoints
+from sex.exerciser import exercise
+from sex.operation import Operation
+from sex.state import State
+from sex.verification import VerificationPipeline
+
+
+#: The operation after which `_Diverging` makes the first client diverge.
+DIVERGING = 57
+
+
+class _Diverging(VerificationPipeline):
+    # a pipeline whose first client gains an unexpected file after operation `DIVERGING`
+    def dispatch(
+        self, n: int, operation: Operation, client: Path | Api, state: State
+    ) -> None:
+        super().dispatch(n, operation, client, state)
+        if n == DIVERGING:
+            self.settle()
+            mountpoint = self.clients[0]
+            assert isinstance(mountpoint, Path)
+            (mountpoint / "unexpected").write_bytes(b"!")
+
+
+def _exercise(*args: object) -> Result:
+    return CliRunner().invoke(exercise, [str(arg) for arg in args])
+
+
+def _checkpointed(tmp_path: Path) -> tuple[Path, Path]:
+    # run 50 operations on a new mountpoint, checkpointing after 20 and 40 of them
+    mountpoint, checkpoints = tmp_path / "a", tmp_path / "b"
+    mountpoint.mkdir()
+    result = _exercise(
+        *("-m", mountpoint, "-s", 3, "-n", 50),
+        *("--checkpoint-dir", checkpoints, "--checkpoint-every", 20),
+    )
+    assert result.exit_code == 0, result.output
+    return mountpoint, checkpoints
+
+
+def test_bisect(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Bisection finds the operation after which a client diverges, and how to run up to it."""
+    mountpoint, checkpoints = _checkpointed(tmp_path)
+    before = set(mountpoint.iterdir())
+    monkeypatch.setattr("sex.bisection.VerificationPipeline", _Diverging)
+    # like a run that failed after its last checkpoint
+    result = _exercise(
+        *("-m", mountpoint, "-c", mountpoint, "-n", 70, "--bisect", checkpoints)
+    )
+    assert result.exit_code == 0, result.output
+    assert f"diverge from the model after operation {DIVERGING}:" in result.output
+    assert f"  {DIVERGING}: " in result.output
+    assert "File /unexpected is unexpected" in result.output
+    path = dict(list_checkpoints(checkpoints))[40]
+    assert f"--resume {path} --num-operations {DIVERGING + 1}" in result.output
+    # the probes are cleaned up
+    assert set(mountpoint.iterdir()) == before
+
+
+def test_nothing_to_bisect(tmp_path: Path) -> None:
+    """Runs that do not diverge cannot be bisected."""
+    mountpoint, checkpoints = _checkpointed(tmp_path)
+    result = _exercise(
+        *("-m", mountpoint, "-c", mountpoint, "-n", 70, "--bisect", checkpoints)
+    )
+    assert result.exit_code != 0
+    assert "there is nothing to bisect" in result.output
+
+
+def test_bisect_with_other_clients(tmp_path: Path) -> None:
+    """Runs cannot be bisected on other clients than they were checkpointed with."""
+    mountpoint, checkpoints = _checkpointed(tmp_path)
+    other = tmp_path / "c"
+    other.mkdir()
+    result = _exercise("-m", other, "-c", other, "-n", 70, "--bisect", checkpoints)
+    assert result.exit_code != 0
+    assert "The checkpoints were taken with clients" in result.output
@@ -0,0 +1,149 @@
+"""Tests of checkpoints of runs."""
+
+import random
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from click.testing import Result
+
+from sex.checkpoint import Checkpoint
+from sex.checkpoint import Checkpointer
+from sex.checkpoint import CheckpointError
+from sex.checkpoint import capture
+from sex.checkpoint import list_checkpoints
+from sex.checkpoint import load_checkpoint
+from sex.content import CONTENT_MODELS
+from sex.exerciser import exercise
+from sex.operation import Operation
+from sex.operations.create import Create
+from sex.operations.delete import Delete
+from sex.operations.listdir import Listdir
+from sex.operations.read import Read
+from sex.operations.truncate import Truncate
+from sex.operations.write import Write
+from sex.planner import random_operations
+from sex.state import State
+
+
+OPERATIONS: list[type[Operation]] = [Read, Write, Create, Delete, Truncate, Listdir]
+CLIENTS = [Path("/mnt/a"), Path("/mnt/b")]
+
+
+def _run(state: State, num_operations: int, start: int = 0) -> list[str]:
+    # apply random operations to the model only, returning their descriptions
+    operations = []
+    for n, operation, client in random_operations(
+        state, CLIENTS, num_operations, OPERATIONS, start
+    ):
+        operations.append(f"{n}: {operation} on {client}")
+        operation.update(state)
+    return operations
+
+
+@pytest.mark.parametrize("content_model", sorted(CONTENT_MODELS))
+def test_checkpoint_round_trip(content_model: str) -> None:
+    """A restored checkpoint continues the run exactly like the original."""
+    content_type = CONTENT_MODELS[content_model]
+    random.seed(10)
+    state = State(None, content_type)
+    _run(state, 200)
+    checkpoint = Checkpoint.from_bytes(
+        capture(200, state, 10, CLIENTS, {"content_model": content_model}).to_bytes()
+    )
+    expected = _run(state, 400, 200)
+
+    restored = State(None, content_type)
+    checkpoint.restore(restored)
+    assert checkpoint.n == 200 and checkpoint.seed == 10
+    assert checkpoint.clients == [str(client) for client in CLIENTS]
+    assert _run(restored, 400, 200) == expected
+    assert restored.digest() == state.digest()
+
+
+def test_checkpoints_restore_into_empty_models_only() -> None:
+    """Restoring a checkpoint into a model that is not empty fails."""
+    state = State(None)
+    _run(state, 20)
+    checkpoint = capture(20, state, None, CLIENTS, {})
+    with pytest.raises(Exception, match="not empty"):
+        checkpoint.restore(state)
+
+
+def test_invalid_checkpoints(tmp_path: Path) -> None:
+    """Data that is not a checkpoint is rejected."""
+    with pytest.raises(CheckpointError):
+        Checkpoint.from_bytes(b"nope")
+    path = tmp_path / "000000000001.checkpoint"
+    path.write_bytes(capture(1, State(None), 1, CLIENTS, {}).to_bytes()[:-4])
+    with pytest.raises(CheckpointError):
+        load_checkpoint(path)
+
+
+def test_checkpointer(tmp_path: Path) -> None:
+    """Checkpoints are written when due, named after the next operation, and listed in order."""
+    random.seed(11)
+    state = State(None)
+    with Checkpointer(tmp_path, 50, 11, CLIENTS, {}) as checkpoints:
+        for n, operation, _ in random_operations(state, CLIENTS, 200, OPERATIONS):
+            operation.update(state)
+            checkpoints.save(n + 1, state)
+    listed = list_checkpoints(tmp_path)
+    assert [n for n, _ in listed] == [50, 100, 150, 200]
+    assert not list(tmp_path.glob("*.tmp"))
+    assert load_checkpoint(listed[-1][1]).n == 200
+
+
+def _exercise(*args: object) -> Result:
+    return CliRunner().invoke(exercise, [str(arg) for arg in args])
+
+
+def _checkpointed(mountpoint: Path, checkpoints: Path) -> Path:
+    # run 50 operations on a new mountpoint, checkpointing after the last one
+    mountpoint.mkdir()
+    result = _exercise(
+        *("-m", mountpoint, "-s", 3, "-n", 50),
+        *("--checkpoint-dir", checkpoints, "--checkpoint-every", 50),
+    )
+    assert result.exit_code == 0, result.output
+    [(n, path)] = list_checkpoints(checkpoints)
+    assert n == 50
+    return path
+
+
+def _contents(root: Path) -> dict[str, bytes | None]:
+    return {
+        str(path.relative_to(root)): path.read_bytes() if path.is_file() else None
+        for path in root.rglob("*")
+    }
+
+
+def test_resume(tmp_path: Path) -> None:
+    """A resumed run leaves the mounts exactly like the run it continues."""
+    whole, resumed = tmp_path / "a", tmp_path / "b"
+    whole.mkdir()
+    assert _exercise("-m", whole, "-s", 3, "-n", 100).exit_code == 0
+    path = _checkpointed(resumed, tmp_path / "c")
+    assert load_checkpoint(path).options["operations"] == [
+        operation.name for operation in OPERATIONS
+    ]
+    result = _exercise("-m", resumed, "-n", 100, "--resume", path)
+    assert result.exit_code == 0, result.output
+    assert _contents(resumed) == _contents(whole)
+
+
+def test_resume_with_other_operations(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Runs cannot be resumed, nor bisected, with other types of operations than they were checkpointed with."""
+    mountpoint, checkpoints = tmp_path / "a", tmp_path / "b"
+    path = _checkpointed(mountpoint, checkpoints)
+    monkeypatch.setattr("sex.exerciser.operations", [Create, Write])
+    result = _exercise("-m", mountpoint, "-n", 100, "--resume", path)
+    assert result.exit_code != 0
+    assert "taken with operations READ, WRITE" in result.output
+    result = _exercise(
+        *("-m", mountpoint, "-c", mountpoint, "-n", 50, "--bisect", checkpoints)
+    )
+    assert result.exit_code != 0
+    assert "taken with operations READ, WRITE" in result.output
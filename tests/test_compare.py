@@ -0,0 +1,98 @@
+"""Tests of the streaming comparison of file contents."""
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from sex.compare import compare_chunks
+from sex.compare import no_artifacts
+from sex.constants import ACTUAL_DATA_FILENAME
+from sex.constants import EXPECTED_DATA_FILENAME
+from sex.content import literal
+from sex.merkle import MerkleTree
+from sex.operation import VerificationError
+from sex.state import File
+
+
+LEAF = MerkleTree.LEAF_SIZE
+EXPECTED = File.of(literal(bytes(range(256)) * (3 * LEAF // 256)))
+
+
+def _chunks(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1000, LEAF, 3 * LEAF])
+def test_matching_contents(size: int) -> None:
+    """Contents that match pass however they are chunked."""
+    compare_chunks("f", _chunks(EXPECTED.content.read(0, 3 * LEAF), size), EXPECTED)
+
+
+def test_differing_ranges(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Every differing leaf is reported, and the differing ranges are written as artifacts."""
+    monkeypatch.chdir(tmp_path)
+    actual = bytearray(EXPECTED.content.read(0, 3 * LEAF))
+    actual[5] ^= 1
+    actual[2 * LEAF + 7] ^= 1
+    with pytest.raises(VerificationError, match="offset 0x0005") as error:
+        compare_chunks("f", _chunks(bytes(actual), 1000), EXPECTED)
+    assert f"0x{2 * LEAF:04x} thru 0x{3 * LEAF:04x}" in str(error.value)
+    assert (tmp_path / ACTUAL_DATA_FILENAME).read_bytes() == (
+        actual[:LEAF] + actual[2 * LEAF :]
+    )
+    assert len((tmp_path / EXPECTED_DATA_FILENAME).read_bytes()) == 2 * LEAF
+
+
+def test_size_mismatch() -> None:
+    """Contents that are shorter or longer than expected fail."""
+    data = EXPECTED.content.read(0, 3 * LEAF)
+    with no_artifacts():
+        with pytest.raises(VerificationError, match="has size"):
+            compare_chunks("f", [data[:-1]], EXPECTED)
+        with pytest.raises(VerificationError, match="longer"):
+            compare_chunks("f", [data + b"!"], EXPECTED)
+
+
+def test_no_artifacts(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """No artifacts are written within `no_artifacts`, nor mentioned in the error."""
+    monkeypatch.chdir(tmp_path)
+    with no_artifacts(), pytest.raises(VerificationError) as error:
+        compare_chunks("f", [bytes(3 * LEAF)], EXPECTED)
+    assert ACTUAL_DATA_FILENAME not in str(error.value)
+    assert not list(tmp_path.iterdir())
+
+
+def test_artifacts_parameter(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The `artifacts` parameter overrides `no_artifacts` either way."""
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(VerificationError):
+        compare_chunks("f", [bytes(3 * LEAF)], EXPECTED, artifacts=False)
+    assert not list(tmp_path.iterdir())
+    with no_artifacts(), pytest.raises(VerificationError):
+        compare_chunks("f", [bytes(3 * LEAF)], EXPECTED, artifacts=True)
+    assert (tmp_path / ACTUAL_DATA_FILENAME).exists()
+
+
+def test_no_artifacts_is_local_to_the_context(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """`no_artifacts` on one thread does not affect comparisons on another."""
+    monkeypatch.chdir(tmp_path)
+    entered, compared = threading.Event(), threading.Event()
+
+    def quiet() -> None:
+        with no_artifacts():
+            entered.set()
+            compared.wait()
+
+    thread = threading.Thread(target=quiet)
+    thread.start()
+    entered.wait()
+    try:
+        with pytest.raises(VerificationError, match=ACTUAL_DATA_FILENAME):
+            compare_chunks("f", [bytes(3 * LEAF)], EXPECTED)
+    finally:
+        compared.set()
+        thread.join()
+    assert (tmp_path / ACTUAL_DATA_FILENAME).exists()
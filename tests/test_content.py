@@ -0,0 +1,139 @@
+"""Tests of the models of file contents."""
+
+import random
+
+import pytest
+
+from sex.content import BLOCK_SIZE
+from sex.content import BlockContent
+from sex.content import BytesContent
+from sex.content import Content
+from sex.content import ExtentContent
+from sex.content import Generated
+from sex.content import Literal
+from sex.content import Zero
+from sex.content import content_from_record
+from sex.content import extent_from_record
+from sex.content import first_difference
+from sex.content import generated
+from sex.content import literal
+
+
+def test_first_difference() -> None:
+    """It finds the first differing byte, or the length of the shorter buffer."""
+    data = bytes(10000)
+    assert first_difference(data, data) == 10000
+    assert first_difference(data, data[:5000]) == 5000
+    assert first_difference(data, data[:9000] + b"\x01" + data[9001:]) == 9000
+
+
+def test_extents_match_bytes() -> None:
+    """Random writes and truncations of extents read the same as of plain bytes."""
+    rng = random.Random(1)
+    extents = ExtentContent()
+    reference = BytesContent()
+    for _ in range(500):
+        if rng.random() < 0.2:
+            size = rng.randrange(0, 3000)
+            extents.truncate(size)
+            reference.truncate(size)
+        else:
+            offset = rng.randrange(0, len(reference) + 100)
+            data = (
+                generated(rng.getrandbits(64), rng.randrange(0, 500))
+                if rng.random() < 0.5
+                else literal(rng.randbytes(rng.randrange(0, 500)))
+            )
+            extents.write(offset, data)
+            reference.write(offset, data)
+        assert len(extents) == len(reference)
+        start = rng.randrange(0, len(reference) + 1)
+        assert extents.read(start, 700) == reference.read(start, 700)
+    assert bytes(extents) == bytes(reference)
+
+
+def test_holes() -> None:
+    """Holes read as zeros, appear as `Zero` extents and hold no data ranges."""
+    content = ExtentContent.zeros(1 << 40)
+    content.write(100, literal(b"abc"))
+    assert content.read(98, 7) == b"\0\0abc\0\0"
+    assert content.extents() == [Zero(100), Literal(b"abc"), Zero((1 << 40) - 103)]
+    assert content.data_ranges(0, len(content)) == [(100, 103)]
+    assert content.data_ranges(101, 102) == [(101, 102)]
+    assert content.data_ranges(200, 300) == []
+
+
+def test_overwrite_splits_and_clears_extents() -> None:
+    """Writes inside an extent split it, and truncations cut or drop the extents past the end."""
+    content = literal(b"0123456789")
+    content.write(3, literal(b"ab"))
+    assert bytes(content) == b"012ab56789"
+    assert content.extents() == [Literal(b"012"), Literal(b"ab"), Literal(b"56789")]
+    content.write(2, ExtentContent.zeros(5))
+    assert bytes(content) == b"01\0\0\0\0\x00789"
+    content.truncate(1)
+    assert content.extents() == [Literal(b"0")]
+    content.truncate(4)
+    assert bytes(content) == b"0\0\0\0"
+
+
+def test_copy_is_independent() -> None:
+    """Changes to contents do not affect their copies."""
+    for content in (literal(b"abcdef"), BytesContent(b"abcdef")):
+        copy = content.copy()
+        content.write(1, literal(b"xy"))
+        content.truncate(3)
+        assert bytes(copy) == b"abcdef"
+
+
+def test_generated_slices() -> None:
+    """Slices of generated data read as the same range of the whole."""
+    extent = Generated(42, 0, 1000)
+    assert extent.slice(100, 300).read(0, 200) == extent.read(100, 200)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        BytesContent(b"\x00\x01\xff"),
+        ExtentContent([Literal(b"ab"), Zero(10), Generated(7, 3, 20)]),
+        BlockContent(5, [0, 0, -1, 3, 3, 3], 2),
+    ],
+)
+def test_record_round_trip(content: Content) -> None:
+    """Contents of every model rebuild from their description to the same bytes."""
+    copy = content_from_record(content.to_record())
+    assert type(copy) is type(content)
+    assert bytes(copy) == bytes(content)
+
+
+def test_invalid_records() -> None:
+    """Invalid descriptions are rejected."""
+    with pytest.raises(ValueError):
+        content_from_record({"model": "nope"})
+    with pytest.raises(ValueError):
+        extent_from_record(["zero", "many"])
+
+
+def test_blocks_describe_themselves() -> None:
+    """Blocks check out against their model, and stale, misplaced or corrupt blocks do not."""
+    content = BlockContent.new(4 * BLOCK_SIZE, 0x1234)
+    data = content.overwrite(BLOCK_SIZE, 2 * BLOCK_SIZE, 0)
+    stale = bytes(content)
+    content.write(BLOCK_SIZE, data)
+    assert content.mismatch(0, bytes(content)) is None
+    assert "stale" in (content.mismatch(0, stale) or "")
+    swapped = content.read(BLOCK_SIZE, BLOCK_SIZE) + content.read(0, BLOCK_SIZE)
+    assert "is block 1" in (content.mismatch(0, swapped) or "")
+    corrupt = bytearray(bytes(content))
+    corrupt[-1] ^= 0xFF
+    assert "CRC32" in (content.mismatch(0, bytes(corrupt)) or "")
+
+
+def test_blocks_must_be_aligned() -> None:
+    """Block contents reject sizes and offsets that are not multiples of the block size."""
+    with pytest.raises(ValueError):
+        BlockContent.new(100, 1)
+    content = BlockContent.new(2 * BLOCK_SIZE, 1)
+    with pytest.raises(ValueError):
+        content.write(0, content.overwrite(BLOCK_SIZE, BLOCK_SIZE, 0))
@@ -0,0 +1,76 @@
+"""Tests of the asyncio execution engine."""
+
+import asyncio
+import random
+from pathlib import Path
+
+import pytest
+
+from sex.api import Api
+from sex.async_api import AsyncApi
+from sex.audit import audit
+from sex.engine import AsyncEngine
+from sex.metrics import Metrics
+from sex.operation import Operation
+from sex.operations.create import Create
+from sex.operations.delete import Delete
+from sex.operations.listdir import Listdir
+from sex.operations.mkdir import Mkdir
+from sex.operations.read import Read
+from sex.operations.truncate import Truncate
+from sex.operations.write import Write
+from sex.planner import random_operations
+from sex.state import State
+from sex.verification import OperationFailedError
+
+from .conftest import FakeApiServer
+
+
+OPERATIONS: list[type[Operation]] = [Read, Write, Create, Delete, Truncate, Listdir]
+
+
+def test_engine_runs_operations_concurrently(api_server: FakeApiServer) -> None:
+    """Operations run concurrently on a mount and on an API of the same files leave both like the model."""
+    mountpoint = api_server.root
+    api = Api(api_server.address)
+    random.seed(4)
+    state = State(None)
+    verified: list[int] = []
+    metrics = Metrics()
+
+    async def run() -> None:
+        clients: list[Path | AsyncApi] = [mountpoint, AsyncApi(api)]
+        async with AsyncEngine(
+            clients,
+            5,
+            False,
+            False,
+            8,
+            on_verified=lambda n, _: verified.append(n),
+            metrics=metrics,
+        ) as engine:
+            for n, operation, client in random_operations(
+                state, clients, 200, OPERATIONS
+            ):
+                await engine.dispatch(n, operation, client, state)
+
+    asyncio.run(run())
+    assert sorted(verified) == list(range(200))
+    assert audit(state, [mountpoint, api]) == []
+
+
+def test_engine_raises_failures(tmp_path: Path) -> None:
+    """The first operation that fails is raised once the engine drains."""
+    state = State(None)
+
+    async def run() -> None:
+        async with AsyncEngine([tmp_path], 0.1, False, False, 4) as engine:
+            await engine.dispatch(0, Mkdir(Path("/d")), tmp_path, state)
+            # the directory exists on the mount, but not in the model
+            (tmp_path / "e").mkdir()
+            await engine.dispatch(1, Mkdir(Path("/e")), tmp_path, state)
+
+    with pytest.raises(OperationFailedError) as error:
+        asyncio.run(run())
+    assert error.value.n == 1
+    assert isinstance(error.value.__cause__, FileExistsError)
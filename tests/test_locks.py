@@ -0,0 +1,56 @@
+"""Tests of the locks over filesystem paths."""
+
+import threading
+from pathlib import Path
+
+from sex.locks import PathLocks
+
+
+A = Path("/a")
+B = Path("/b")
+
+
+def _acquired(locks: PathLocks, reads: set[Path], writes: set[Path]) -> bool:
+    # whether the paths can be acquired by another thread within a short time
+    thread = threading.Thread(target=locks.acquire, args=(reads, writes), daemon=True)
+    thread.start()
+    thread.join(0.1)
+    return not thread.is_alive()
+
+
+def test_readers_share() -> None:
+    """Any number of readers hold a path at once."""
+    locks = PathLocks()
+    locks.acquire({A}, set())
+    assert _acquired(locks, {A}, set())
+
+
+def test_writers_exclude() -> None:
+    """A writer excludes readers and other writers of its paths, but not of other paths."""
+    locks = PathLocks()
+    locks.acquire(set(), {A})
+    assert not _acquired(locks, {A}, set())
+    assert _acquired(locks, {B}, {Path("/c")})
+    locks.release(set(), {A})
+
+
+def test_release_wakes_waiters() -> None:
+    """Releasing a path lets the requests waiting for it through."""
+    locks = PathLocks()
+    locks.acquire({A}, set())
+    waiter = threading.Thread(target=locks.acquire, args=(set(), {A}), daemon=True)
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    locks.release({A}, set())
+    waiter.join(1)
+    assert not waiter.is_alive()
+
+
+def test_paths_in_both_sets_are_exclusive() -> None:
+    """A path that is both read and written is held exclusively, and released as such."""
+    locks = PathLocks()
+    locks.acquire({A}, {A})
+    assert not _acquired(locks, {A}, set())
+    locks.release({A}, {A})
+    assert _acquired(locks, {A}, set())
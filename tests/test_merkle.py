@@ -0,0 +1,76 @@
+"""Tests of the hash trees over file contents."""
+
+import random
+
+from sex.content import ExtentContent
+from sex.content import generated
+from sex.content import literal
+from sex.merkle import MerkleTree
+from sex.state import File
+
+
+LEAF = MerkleTree.LEAF_SIZE
+
+
+def test_empty_tree() -> None:
+    """The tree of an empty or all-zero file is the tree of zeros, and stores nothing."""
+    assert MerkleTree().root() == MerkleTree.ZERO[MerkleTree.DEPTH]
+    tree = MerkleTree.of(ExtentContent.zeros(1 << 40))
+    assert tree.root() == MerkleTree.ZERO[MerkleTree.DEPTH]
+    assert not tree._nodes
+
+
+def test_updates_match_rebuilds() -> None:
+    """Incrementally updated trees match trees rebuilt from scratch."""
+    rng = random.Random(2)
+    file = File.of(ExtentContent())
+    for _ in range(200):
+        size = len(file.content)
+        if rng.random() < 0.3:
+            file.truncate(rng.randrange(0, 5 * LEAF))
+        else:
+            offset = rng.randrange(0, size + 1)
+            data = generated(rng.getrandbits(64), rng.randrange(0, 2 * LEAF))
+            if offset + len(data) > size:
+                file.truncate(offset + len(data))
+            file.write(offset, data)
+        assert file.tree is not None
+        assert file.tree.root() == MerkleTree.of(file.content).root()
+
+
+def test_source_leaves_are_reused() -> None:
+    """Updating from the tree of a file that the same data was written to yields the same tree."""
+    data = generated(9, 3 * LEAF)
+    file = File.of(ExtentContent.zeros(5 * LEAF))
+    expected = file.copy()
+    expected.write(LEAF // 2, data)
+    file.write(LEAF // 2, data, expected)
+    assert file.tree is not None and expected.tree is not None
+    assert file.tree.root() == expected.tree.root()
+    assert file.tree.root() == MerkleTree.of(file.content).root()
+
+
+def test_leaf_hashes_build_the_same_tree() -> None:
+    """Trees built from streamed leaf hashes match trees built from contents."""
+    content = generated(3, 3 * LEAF + 17)
+    data = bytes(content)
+    leaves = [
+        MerkleTree.leaf_digest(data[start : start + LEAF])
+        for start in range(0, len(data), LEAF)
+    ]
+    assert MerkleTree.of_leaves(leaves).root() == MerkleTree.of(content).root()
+    assert MerkleTree.of_leaves([]).root() == MerkleTree().root()
+
+
+def test_differences_change_the_root() -> None:
+    """A single differing byte, or a trailing zero, changes the digest of a file."""
+    file = File.of(literal(bytes(LEAF * 2)))
+    other = File.of(literal(bytes(LEAF * 2)))
+    assert file.digest() == other.digest()
+    other.write(LEAF + 1, literal(b"\x01"))
+    assert file.digest() != other.digest()
+    # the tree alone cannot tell zero-padding from zeros, the digest covers the size
+    longer = File.of(literal(bytes(LEAF * 2 + 1)))
+    assert file.tree is not None and longer.tree is not None
+    assert file.tree.root() == longer.tree.root()
+    assert file.digest() != longer.digest()
@@ -0,0 +1,81 @@
+"""Tests of the latency and throughput metrics."""
+
+import random
+
+import pytest
+
+from sex.metrics import Histogram
+from sex.metrics import Metrics
+
+
+def test_buckets_bound_their_values() -> None:
+    """Every value falls within the bounds of its bucket, which are within the promised precision."""
+    rng = random.Random(5)
+    values = list(range(1000)) + [
+        rng.randrange(1 << Histogram.MAX_BITS) for _ in range(10000)
+    ]
+    for value in values:
+        index = Histogram._index(value)
+        assert 0 <= index < Histogram.BUCKETS
+        low, high = Histogram._bounds(index)
+        assert low <= value <= high
+        assert high - low <= max(low, 1) * 2 ** -(Histogram.SUB_BITS - 1)
+
+
+def test_buckets_are_ordered() -> None:
+    """Bucket bounds are contiguous, so percentiles can be read off in order."""
+    previous = -1
+    for index in range(Histogram.BUCKETS):
+        low, high = Histogram._bounds(index)
+        assert low == previous + 1 and high >= low
+        previous = high
+
+
+def test_percentiles() -> None:
+    """Percentiles of recorded durations are estimated within the precision of the buckets."""
+    histogram = Histogram()
+    assert histogram.percentile(50) == 0.0 and histogram.mean() == 0.0
+    for millisecond in range(1, 1001):
+        histogram.record(millisecond / 1000)
+    for percentile in (50, 90, 99, 99.9):
+        assert histogram.percentile(percentile) == pytest.approx(
+            percentile / 100, rel=0.02
+        )
+    assert histogram.percentile(100) == pytest.approx(1.0)
+    assert histogram.mean() == pytest.approx(0.5005)
+    assert histogram.summary()["count"] == 1000
+
+
+def test_values_are_clamped() -> None:
+    """Negative and huge durations are clamped to the range of the histogram."""
+    histogram = Histogram()
+    histogram.record(-1)
+    histogram.record(1e9)
+    assert histogram.percentile(1) == 0.0
+    assert histogram.max == (1 << Histogram.MAX_BITS) - 1
+
+
+def test_merge() -> None:
+    """Merging histograms is the same as recording into one."""
+    both, first, second = Histogram(), Histogram(), Histogram()
+    for i in range(100):
+        seconds = i / 997
+        both.record(seconds)
+        (first if i % 3 else second).record(seconds)
+    first.merge(second)
+    assert first.counts == both.counts
+    assert (first.count, first.total, first.max) == (both.count, both.total, both.max)
+
+
+def test_relabel_merges_clients() -> None:
+    """Relabelling clients merges the histograms that end up with the same key."""
+    metrics = Metrics()
+    metrics.record("WRITE", "execute", "/mnt/a", 0.001)
+    metrics.record("WRITE", "execute", "/mnt/b", 0.002)
+    metrics.record_visibility("/mnt/a", "/mnt/b", 0.003)
+    metrics.relabel({"/mnt/a": "mount", "/mnt/b": "mount"})
+    assert [(key, histogram.count) for key, histogram in metrics] == [
+        (("WRITE", "execute", "mount"), 2)
+    ]
+    assert [pair for pair, _ in metrics.visibility()] == [("mount", "mount")]
+    assert metrics.operations() == 2
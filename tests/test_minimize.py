@@ -0,0 +1,74 @@
+"""Tests of the minimization of failing traces."""
+
+from pathlib import Path
+from typing import Optional
+
+from sex.minimize import Candidate
+from sex.minimize import Failure
+from sex.minimize import Minimizer
+from sex.minimize import read_candidate
+from sex.minimize import write_trace
+
+
+FAILURE = Failure("WRITE", "/f", "VerificationError")
+
+
+class FakeMinimizer(Minimizer):
+    """A minimizer whose candidates fail when they hold all of the given operations, without running them."""
+
+    def __init__(self, culprits: set[int]) -> None:
+        """
+        Initialize a new fake minimizer.
+
+        :param culprits: The indices of the operations that fail together.
+        """
+        super().__init__([Path("/mnt")], [], 1, 2, Path("/mnt"))
+        self.culprits = culprits
+        self.tests = 0
+
+    def test(self, candidate: Candidate) -> Optional[Failure]:
+        """:return: The failure if the candidate holds all of the culprits."""
+        self.tests += 1
+        indices = {index for index, _ in candidate}
+        return FAILURE if self.culprits <= indices else None
+
+
+def _mkdirs(count: int) -> Candidate:
+    # independent operations, which all apply whatever is removed
+    return [
+        (index, {"n": index, "op": "MKDIR", "client": 0, "path": f"/d{index}"})
+        for index in range(count)
+    ]
+
+
+def test_minimize_finds_the_culprits() -> None:
+    """Minimization reduces a failing trace to exactly the operations that fail together."""
+    for culprits in ({17}, {3, 71}, {0, 50, 99}):
+        minimizer = FakeMinimizer(culprits)
+        minimized = minimizer.minimize(_mkdirs(100), FAILURE)
+        assert {index for index, _ in minimized} == culprits
+        assert minimizer.tests < 400
+
+
+def test_inapplicable_operations_are_dropped() -> None:
+    """Operations whose preconditions no longer hold are dropped, along with out of range clients."""
+    candidate: Candidate = [
+        (0, {"n": 0, "op": "MKDIR", "client": 0, "path": "/d"}),
+        (1, {"n": 1, "op": "MKDIR", "client": 0, "path": "/d/e"}),
+        (2, {"n": 2, "op": "DELETE", "client": 0, "path": "/f"}),
+        (3, {"n": 3, "op": "MKDIR", "client": 1, "path": "/g"}),
+        (4, {"n": 4, "op": "MKDIR", "client": 0, "path": "/d"}),
+    ]
+    minimizer = FakeMinimizer(set())
+    assert [index for index, _ in minimizer.applicable(candidate)] == [0, 1]
+    assert [index for index, _ in minimizer.applicable(candidate[1:])] == [4]
+
+
+def test_traces_round_trip(tmp_path: Path) -> None:
+    """Minimized traces are renumbered, and read back without digests."""
+    path = tmp_path / "minimized.jsonl"
+    candidate = _mkdirs(10)[3:6]
+    write_trace(path, [Path("/mnt")], candidate)
+    read = read_candidate(path)
+    assert [index for index, _ in read] == [0, 1, 2]
+    assert [record["path"] for _, record in read] == ["/d3", "/d4", "/d5"]
@@ -0,0 +1,59 @@
+"""Tests of the generation of file data."""
+
+import zlib
+
+import pytest
+
+from sex.payload import GENERATOR_BLOCK_SIZE
+from sex.payload import PROFILES
+from sex.payload import Duplicated
+from sex.payload import Profile
+
+
+@pytest.mark.parametrize("profile", PROFILES.values(), ids=PROFILES.keys())
+def test_ranges(profile: Profile) -> None:
+    """Any range of a stream is generated the same as when generating the stream from its start."""
+    size = 3 * GENERATOR_BLOCK_SIZE + 123
+    stream = profile.generate(7, 0, size)
+    assert len(stream) == size
+    blocks = b"".join(profile.block(7, index) for index in range(3))
+    assert stream[: 3 * GENERATOR_BLOCK_SIZE] == blocks
+    for offset, length in [
+        (0, 1),
+        (5, 4096),
+        (GENERATOR_BLOCK_SIZE - 1, 2),
+        (GENERATOR_BLOCK_SIZE, GENERATOR_BLOCK_SIZE),
+        (1000, 2 * GENERATOR_BLOCK_SIZE + 17),
+        (size - 1, 1),
+    ]:
+        assert profile.generate(7, offset, length) == stream[offset : offset + length]
+    assert profile.generate(7, 100, 0) == b""
+    assert profile.generate(7, 100, -1) == b""
+
+
+@pytest.mark.parametrize("name", ["random", "text", "dedup"])
+def test_seeds(name: str) -> None:
+    """Different seeds generate different streams."""
+    profile = PROFILES[name]
+    assert profile.generate(1, 0, 10000) != profile.generate(2, 0, 10000)
+
+
+def test_compressibility() -> None:
+    """Random data does not compress, text and zeros do."""
+    ratios = {
+        name: len(zlib.compress(profile.generate(3, 0, 1 << 18))) / (1 << 18)
+        for name, profile in PROFILES.items()
+    }
+    assert ratios["random"] > 0.99
+    assert ratios["text"] < 0.6
+    assert ratios["zeros"] < 0.01
+
+
+def test_duplicated_chunks() -> None:
+    """Deduplicated data is made of a few aligned chunks only."""
+    data = PROFILES["dedup"].generate(4, 0, 1 << 20)
+    chunks = {
+        data[offset : offset + Duplicated.CHUNK_SIZE]
+        for offset in range(0, len(data), Duplicated.CHUNK_SIZE)
+    }
+    assert 1 < len(chunks) <= Duplicated.DISTINCT
@@ -0,0 +1,75 @@
+"""Tests of the generation of random operations."""
+
+import random
+from pathlib import Path
+
+from click.testing import CliRunner
+from click.testing import Result
+
+from sex.exerciser import exercise
+from sex.operation import Operation
+from sex.operations.create import Create
+from sex.operations.listdir import Listdir
+from sex.operations.read import Read
+from sex.planner import random_operations
+from sex.state import State
+from sex.trace import read_trace
+
+
+CLIENTS = [Path("/mnt/a"), Path("/mnt/b")]
+
+
+def _exercise(*args: object) -> Result:
+    return CliRunner().invoke(exercise, [str(arg) for arg in args])
+
+
+def _contents(root: Path) -> dict[str, bytes | None]:
+    return {
+        str(path.relative_to(root)): path.read_bytes() if path.is_file() else None
+        for path in root.rglob("*")
+    }
+
+
+def test_random_operations() -> None:
+    """Operations only come from the given types, and are the same for the same seed."""
+    operations: list[type[Operation]] = [Create, Read, Listdir]
+    runs = []
+    for seed in [1, 2, 1]:
+        random.seed(seed)
+        state = State(None)
+        run = []
+        for n, operation, client in random_operations(
+            state, CLIENTS, 50, operations, start=10
+        ):
+            assert type(operation) in operations
+            assert client in CLIENTS
+            run.append(f"{n}: {operation} on {client}")
+            operation.update(state)
+        runs.append(run)
+    assert [int(line.split(":")[0]) for line in runs[0]] == list(range(10, 50))
+    assert runs[0] == runs[2] != runs[1]
+
+
+def test_plan(tmp_path: Path) -> None:
+    """A plan holds the operations of a run with the same seed, without running them, and replays like the run."""
+    ran, planned, replayed = tmp_path / "a", tmp_path / "b", tmp_path / "c"
+    for mountpoint in [ran, planned, replayed]:
+        mountpoint.mkdir()
+    trace, plan = tmp_path / "trace.jsonl", tmp_path / "plan.jsonl"
+    result = _exercise("-m", ran, "-s", 4, "-n", 100, "--trace", trace)
+    assert result.exit_code == 0, result.output
+    result = _exercise("-m", planned, "-s", 4, "-n", 100, "--plan", plan)
+    assert result.exit_code == 0, result.output
+    assert "Planned 100 operations" in result.output
+    assert not _contents(planned)
+    assert list(read_trace(plan)) == list(read_trace(trace))
+    result = _exercise("-m", replayed, "-p", plan)
+    assert result.exit_code == 0, result.output
+    assert _contents(replayed) == _contents(ran) != {}
+
+
+def test_plan_needs_a_length(tmp_path: Path) -> None:
+    """Endless runs cannot be planned."""
+    result = _exercise("-m", tmp_path, "--plan", tmp_path / "plan.jsonl")
+    assert result.exit_code != 0
+    assert "--plan requires --num-operations" in result.output
@@ -0,0 +1,117 @@
+"""Tests of the concurrent execution of operations."""
+
+import random
+import threading
+from pathlib import Path
+
+from sex.api import Api
+from sex.audit import audit
+from sex.operation import Operation
+from sex.operations.create import Create
+from sex.operations.delete import Delete
+from sex.operations.listdir import Listdir
+from sex.operations.mkdir import Mkdir
+from sex.operations.read import Read
+from sex.operations.truncate import Truncate
+from sex.operations.write import Write
+from sex.planner import random_operations
+from sex.scheduler import DependencyScheduler
+from sex.scheduler import Scheduler
+from sex.state import State
+
+from .conftest import FakeApiServer
+
+
+OPERATIONS: list[type[Operation]] = [Read, Write, Create, Delete, Truncate, Listdir]
+
+
+def _directories(tmp_path: Path, *names: str) -> State:
+    # a model with directories, which exist on the mountpoint too
+    state = State(None)
+    for name in names:
+        Mkdir(Path(f"/{name}")).update(state)
+        (tmp_path / name).mkdir()
+    return state
+
+
+def test_scheduler(api_server: FakeApiServer) -> None:
+    """Every operation is verified on every client, and the clients end up like the model."""
+    clients: list[Path | Api] = [api_server.root, Api(api_server.address)]
+    random.seed(6)
+    state = State(None)
+    verified: list[int] = []
+    with Scheduler(
+        clients, 5, False, False, 8, on_verified=lambda n, _: verified.append(n)
+    ) as scheduler:
+        for n, operation, client in random_operations(state, clients, 200, OPERATIONS):
+            scheduler.dispatch(n, operation, client, state)
+    assert sorted(verified) == list(range(200))
+    assert audit(state, clients) == []
+
+
+def test_scheduler_waits_for_conflicts(tmp_path: Path) -> None:
+    """Dispatch waits for earlier operations on the same paths, but not for others."""
+    state = _directories(tmp_path, "x", "y")
+    release = threading.Event()
+    verified = {n: threading.Event() for n in range(3)}
+
+    def on_verified(n: int, operation: Operation) -> None:
+        if n == 0:
+            release.wait(5)
+        verified[n].set()
+
+    with Scheduler([tmp_path], 5, False, False, 4, on_verified) as scheduler:
+        scheduler.dispatch(0, Mkdir(Path("/x/a")), tmp_path, state)
+        scheduler.dispatch(1, Mkdir(Path("/y/b")), tmp_path, state)
+        assert verified[1].wait(5)
+        conflicting = threading.Thread(
+            target=scheduler.dispatch, args=(2, Mkdir(Path("/x/c")), tmp_path, state)
+        )
+        conflicting.start()
+        conflicting.join(0.2)
+        assert conflicting.is_alive()
+        release.set()
+        conflicting.join()
+    assert all(event.is_set() for event in verified.values())
+
+
+def test_dependency_scheduler(api_server: FakeApiServer) -> None:
+    """Operations run out of order leave the clients like the model of a serial run."""
+    clients: list[Path | Api] = [api_server.root, Api(api_server.address)]
+    random.seed(7)
+    state = State(None)
+    verified: list[int] = []
+    with DependencyScheduler(
+        clients, 5, False, False, 8, on_verified=lambda n, _: verified.append(n)
+    ) as scheduler:
+        for n, operation, client in random_operations(state, clients, 200, OPERATIONS):
+            scheduler.dispatch(n, operation, client, state)
+    assert sorted(verified) == list(range(200))
+    assert audit(state, clients) == []
+
+
+def test_dependency_scheduler_runs_ahead(tmp_path: Path) -> None:
+    """Dispatch does not wait for conflicts, and operations only run after those they depend on."""
+    state = _directories(tmp_path, "x", "y")
+    release = threading.Event()
+    verified: list[int] = []
+    independent = threading.Event()
+
+    def on_verified(n: int, operation: Operation) -> None:
+        if n == 0:
+            release.wait(5)
+        verified.append(n)
+        if n == 3:
+            independent.set()
+
+    with DependencyScheduler([tmp_path], 5, False, False, 4, on_verified) as scheduler:
+        scheduler.dispatch(0, Mkdir(Path("/x/a")), tmp_path, state)
+        scheduler.dispatch(1, Mkdir(Path("/x/a/b")), tmp_path, state)
+        scheduler.dispatch(2, Mkdir(Path("/x/c")), tmp_path, state)
+        scheduler.dispatch(3, Mkdir(Path("/y/d")), tmp_path, state)
+        assert independent.wait(5)
+        assert verified == [3]
+        release.set()
+    assert verified[:2] == [3, 0]
+    assert sorted(verified[2:]) == [1, 2]
+    assert audit(state, [tmp_path]) == []
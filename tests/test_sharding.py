@@ -0,0 +1,119 @@
+"""Tests of multi-process exercising."""
+
+import random
+from pathlib import Path
+from typing import Callable
+from typing import Optional
+
+import click
+import pytest
+
+from sex.api import Api
+from sex.metrics import Metrics
+from sex.operation import Operation
+from sex.operations.create import Create
+from sex.operations.mkdir import Mkdir
+from sex.operations.write import Write
+from sex.planner import random_operations
+from sex.sharding import run_shard
+from sex.sharding import run_workers
+from sex.sharding import shard_path
+from sex.sharding import shard_seed
+from sex.state import State
+from sex.verification import OperationFailedError
+from sex.verification import VerificationPipeline
+
+from .conftest import FakeApiServer
+
+
+def _runner(
+    mountpoints: list[Path],
+    apis: list[Api],
+    cleanup: Optional[Path],
+    on_verified: Callable[[int, Operation], None],
+    metrics: Metrics,
+) -> None:
+    # a run of 20 operations
+    clients: list[Path | Api] = [*mountpoints, *apis]
+    state = State(None)
+    with VerificationPipeline(
+        clients, 5, False, False, on_verified=on_verified, metrics=metrics
+    ) as pipeline:
+        for n, operation, client in random_operations(
+            state, clients, 20, [Create, Write]
+        ):
+            pipeline.dispatch(n, operation, client, state)
+
+
+def _failing_runner(
+    mountpoints: list[Path],
+    apis: list[Api],
+    cleanup: Optional[Path],
+    on_verified: Callable[[int, Operation], None],
+    metrics: Metrics,
+) -> None:
+    # a run that fails in the third shard
+    if mountpoints[0].name == "shard-2":
+        raise OperationFailedError(3, Mkdir(Path("/d")))
+    _runner(mountpoints, apis, cleanup, on_verified, metrics)
+
+
+def test_run_shard(api_server: FakeApiServer) -> None:
+    """A shard runs in its own directory of every client, and records metrics under the clients of the run."""
+    mountpoint = api_server.root
+    api = Api(api_server.address)
+    (mountpoint / "shard-1").mkdir()
+    metrics = Metrics()
+    verified: list[int] = []
+    run_shard(
+        1,
+        3,
+        [mountpoint],
+        [api],
+        None,
+        _runner,
+        lambda n, _: verified.append(n),
+        metrics,
+    )
+    assert verified == list(range(20))
+    assert [path.parent for path in mountpoint.rglob("*") if path.is_file()]
+    assert all(
+        path.parts[len(mountpoint.parts)] == "shard-1" for path in mountpoint.rglob("*")
+    )
+    assert {client for (_, _, client), _ in metrics} == {str(mountpoint), str(api)}
+    assert metrics.operations() == 20
+
+
+def test_shard_seeds() -> None:
+    """Every shard has its own stream of random numbers, the same for the same seed."""
+    streams = []
+    for seed, shard in [(1, 0), (1, 1), (2, 0), (1, 0)]:
+        random.seed(shard_seed(seed, shard))
+        streams.append(random.random())
+    assert len(set(streams)) == 3
+    assert streams[0] == streams[3]
+    assert shard_path(4) == Path("/shard-4")
+
+
+def test_run_workers(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """Workers run their shards in parallel, and their metrics are merged."""
+    metrics = Metrics()
+    run_workers(3, 5, [tmp_path], [], None, 5, _runner, metrics)
+    assert "Total: 60 operations" in capsys.readouterr().out
+    assert metrics.operations() == 60
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "shard-0",
+        "shard-1",
+        "shard-2",
+    ]
+
+
+def test_failing_worker(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """A failing worker stops the run, and is reported with how to replay it."""
+    with pytest.raises(click.ClickException, match="workers failed"):
+        run_workers(3, 5, [tmp_path], [], tmp_path, 5, _failing_runner, Metrics())
+    err = capsys.readouterr().err
+    assert "Shard 2 (seed '5/2') failed at operation 3" in err
+    assert "--seed 5 --workers 3 --shard 2 --num-operations 4" in err
+    # the shard of the failing worker is empty, so it is cleaned up
+    assert not (tmp_path / "shard-2").exists()
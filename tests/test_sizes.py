@@ -0,0 +1,74 @@
+"""Tests of the distributions of file sizes."""
+
+import random
+
+import pytest
+
+from sex.sizes import LogUniform
+from sex.sizes import Uniform
+from sex.sizes import parse_size
+from sex.sizes import parse_size_distribution
+
+
+@pytest.mark.parametrize(
+    "text, size",
+    [
+        ("0", 0),
+        ("512", 512),
+        ("64K", 64 << 10),
+        ("4GiB", 4 << 30),
+        (" 2 mb ", 2 << 20),
+        ("0xFFFF", 0xFFFF),
+        ("1T", 1 << 40),
+    ],
+)
+def test_parse_size(text: str, size: int) -> None:
+    """Sizes are parsed with optional binary units."""
+    assert parse_size(text) == size
+
+
+@pytest.mark.parametrize("text", ["", "-1", "1.5K", "4X", "K"])
+def test_parse_invalid_size(text: str) -> None:
+    """Invalid sizes are rejected."""
+    with pytest.raises(ValueError):
+        parse_size(text)
+
+
+@pytest.mark.parametrize(
+    "spec, distribution",
+    [
+        ("4K", Uniform(4096, 4097)),
+        ("0-64K", Uniform(0, 65536)),
+        ("log:4K-8G", LogUniform(4096, 8 << 30)),
+    ],
+)
+def test_parse_size_distribution(spec: str, distribution: object) -> None:
+    """Distributions are parsed, and describe themselves in a form that parses back."""
+    assert parse_size_distribution(spec) == distribution
+    assert parse_size_distribution(str(distribution)) == distribution
+
+
+@pytest.mark.parametrize("spec", ["log:4K", "64K-4K", "1-1", "exp:1-2", "1-2-3"])
+def test_parse_invalid_size_distribution(spec: str) -> None:
+    """Empty ranges, unknown kinds and log-uniform single sizes are rejected."""
+    with pytest.raises(ValueError):
+        parse_size_distribution(spec)
+
+
+@pytest.mark.parametrize(
+    "distribution", [Uniform(3, 10), LogUniform(0, 10), LogUniform(4096, 1 << 40)]
+)
+def test_samples_lie_within_bounds(distribution: Uniform | LogUniform) -> None:
+    """Samples include the low bound but not the high one."""
+    random.seed(6)
+    samples = [distribution.sample() for _ in range(5000)]
+    assert min(samples) >= distribution.low
+    assert max(samples) < distribution.high
+
+
+def test_log_uniform_favors_no_magnitude() -> None:
+    """Every order of magnitude of a log-uniform distribution is about as likely."""
+    random.seed(7)
+    samples = [LogUniform(1, 1 << 30).sample() for _ in range(30000)]
+    small = sum(1 for size in samples if size < 1 << 15)
+    assert 0.4 < small / len(samples) < 0.6
@@ -0,0 +1,125 @@
+"""Tests of the model of the filesystem."""
+
+import random
+from pathlib import Path
+
+import pytest
+
+from sex.content import literal
+from sex.state import Directory
+from sex.state import File
+from sex.state import Node
+from sex.state import NodeIndex
+from sex.state import State
+from sex.state import StateError
+from sex.state import directory_digest
+from sex.state import entry_hash
+
+
+def _rehashed(node: Node) -> bytes:
+    # the digest of a node computed from scratch
+    if not isinstance(node, Directory):
+        return node.digest()
+    total = sum(
+        entry_hash(
+            name, "dir" if isinstance(child, Directory) else "file", _rehashed(child)
+        )
+        for name, child in node.children.items()
+    )
+    return directory_digest(total)
+
+
+def test_node_index() -> None:
+    """Nodes are indexed in insertion order, with the last one moved into removed slots."""
+    index: NodeIndex[File] = NodeIndex()
+    files = [File() for _ in range(4)]
+    for i, file in enumerate(files):
+        index.add(Path(f"/{i}"), file)
+    with pytest.raises(StateError):
+        index.add(Path("/0"), File())
+    index.remove(Path("/1"))
+    assert [path for path, _ in index] == [Path("/0"), Path("/3"), Path("/2")]
+    assert Path("/1") not in index and len(index) == 3
+    with pytest.raises(StateError):
+        index.remove(Path("/1"))
+
+
+def test_node_index_choice_is_deterministic() -> None:
+    """Random picks depend only on the seed and the sequence of changes."""
+    picks = []
+    for _ in range(2):
+        index: NodeIndex[File] = NodeIndex()
+        for i in range(10):
+            index.add(Path(f"/{i}"), File())
+        index.remove(Path("/4"))
+        random.seed(3)
+        picks.append([index.choice()[0] for _ in range(20)])
+    assert picks[0] == picks[1]
+    with pytest.raises(IndexError):
+        NodeIndex().choice()
+
+
+def test_directory_digests_are_maintained() -> None:
+    """Directory digests kept up to date along the path match digests computed from scratch."""
+    rng = random.Random(4)
+    state = State(None)
+    directories = [Path("/")]
+    files: list[Path] = []
+    for i in range(1000):
+        action = rng.random()
+        if action < 0.15:
+            path = rng.choice(directories) / f"d{i}"
+            state.create_directory(path)
+            directories.append(path)
+        elif action < 0.45 or not files:
+            path = rng.choice(directories) / f"f{i}"
+            state.create_file(path, literal(rng.randbytes(rng.randrange(1, 1000))))
+            files.append(path)
+        elif action < 0.6:
+            state.delete_file(files.pop(rng.randrange(len(files))))
+        elif action < 0.8:
+            state.truncate_file(rng.choice(files), rng.randrange(0, 2000))
+        else:
+            path = rng.choice(files)
+            if len(state.resolve_file(path).content) >= 3:
+                state.write_file(path, 0, literal(b"xyz"))
+        if i % 50 == 0:
+            assert state.digest() == _rehashed(state.root)
+    assert state.digest() == _rehashed(state.root)
+
+
+def test_directory_digests_cover_names_and_types() -> None:
+    """Renaming a file, or replacing it with a directory, changes the digest of the model."""
+    digests = set()
+    for build in (
+        lambda state: state.create_file(Path("/a"), literal(b"")),
+        lambda state: state.create_file(Path("/b"), literal(b"")),
+        lambda state: state.create_directory(Path("/a")),
+        lambda state: None,
+    ):
+        state = State(None)
+        build(state)
+        digests.add(state.digest())
+    assert len(digests) == 4
+
+
+def test_unhashed_models_cannot_be_digested() -> None:
+    """Models without hashes refuse to digest rather than return stale digests."""
+    state = State(None, hashed=False)
+    state.create_file(Path("/a"), literal(b"abc"))
+    with pytest.raises(StateError):
+        state.digest()
+
+
+def test_resolve() -> None:
+    """Paths resolve to the nodes of their kind only."""
+    state = State(None)
+    state.create_directory(Path("/d"))
+    state.create_file(Path("/d/f"), literal(b""))
+    assert isinstance(state.resolve_file(Path("/d/f")), File)
+    with pytest.raises(StateError):
+        state.resolve_directory(Path("/d/f"))
+    with pytest.raises(StateError):
+        state.resolve_file(Path("/d/f/g"))
+    with pytest.raises(StateError):
+        state.create_file(Path("/missing/f"), literal(b""))
@@ -0,0 +1,80 @@
+"""Tests of traces of runs."""
+
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from sex.content import BlockContent
+from sex.content import Content
+from sex.content import ExtentContent
+from sex.operation import Operation
+from sex.operations.create import Create
+from sex.operations.delete import Delete
+from sex.operations.listdir import Listdir
+from sex.operations.read import Read
+from sex.operations.truncate import Truncate
+from sex.operations.write import Write
+from sex.planner import random_operations
+from sex.state import State
+from sex.trace import TraceError
+from sex.trace import TraceWriter
+from sex.trace import from_record
+from sex.trace import read_trace
+from sex.trace import to_record
+
+
+OPERATIONS: list[type[Operation]] = [Read, Write, Create, Delete, Truncate, Listdir]
+CLIENTS = [Path("/mnt/a"), Path("/mnt/b")]
+
+
+@pytest.mark.parametrize("content_type", [ExtentContent, BlockContent])
+def test_trace_round_trip(tmp_path: Path, content_type: type[Content]) -> None:
+    """Traced operations replay against the model as the same operations, with matching digests."""
+    path = tmp_path / "trace.jsonl"
+    random.seed(8)
+    state = State(None, content_type)
+    with TraceWriter(path, CLIENTS, digests=True) as trace:
+        for n, operation, client in random_operations(state, CLIENTS, 300, OPERATIONS):
+            trace.write(n, operation, CLIENTS.index(client))
+            operation.update(state)
+    replayed = State(None, content_type)
+    records = list(read_trace(path))
+    assert [record["n"] for record in records] == list(range(300))
+    for record in records:
+        index, operation = from_record(replayed, record)
+        assert to_record(record["n"], operation, index, digests=True) == record
+        operation.update(replayed)
+    assert replayed.digest() == state.digest()
+
+
+def test_replay_detects_divergence(tmp_path: Path) -> None:
+    """Replaying a trace against a model that diverged fails on the digest."""
+    path = tmp_path / "trace.jsonl"
+    random.seed(9)
+    state = State(None)
+    with TraceWriter(path, CLIENTS, digests=True) as trace:
+        for n, operation, client in random_operations(state, CLIENTS, 50, [Create]):
+            trace.write(n, operation, CLIENTS.index(client))
+            operation.update(state)
+    records = list(read_trace(path))
+    records[-1]["digest"] = "00" * 16
+    replayed = State(None)
+    for record in records[:-1]:
+        from_record(replayed, record)[1].update(replayed)
+    with pytest.raises(TraceError):
+        from_record(replayed, records[-1])
+
+
+def test_invalid_traces(tmp_path: Path) -> None:
+    """Files that are not traces, and invalid lines, are rejected."""
+    path = tmp_path / "trace.jsonl"
+    path.write_text("not a trace\n")
+    with pytest.raises(TraceError):
+        list(read_trace(path))
+    path.write_text(json.dumps({"trace": 1}) + "\n{oops\n")
+    with pytest.raises(TraceError):
+        list(read_trace(path))
+    with pytest.raises(TraceError):
+        from_record(State(None), {"n": 0, "op": "NOPE", "client": 0})
@@ -0,0 +1,110 @@
+"""Tests of the verification of operations."""
+
+import random
+import threading
+from pathlib import Path
+
+import pytest
+
+from sex.api import Api
+from sex.audit import audit
+from sex.metrics import Metrics
+from sex.operation import Operation
+from sex.operation import VerificationError
+from sex.operations.create import Create
+from sex.operations.delete import Delete
+from sex.operations.listdir import Listdir
+from sex.operations.mkdir import Mkdir
+from sex.operations.read import Read
+from sex.operations.truncate import Truncate
+from sex.operations.write import Write
+from sex.planner import random_operations
+from sex.state import State
+from sex.verification import OperationFailedError
+from sex.verification import VerificationPipeline
+from sex.verification import verify_operation
+
+from .conftest import FakeApiServer
+
+
+OPERATIONS: list[type[Operation]] = [Read, Write, Create, Delete, Truncate, Listdir]
+
+
+@pytest.mark.parametrize("window", [0, 4])
+def test_pipeline(api_server: FakeApiServer, window: int) -> None:
+    """Every operation is verified on every client, and the clients end up like the model."""
+    clients: list[Path | Api] = [api_server.root, Api(api_server.address)]
+    random.seed(5)
+    state = State(None)
+    verified: list[int] = []
+    metrics = Metrics()
+    with VerificationPipeline(
+        clients,
+        5,
+        False,
+        False,
+        window,
+        on_verified=lambda n, _: verified.append(n),
+        metrics=metrics,
+    ) as pipeline:
+        for n, operation, client in random_operations(state, clients, 100, OPERATIONS):
+            pipeline.dispatch(n, operation, client, state)
+    assert sorted(verified) == list(range(100))
+    assert audit(state, clients) == []
+
+
+def test_pipeline_orders_conflicts(tmp_path: Path) -> None:
+    """An operation waits for the verification of earlier operations on its paths, but not of others."""
+    state = State(None)
+    for name in ["x", "y"]:
+        Mkdir(Path(f"/{name}")).update(state)
+        (tmp_path / name).mkdir()
+    release = threading.Event()
+    verified = {n: threading.Event() for n in range(3)}
+
+    def on_verified(n: int, operation: Operation) -> None:
+        # hold the verification of the first operation until released
+        if n == 0:
+            release.wait(5)
+        verified[n].set()
+
+    with VerificationPipeline(
+        [tmp_path], 5, False, False, 4, on_verified=on_verified
+    ) as pipeline:
+        pipeline.dispatch(0, Mkdir(Path("/x/a")), tmp_path, state)
+        pipeline.dispatch(1, Mkdir(Path("/y/b")), tmp_path, state)
+        assert verified[1].wait(5)
+        conflicting = threading.Thread(
+            target=pipeline.dispatch, args=(2, Mkdir(Path("/x/c")), tmp_path, state)
+        )
+        conflicting.start()
+        conflicting.join(0.2)
+        assert conflicting.is_alive()
+        release.set()
+        conflicting.join()
+    assert all(event.is_set() for event in verified.values())
+
+
+@pytest.mark.parametrize("window", [0, 4])
+def test_pipeline_failures(tmp_path: Path, window: int) -> None:
+    """Operations that fail to execute raise an `OperationFailedError` with the error as its cause."""
+    state = State(None)
+    (tmp_path / "d").mkdir()
+    with pytest.raises(OperationFailedError) as error:
+        with VerificationPipeline([tmp_path], 0.1, False, False, window) as pipeline:
+            pipeline.dispatch(0, Mkdir(Path("/e")), tmp_path, state)
+            pipeline.dispatch(1, Mkdir(Path("/d")), tmp_path, state)
+    assert error.value.n == 1
+    assert "MKDIR" in str(error.value)
+    assert isinstance(error.value.__cause__, FileExistsError)
+
+
+def test_verification_timeout(tmp_path: Path) -> None:
+    """A change that does not show up on a client within the timeout fails verification."""
+    state = State(None)
+    operation = Mkdir(Path("/d"))
+    operation.update(state)
+    with pytest.raises(VerificationError):
+        verify_operation([tmp_path], operation, 0.1, False)
+    (tmp_path / "d").mkdir()
+    assert list(verify_operation([tmp_path], operation, 0.1, False)) == [tmp_path]